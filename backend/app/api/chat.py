@@ -2,11 +2,19 @@
 Chat API endpoint
 """
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+import asyncio
 import logging
+import time
+import uuid
 
-from app.models.schemas import ChatMessage, ChatResponse
-from app.services.query_engine import QueryEngine
+from app.core.config import settings
+from app.models.schemas import BatchChatRequest, ChatMessage, ChatResponse
 from app.services.llm_service import LLMService
+from app.services.admission import AdmissionRejected, deadline_scope
+from app.services.llm_resilience import ProviderUnavailable
+from app.api.deps import get_service
+from app.api.responses import FastJSONResponse, dumps
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -16,12 +24,29 @@ logger = logging.getLogger(__name__)
 async def chat(message: ChatMessage, request: Request):
     """
     Process a chat message and return an answer with citations
+    
+    Requests are admitted through the concurrency gate and must finish
+    within QUERY_TIMEOUT; shed requests get 429 with Retry-After and
+    requests that run out of time get 504 (503 while every LLM provider
+    is circuit-open, or while startup is still creating services).
+    Identical questions already in flight are coalesced onto a single
+    pipeline run.
     """
-    try:
-        # Get services from app state
-        rag_service = request.app.state.rag_service
-        data_fetcher = request.app.state.data_fetcher
-        
+    deadline = time.monotonic() + settings.QUERY_TIMEOUT
+    admission = request.app.state.admission
+    coalescer = request.app.state.coalescer
+    conversation_store = get_service(request, "conversation_store")
+    rag_service = get_service(request, "rag_service")
+    data_fetcher = get_service(request, "data_fetcher")
+    
+    # Imported lazily (pandas and friends load during background warmup,
+    # which has finished once the services above exist)
+    from app.services.query_engine import QueryEngine
+    
+    # Every caller keeps its own conversation, even when work is shared
+    conversation_id = message.conversation_id or str(uuid.uuid4())
+    
+    async def run_pipeline() -> ChatResponse:
         # Create LLM service (can be per-request or cached)
         llm_service = LLMService()
         
@@ -29,28 +54,114 @@ async def chat(message: ChatMessage, request: Request):
         query_engine = QueryEngine(
             llm_service=llm_service,
             rag_service=rag_service,
-            data_fetcher=data_fetcher
+            data_fetcher=data_fetcher,
+            conversation_store=conversation_store
         )
         
-        # Process query
-        response = await query_engine.process_query(
-            user_query=message.message,
-            conversation_id=message.conversation_id
+        # Process query; the deadline cancels LLM and data work still running
+        async with admission.admit(deadline):
+            with deadline_scope(deadline):
+                return await asyncio.wait_for(
+                    query_engine.process_query(
+                        user_query=message.message,
+                        conversation_id=conversation_id
+                    ),
+                    timeout=deadline - time.monotonic()
+                )
+    
+    try:
+        # Identical questions with the same conversation context already in
+        # flight share one pipeline run
+        context = None
+        if message.conversation_id:
+            previous = await conversation_store.latest_turn(message.conversation_id)
+            context = previous["summary"] if previous else None
+        
+        response, shared = await asyncio.wait_for(
+            coalescer.run(coalescer.key(message.message, context), run_pipeline),
+            timeout=deadline - time.monotonic()
         )
         
-        return response
+        if shared:
+            metadata = dict(response.metadata or {}, coalesced=True)
+            response = response.model_copy(
+                update={"conversation_id": conversation_id, "metadata": metadata}
+            )
+            await conversation_store.record_response(response, message.message)
+        
+        # Built by the query engine from validated parts
+        return FastJSONResponse(response)
         
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server busy: {e}",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except ProviderUnavailable as e:
+        logger.warning(f"No LLM provider available: {e}")
+        raise HTTPException(status_code=503, detail="Language model temporarily unavailable")
+    except asyncio.TimeoutError:
+        logger.warning(f"Chat request exceeded {settings.QUERY_TIMEOUT}s deadline")
+        raise HTTPException(status_code=504, detail="Query timed out")
     except Exception as e:
         logger.error(f"Chat endpoint error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/batch")
+async def chat_batch(batch: BatchChatRequest, request: Request):
+    """
+    Answer a list of questions, streaming NDJSON results as they finish
+    
+    Each line is one result with the question's ``index``, its ``status``
+    and either the ``response`` or an ``error``. Questions run with bounded
+    concurrency (BATCH_MAX_CONCURRENCY unless the request asks for less)
+    and are admitted like chat requests, within MAX_CONCURRENT_REQUESTS.
+    """
+    if len(batch.questions) > settings.BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    
+    rag_service = get_service(request, "rag_service")
+    data_fetcher = get_service(request, "data_fetcher")
+    
+    from app.services.batch_runner import BatchRunner
+    from app.services.query_engine import QueryEngine
+    llm_service = LLMService()
+    
+    runner = BatchRunner(
+        engine_factory=lambda: QueryEngine(
+            llm_service=llm_service,
+            rag_service=rag_service,
+            data_fetcher=data_fetcher
+        ),
+        max_concurrency=min(batch.max_concurrency or settings.BATCH_MAX_CONCURRENCY,
+                            settings.BATCH_MAX_CONCURRENCY),
+        # Batch questions share the chat admission limits
+        admission=request.app.state.admission
+    )
+    
+    async def stream():
+        async for result in runner.run(batch.questions):
+            yield dumps(result) + b"\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
 @router.get("/conversations/{conversation_id}")
-async def get_conversation(conversation_id: str):
-    """Get conversation history (TODO: implement persistence)"""
-    # This would retrieve conversation history from a database
+async def get_conversation(conversation_id: str, request: Request):
+    """Get conversation history, oldest turn first"""
+    conversation_store = get_service(request, "conversation_store")
+    messages = await conversation_store.history(conversation_id)
+    if not messages:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    
+    latest = await conversation_store.latest_turn(conversation_id)
     return {
         "conversation_id": conversation_id,
-        "messages": [],
-        "status": "not_implemented"
+        "messages": messages,
+        "summary": latest["summary"]
     }
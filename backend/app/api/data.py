@@ -3,9 +3,16 @@ Data API endpoints
 """
 from fastapi import APIRouter, HTTPException, Request, Query
 from typing import Optional, List
+import asyncio
 import logging
+import time
 
-from app.models.schemas import DatasetInfo, DataQuery, DataQueryResponse, DataSource
+from app.core.config import settings
+from app.models.schemas import (
+    DatasetInfo, DataQuery, DataQueryResponse, DataSource, SQLQueryRequest, SQLQueryResponse
+)
+from app.api.deps import get_service
+from app.api.responses import FastJSONResponse
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -18,9 +25,12 @@ async def list_datasets(
 ):
     """
     List all available datasets
+    
+    Registered datasets are listed without being loaded: fields and row
+    counts come from their cached copy, if any.
     """
     try:
-        data_fetcher = request.app.state.data_fetcher
+        data_fetcher = get_service(request, "data_fetcher")
         
         datasets = []
         for key, info in data_fetcher.DATASETS.items():
@@ -30,7 +40,7 @@ async def list_datasets(
             
             try:
                 # Get additional info
-                dataset_info = await data_fetcher.get_dataset_info(key)
+                dataset_info = await data_fetcher.get_catalog_info(key)
                 
                 datasets.append(DatasetInfo(
                     dataset_id=key,
@@ -50,18 +60,36 @@ async def list_datasets(
         
         return datasets
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"List datasets error: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/datasets/registry/reload")
+async def reload_registry(request: Request):
+    """
+    Re-read the dataset catalog and registered datasets now instead of at
+    the next poll; returns the keys that were added, updated or removed
+    """
+    registry = get_service(request, "dataset_registry")
+    try:
+        changes = await registry.refresh(force=True)
+    except Exception as e:
+        logger.error(f"Registry reload error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return {**changes, "dataset_count": len(registry)}
+
+
 @router.get("/datasets/{dataset_id}", response_model=DatasetInfo)
 async def get_dataset(dataset_id: str, request: Request):
     """
     Get detailed information about a specific dataset
     """
     try:
-        data_fetcher = request.app.state.data_fetcher
+        data_fetcher = get_service(request, "data_fetcher")
         
         if dataset_id not in data_fetcher.DATASETS:
             raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
@@ -90,52 +118,85 @@ async def get_dataset(dataset_id: str, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _query_metadata(dataset_id: str, info: dict, dataset_info: dict) -> DatasetInfo:
+    return DatasetInfo(
+        dataset_id=dataset_id,
+        name=info["name"],
+        description=info["description"],
+        organization=info["category"],
+        category=info["category"],
+        format="parquet",
+        fields=dataset_info.get("columns", []),
+        row_count=dataset_info.get("row_count"),
+        last_updated=dataset_info.get("last_cached", ""),
+        url=info["url"],
+        tags=[info["category"]]
+    )
+
+
+def _check_columns(requested: Optional[List[str]], available: List[str]):
+    missing = [col for col in requested or [] if col not in available]
+    if missing and available:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(missing)}")
+
+
 @router.post("/datasets/query", response_model=DataQueryResponse)
 async def query_dataset(query: DataQuery, request: Request):
     """
     Query a dataset with filters
+    
+    ``total_count`` is the number of rows matching the filters. With
+    ``group_by`` the mean, sum and count of every measure are returned
+    per group instead of rows. With ``approximate`` the answer comes from
+    the dataset's stratified sample (rows are a random sample, aggregates
+    and ``total_count`` are estimates with ``_moe`` margins of error); it
+    falls back to the exact path for datasets that are not cached yet.
     """
     try:
-        data_fetcher = request.app.state.data_fetcher
+        data_fetcher = get_service(request, "data_fetcher")
         
         if query.dataset_id not in data_fetcher.DATASETS:
             raise HTTPException(status_code=404, detail=f"Dataset {query.dataset_id} not found")
         
-        # Query the dataset
-        df = await data_fetcher.query_dataset(
-            dataset_key=query.dataset_id,
+        info = data_fetcher.DATASETS[query.dataset_id]
+        
+        if query.approximate:
+            sample = await data_fetcher.get_sample(query.dataset_id)
+            if sample is not None:
+                return FastJSONResponse(
+                    await _approximate_query(query, info, sample, data_fetcher)
+                )
+        
+        # Loaded with the data services during warmup
+        from app.services.arrow_query import to_records
+        
+        if query.group_by:
+            catalog = await data_fetcher.get_catalog_info(query.dataset_id)
+            _check_columns(query.group_by, catalog.get("columns", []))
+        
+        # Query the dataset on the columnar path
+        table, matching = await data_fetcher.query_table_counted(
+            query.dataset_id,
             filters=query.filters,
-            limit=query.limit
+            group_by=query.group_by,
+            limit=query.offset + query.limit
         )
         
         # Get dataset info
-        info = data_fetcher.DATASETS[query.dataset_id]
         dataset_info = await data_fetcher.get_dataset_info(query.dataset_id)
+        metadata = _query_metadata(query.dataset_id, info, dataset_info)
         
-        metadata = DatasetInfo(
-            dataset_id=query.dataset_id,
-            name=info["name"],
-            description=info["description"],
-            organization=info["category"],
-            category=info["category"],
-            format="parquet",
-            fields=dataset_info.get("columns", []),
-            row_count=dataset_info.get("row_count"),
-            last_updated=dataset_info.get("last_cached", ""),
-            url=info["url"],
-            tags=[info["category"]]
-        )
+        # Python objects only for the rows being returned
+        data = to_records(table.slice(query.offset))
         
-        # Convert dataframe to records
-        data = df.to_dict(orient="records")
-        
-        return DataQueryResponse(
+        # Rows come straight from the Arrow table: skip per-row validation
+        return FastJSONResponse(DataQueryResponse.model_construct(
             dataset_id=query.dataset_id,
             data=data,
-            total_count=dataset_info.get("row_count", len(data)),
+            total_count=matching,
             returned_count=len(data),
             metadata=metadata
-        )
+        ))
         
     except HTTPException:
         raise
@@ -144,13 +205,78 @@ async def query_dataset(query: DataQuery, request: Request):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _approximate_query(query: DataQuery, info: dict, sample, data_fetcher) -> DataQueryResponse:
+    """Answer a query from the dataset's stratified sample, without loading the dataset"""
+    confidence = settings.APPROXIMATE_CONFIDENCE
+    _check_columns(query.group_by, sample.columns)
+    
+    def run():
+        # Estimated number of matching rows, with its margin
+        matching = sample.estimate(query.filters, measures=[], confidence=confidence)
+        if query.group_by:
+            groups = sample.estimate(query.filters, query.group_by, confidence=confidence)
+            return matching, groups[query.offset:query.offset + query.limit], len(groups)
+        return matching, sample.rows(query.filters, query.offset, query.limit), None
+    
+    matching, data, group_count = await asyncio.to_thread(run)
+    total = matching[0] if matching else {"count": 0.0, "count_moe": 0.0}
+    
+    catalog = await data_fetcher.get_catalog_info(query.dataset_id)
+    return DataQueryResponse.model_construct(
+        dataset_id=query.dataset_id,
+        data=data,
+        # Rows, as on the exact path; grouped queries report groups separately
+        total_count=int(round(total["count"])),
+        returned_count=len(data),
+        metadata=_query_metadata(query.dataset_id, info, catalog),
+        approximation={
+            **sample.describe(confidence),
+            "matching_rows": total["count"],
+            "matching_rows_moe": total["count_moe"],
+            **({"groups": group_count} if group_count is not None else {}),
+        }
+    )
+
+
+@router.post("/datasets/sql", response_model=SQLQueryResponse)
+async def query_sql(query: SQLQueryRequest, request: Request):
+    """
+    Run a read-only SQL query (SELECT with WHERE, GROUP BY, ORDER BY, LIMIT
+    and joins on State/Year) over the cached datasets
+    
+    Aggregate on the server instead of pulling rows; results are returned
+    as column names plus row lists.
+    """
+    sql_engine = get_service(request, "sql_engine")
+    
+    # Loaded with the data services during warmup
+    from app.services.sql_engine import QueryBudgetExceeded, SQLQueryError
+    
+    start = time.perf_counter()
+    try:
+        result = await sql_engine.execute(query.query, max_rows=query.max_rows)
+    except SQLQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueryBudgetExceeded as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e) or "Query timed out")
+    except Exception as e:
+        logger.error(f"SQL query error: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    return FastJSONResponse(
+        SQLQueryResponse.model_construct(processing_time=time.perf_counter() - start, **result)
+    )
+
+
 @router.post("/datasets/{dataset_id}/refresh")
 async def refresh_dataset(dataset_id: str, request: Request):
     """
     Refresh a dataset from the API
     """
     try:
-        data_fetcher = request.app.state.data_fetcher
+        data_fetcher = get_service(request, "data_fetcher")
         
         if dataset_id not in data_fetcher.DATASETS:
             raise HTTPException(status_code=404, detail=f"Dataset {dataset_id} not found")
@@ -0,0 +1,23 @@
+"""
+Shared endpoint helpers
+"""
+from typing import Any
+
+from fastapi import HTTPException, Request
+
+
+def get_service(request: Request, name: str) -> Any:
+    """
+    A service from app state, or 503 while startup is still creating it
+    
+    Data services are created by the background warmup, so requests that
+    arrive in the first moments after startup are asked to retry.
+    """
+    service = getattr(request.app.state, name, None)
+    if service is None:
+        raise HTTPException(
+            status_code=503,
+            detail="Service is starting up",
+            headers={"Retry-After": "1"}
+        )
+    return service
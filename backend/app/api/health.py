@@ -1,11 +1,18 @@
 """
 Health check endpoint
 """
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
 from datetime import datetime
 import time
+from typing import Any, Dict
 
+from app.core.compression import compression_stats
+from app.core.config import settings
+from app.core.startup import startup_profile
 from app.models.schemas import HealthResponse
+from app.services.cache import get_cache
+from app.services.llm_resilience import provider_stats
 
 router = APIRouter()
 
@@ -15,7 +22,7 @@ startup_time = time.time()
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check(request: Request):
-    """Health check endpoint"""
+    """Liveness: the process is up (see /ready for traffic readiness)"""
     
     services = {
         "api": "healthy",
@@ -26,7 +33,7 @@ async def health_check(request: Request):
     
     # Check if services are initialized
     if hasattr(request.app.state, "rag_service"):
-        services["rag"] = "healthy"
+        services["rag"] = "healthy" if request.app.state.rag_service.ready else "warming_up"
     
     if hasattr(request.app.state, "data_fetcher"):
         services["data_fetcher"] = "healthy"
@@ -39,3 +46,51 @@ async def health_check(request: Request):
         uptime=uptime,
         services=services
     )
+
+
+@router.get("/ready")
+async def readiness(request: Request):
+    """
+    Readiness: 200 once warmup has loaded the datasets and built the index
+    
+    Returns 503 with warmup progress until then, so load balancers keep
+    traffic away from instances that would only give degraded answers.
+    """
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is None:
+        return JSONResponse(status_code=503, content={"ready": False, "warmup": None})
+    
+    return JSONResponse(
+        status_code=200 if warmup.ready else 503,
+        content={"ready": warmup.ready, "warmup": warmup.progress()}
+    )
+
+
+@router.get("/metrics")
+async def metrics(request: Request) -> Dict[str, Any]:
+    """Request-handling counters: admission, coalescing, cache, LLM providers, SQL and compression"""
+    state = request.app.state
+    metrics = {"cache": get_cache().stats, "llm": provider_stats(), "compression": compression_stats()}
+    
+    if hasattr(state, "admission"):
+        metrics["admission"] = state.admission.stats
+    
+    if hasattr(state, "coalescer"):
+        metrics["coalescing"] = state.coalescer.stats
+    if getattr(state, "sql_engine", None):
+        metrics["sql"] = state.sql_engine.stats
+    
+    return metrics
+
+
+@router.get("/debug/startup")
+async def startup_report(request: Request) -> Dict[str, Any]:
+    """Cold-start profile: stage timings and heavy-module import times (DEBUG only)"""
+    if not settings.DEBUG:
+        raise HTTPException(status_code=404, detail="Not found")
+    
+    report = startup_profile.report()
+    warmup = getattr(request.app.state, "warmup", None)
+    if warmup is not None:
+        report["warmup"] = warmup.progress()
+    return report
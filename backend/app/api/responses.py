@@ -0,0 +1,49 @@
+"""
+Fast JSON responses
+orjson serialization for the hot endpoints (chat answers, query rows)
+"""
+import decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    # Models are unpacked one level at a time; orjson serializes the field
+    # values (rows, strings, datetimes, enums) natively
+    if isinstance(obj, BaseModel):
+        return dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if hasattr(obj, "isoformat"):
+        # e.g. pandas Timestamps
+        return obj.isoformat()
+    if hasattr(obj, "item"):
+        # NumPy / pandas scalars orjson does not know
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize to JSON bytes; models come out exactly as ``model_dump_json`` writes them"""
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by orjson
+
+    Endpoints return it wrapping the model they built (or a plain dict), so
+    FastAPI skips re-validating the model against ``response_model`` and the
+    ``jsonable_encoder`` pass; the route's ``response_model`` still documents
+    the shape. Only use it for models built from trusted, internal data.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,200 @@
+"""
+Response Compression
+ASGI middleware negotiating gzip or brotli (when the ``brotli`` package is
+installed) from Accept-Encoding for JSON and text responses
+"""
+import asyncio
+import logging
+import zlib
+from typing import Any, Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Bodies above this size are compressed in a worker thread
+THREAD_THRESHOLD = 256 * 1024
+
+# Process-wide counters for /metrics
+_stats = {"compressed": 0, "skipped": 0, "bytes_in": 0, "bytes_out": 0}
+
+
+def supported_encodings() -> list:
+    """Encodings this server can produce, in order of preference on ties"""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    The client's most preferred supported encoding, or None for identity
+
+    Honours q-values (``gzip;q=0.5, br;q=1``), ``*`` and ``q=0`` exclusions.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class Compressor:
+    """Incremental gzip or brotli compressor"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31: gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        """Compress a chunk; unless ``finish``, flush so the client can decode it now"""
+        if self.encoding == "br":
+            out = self._compressor.process(data)
+            return out + (self._compressor.finish() if finish else self._compressor.flush())
+        out = self._compressor.compress(data)
+        return out + self._compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies of at least ``minimum_size`` bytes
+
+    Single-body responses are compressed whole (in a worker thread when
+    large, so big query results do not stall the event loop); streamed
+    responses such as NDJSON batch results are compressed chunk by chunk
+    with a flush after each, so every line still reaches the client as
+    soon as it is produced. Responses that already carry a
+    Content-Encoding or are not JSON/text pass through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 1,
+        brotli_quality: int = 4
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _Responder(self, encoding, send).send)
+
+    def compressor(self, encoding: str) -> Compressor:
+        return Compressor(encoding, self.gzip_level, self.brotli_quality)
+
+
+def compression_stats() -> Dict[str, Any]:
+    """Responses compressed / sent as-is and the overall compression ratio"""
+    ratio = _stats["bytes_out"] / _stats["bytes_in"] if _stats["bytes_in"] else None
+    return {
+        **_stats,
+        "ratio": round(ratio, 3) if ratio is not None else None,
+        "encodings": supported_encodings(),
+    }
+
+
+class _Responder:
+    """Per-response state: holds the start message until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start: Optional[Message] = None
+        self.compressor: Optional[Compressor] = None
+        self.passthrough = False
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.start is None:
+            await self._send(message)
+            return
+
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            headers = MutableHeaders(raw=self.start["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or self.start["status"] in (204, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+                or (not more_body and len(body) < self.middleware.minimum_size)
+            ):
+                if content_type.startswith(COMPRESSIBLE_TYPES):
+                    headers.add_vary_header("Accept-Encoding")
+                _stats["skipped"] += 1
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+
+            self.compressor = self.middleware.compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                # Streamed: the compressed length is not known up front
+                del headers["Content-Length"]
+            else:
+                compressed = await self._compress(body, finish=True)
+                headers["Content-Length"] = str(len(compressed))
+                _stats["compressed"] += 1
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+            _stats["compressed"] += 1
+            await self._send(self.start)
+
+        compressed = await self._compress(body, finish=not more_body)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+
+    async def _compress(self, body: bytes, finish: bool) -> bytes:
+        if len(body) > THREAD_THRESHOLD:
+            compressed = await asyncio.to_thread(self.compressor.compress, body, finish)
+        else:
+            compressed = self.compressor.compress(body, finish)
+        _stats["bytes_in"] += len(body)
+        _stats["bytes_out"] += len(compressed)
+        return compressed
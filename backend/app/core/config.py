@@ -2,7 +2,7 @@
 Configuration settings for Project Samarth
 """
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 from pathlib import Path
 
@@ -29,6 +29,27 @@ class Settings(BaseSettings):
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     OLLAMA_MODEL: str = "llama3.1"
     
+    # Model routing: extraction tasks run on a small model, synthesis on the
+    # provider's main model, escalating when the small model's JSON is invalid
+    TASK_MODEL_ROUTING: bool = True
+    FAST_LLM_PROVIDER: str = ""  # provider for extraction tasks (default: LLM_PROVIDER)
+    FAST_MODELS: Dict[str, str] = {
+        "openai": "gpt-4o-mini",
+        "anthropic": "claude-3-haiku-20240307",
+        "google": "gemini-1.5-flash",
+        "ollama": "llama3.1",
+    }
+    
+    # LLM call resilience
+    LLM_BACKUP_PROVIDERS: List[str] = []  # failover order after LLM_PROVIDER
+    LLM_MAX_RETRIES: int = 2  # retries per provider on transient errors
+    LLM_RETRY_BASE_DELAY: float = 0.5  # seconds, doubled per retry
+    LLM_RETRY_MAX_DELAY: float = 8.0
+    LLM_HEDGE_REQUESTS: bool = False  # race a backup provider after the primary's p95
+    LLM_HEDGE_DELAY: float = 5.0  # hedge delay until enough latency samples exist
+    CIRCUIT_FAILURE_THRESHOLD: int = 5  # consecutive failures that open a circuit
+    CIRCUIT_RESET_TIMEOUT: float = 30.0  # seconds before a half-open trial call
+    
     # Embeddings
     EMBEDDING_MODEL: str = "text-embedding-3-small"
     
@@ -37,21 +58,76 @@ class Settings(BaseSettings):
     DATA_GOV_BASE_URL: str = "https://api.data.gov.in/resource"
     
     # Vector Database
+    RETRIEVER_BACKEND: str = "auto"  # auto, chroma, numpy, bm25
+    EMBEDDING_DIM: int = 512  # hashing embedder dimension (numpy backend)
+    HYBRID_RETRIEVAL: bool = True  # fuse vector search with the entity index
+    RRF_K: int = 60
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
     
     # Cache
     REDIS_URL: str = "redis://localhost:6379/0"
     CACHE_TTL: int = 86400  # 24 hours
     USE_CACHE: bool = True
+    CACHE_BACKEND: str = "redis"  # redis, memory
+    CACHE_KEY_PREFIX: str = "samarth"
+    LOCAL_CACHE_MAX_ENTRIES: int = 1024
+    CACHE_VERSION_CHECK_INTERVAL: float = 5.0  # seconds between namespace version checks
+    
+    # Conversations
+    CONVERSATION_DB_URL: str = ""  # default: sqlite in DATA_DIRECTORY
+    CONVERSATION_CONTEXT_TOKENS: int = 400  # budget for the rolling summary
     
     # Data
     DATA_DIRECTORY: str = "./data"
-    MAX_DATASET_SIZE_MB: int = 100
-    AUTO_UPDATE_INTERVAL: int = 3600
+    # Dataset catalog (YAML) plus datasets registered at runtime (SQLite),
+    # both re-read by running servers when they change
+    DATASET_REGISTRY_FILE: str = ""  # default: app/core/datasets.yaml
+    DATASET_REGISTRY_DB_URL: str = ""  # default: sqlite in DATA_DIRECTORY
+    DATASET_REGISTRY_POLL_INTERVAL: float = 30.0  # seconds (0 disables hot reload)
+    MAX_DATASET_SIZE_MB: int = 100  # cached parquet size limit for ingested files
+    INGEST_CHUNK_ROWS: int = 100_000  # rows per chunk / parquet row group
+    AUTO_UPDATE_INTERVAL: int = 3600  # refresh scheduler period (0 disables)
+    REFRESH_MAX_CONCURRENCY: int = 2
+    REFRESH_JITTER: float = 0.1  # fraction of the interval
+    STALE_WHILE_REVALIDATE: bool = True
+    MAX_CACHE_FRAGMENTS: int = 8  # incremental fragments before compaction
+    # "arrow" also publishes memory-mapped Arrow IPC snapshots of each cached
+    # dataset that all workers share read-only; "parquet" decodes per process
+    CACHE_FORMAT: str = "parquet"  # parquet, arrow
+    
+    # Read-only SQL over the cached datasets
+    SQL_MAX_RESULT_ROWS: int = 1000
+    SQL_MAX_SCAN_ROWS: int = 5_000_000  # rows after filters and joins
+    SQL_TIMEOUT: float = 5.0  # seconds
+    SQL_PLAN_CACHE_SIZE: int = 256
+    
+    # Approximate answers from stratified (State/Year) samples and sketches,
+    # maintained when datasets are fetched or ingested
+    APPROXIMATE_MODE: str = "auto"  # off, auto (datasets of APPROXIMATE_MIN_ROWS or more), always
+    APPROXIMATE_MIN_ROWS: int = 1_000_000
+    APPROXIMATE_SAMPLE_PER_STRATUM: int = 100  # rows kept per State/Year
+    APPROXIMATE_CONFIDENCE: float = 0.95  # level of the reported margins of error
+    
+    # Chart series returned with chat answers (ChatResponse.visualizations)
+    VISUALIZATIONS_ENABLED: bool = True
+    VISUALIZATION_MAX_POINTS: int = 300  # per chart, split across its series (LTTB)
+    VISUALIZATION_MAX_SERIES: int = 8  # states per time-series chart
+    VISUALIZATION_MAX_CHARTS: int = 4
+    
+    # Response compression (gzip, or brotli when the package is installed)
+    RESPONSE_COMPRESSION: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes; smaller bodies are sent as-is
+    GZIP_LEVEL: int = 1  # level 1 keeps most of the ratio at a third of the CPU of 6
+    BROTLI_QUALITY: int = 4  # 0-11; higher levels cost too much CPU per response
     
     # Performance
     MAX_CONCURRENT_REQUESTS: int = 10
-    QUERY_TIMEOUT: int = 30
+    MAX_QUEUED_REQUESTS: int = 50
+    MAX_QUEUE_WAIT: float = 10.0  # seconds a request may wait for a slot
+    QUERY_TIMEOUT: int = 30  # end-to-end deadline for /chat in seconds
+    DATASET_RETRIEVAL_TIMEOUT: float = 5.0  # per-dataset deadline in seconds
+    BATCH_MAX_QUESTIONS: int = 200
+    BATCH_MAX_CONCURRENCY: int = 4  # questions in flight per batch
     
     class Config:
         env_file = ".env"
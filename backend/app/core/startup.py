@@ -0,0 +1,50 @@
+"""
+Startup profiling
+Import and startup-stage timings for cold-start diagnostics
+"""
+import importlib
+import sys
+import time
+from types import ModuleType
+from typing import Any, Dict
+
+
+class StartupProfile:
+    """
+    Records how long heavy imports and startup stages take
+
+    Times are measured from when this module is first imported, which
+    ``app.main`` does before anything else. Import times are incremental:
+    a module's time excludes dependencies that were already loaded.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self.stages: Dict[str, float] = {}
+
+    def import_module(self, name: str) -> ModuleType:
+        """Import a module, recording the time if it was not loaded yet"""
+        if name in sys.modules:
+            return sys.modules[name]
+        start = time.perf_counter()
+        module = importlib.import_module(name)
+        self.imports[name] = time.perf_counter() - start
+        return module
+
+    def mark(self, stage: str):
+        """Record that a startup stage finished (seconds since start)"""
+        self.stages[stage] = time.perf_counter() - self.started
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "stages_s": {stage: round(t, 4) for stage, t in self.stages.items()},
+            "imports_ms": {
+                name: round(t * 1000, 1)
+                for name, t in sorted(self.imports.items(), key=lambda item: -item[1])
+            },
+            "modules_loaded": len(sys.modules),
+        }
+
+
+startup_profile = StartupProfile()
@@ -2,6 +2,9 @@
 FastAPI Backend for Project Samarth
 Intelligent Q&A System for Agricultural & Climate Data
 """
+# Imported first: startup timings are measured from here
+from app.core.startup import startup_profile
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -10,9 +13,13 @@ import logging
 from typing import Dict, Any
 
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
 from app.api import chat, data, health
-from app.services.data_fetcher import DataFetcher
-from app.services.rag_service import RAGService
+from app.services.warmup import Warmup
+from app.services.cache import close_cache
+from app.services.admission import AdmissionController
+from app.services.coalescer import RequestCoalescer
+from app.services.llm_service import close_llm_clients
 
 # Configure logging
 logging.basicConfig(
@@ -26,24 +33,21 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("🚀 Starting Project Samarth Backend...")
+    startup_profile.mark("lifespan_start")
     
     # Initialize services
     try:
-        # Initialize data fetcher
-        data_fetcher = DataFetcher()
-        app.state.data_fetcher = data_fetcher
-        logger.info("✅ Data fetcher initialized")
-        
-        # Initialize RAG service
-        rag_service = RAGService()
-        await rag_service.initialize()
-        app.state.rag_service = rag_service
-        logger.info("✅ RAG service initialized")
+        # Admission control for the chat pipeline
+        app.state.admission = AdmissionController()
+        app.state.coalescer = RequestCoalescer()
         
-        # Load initial datasets
-        logger.info("📊 Loading initial datasets...")
-        await data_fetcher.load_initial_datasets()
-        logger.info("✅ Initial datasets loaded")
+        # Data services are created by the background warmup, which also
+        # loads datasets and builds the index: the app is live immediately
+        # and /ready reports when caches are hot
+        warmup = Warmup(app)
+        warmup.start()
+        app.state.warmup = warmup
+        startup_profile.mark("live")
         
     except Exception as e:
         logger.error(f"❌ Startup failed: {e}")
@@ -53,6 +57,9 @@ async def lifespan(app: FastAPI):
     
     # Cleanup
     logger.info("🛑 Shutting down Project Samarth Backend...")
+    await warmup.stop()
+    await close_llm_clients()
+    await close_cache()
 
 
 # Create FastAPI app
@@ -74,11 +81,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated gzip/brotli for JSON and NDJSON bodies
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.GZIP_LEVEL,
+        brotli_quality=settings.BROTLI_QUALITY
+    )
+
 # Include routers
 app.include_router(health.router, prefix="/api/v1", tags=["Health"])
 app.include_router(chat.router, prefix="/api/v1", tags=["Chat"])
 app.include_router(data.router, prefix="/api/v1", tags=["Data"])
 
+startup_profile.mark("app_import")
+
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
@@ -41,6 +41,12 @@ class ChatMessage(BaseModel):
     session_id: Optional[str] = None
 
 
+class BatchChatRequest(BaseModel):
+    """Batch of independent questions"""
+    questions: List[str] = Field(min_length=1)
+    max_concurrency: Optional[int] = Field(default=None, ge=1)
+
+
 class ChatResponse(BaseModel):
     """Response to a chat query"""
     answer: str
@@ -53,6 +59,7 @@ class ChatResponse(BaseModel):
     conversation_id: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
     visualizations: Optional[List[Dict[str, Any]]] = None
+    metadata: Optional[Dict[str, Any]] = None  # per-stage diagnostics (e.g. retrieval timings)
 
 
 class DatasetInfo(BaseModel):
@@ -76,15 +83,39 @@ class DataQuery(BaseModel):
     filters: Optional[Dict[str, Any]] = None
     limit: int = Field(default=100, le=1000)
     offset: int = Field(default=0, ge=0)
+    # Aggregate (mean/sum/count of every measure) per group instead of rows
+    group_by: Optional[List[str]] = None
+    # Answer from the dataset's stratified sample: rows are a random sample,
+    # aggregates and total_count are estimates with margins of error
+    approximate: bool = False
 
 
 class DataQueryResponse(BaseModel):
     """Response from data query"""
     dataset_id: str
     data: List[Dict[str, Any]]
-    total_count: int
+    total_count: int  # rows matching the filters, before grouping and paging
     returned_count: int
     metadata: DatasetInfo
+    # Sample size, confidence and total_count bounds of approximate answers
+    approximation: Optional[Dict[str, Any]] = None
+
+
+class SQLQueryRequest(BaseModel):
+    """Read-only SQL query over the cached datasets"""
+    query: str = Field(min_length=1, max_length=4000)
+    max_rows: Optional[int] = Field(default=None, ge=1)
+
+
+class SQLQueryResponse(BaseModel):
+    """Compact (columnar) result of a SQL query"""
+    columns: List[str]
+    rows: List[List[Any]]
+    row_count: int
+    truncated: bool  # more rows matched than max_rows / LIMIT allowed
+    scanned_rows: int
+    plan_cached: bool
+    processing_time: float
 
 
 class HealthResponse(BaseModel):
@@ -0,0 +1,136 @@
+"""
+Admission Control
+Bounded concurrency, queue-time-aware load shedding and request deadlines
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Absolute (time.monotonic) deadline of the request being processed
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "request_deadline", default=None
+)
+
+
+@contextmanager
+def deadline_scope(deadline: float):
+    """Set the request deadline for this task and the tasks it spawns"""
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time(cap: Optional[float] = None) -> Optional[float]:
+    """
+    Seconds left before the current request's deadline
+
+    Returns ``cap`` when no deadline is set, and never more than ``cap``.
+    Raises ``asyncio.TimeoutError`` once the deadline has passed so work
+    that can no longer be used is not started.
+    """
+    deadline = _deadline.get()
+    if deadline is None:
+        return cap
+
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise asyncio.TimeoutError("Request deadline exceeded")
+    return remaining if cap is None else min(cap, remaining)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency gate for the chat pipeline
+
+    At most ``MAX_CONCURRENT_REQUESTS`` requests run at once and at most
+    ``MAX_QUEUED_REQUESTS`` wait. A request is shed up front when its
+    expected queue time (from a moving average of service times) would not
+    leave it time to finish before its deadline.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: Optional[int] = None,
+        max_queued: Optional[int] = None,
+        max_queue_wait: Optional[float] = None
+    ):
+        self.max_concurrent = max_concurrent or settings.MAX_CONCURRENT_REQUESTS
+        self.max_queued = max_queued if max_queued is not None else settings.MAX_QUEUED_REQUESTS
+        self.max_queue_wait = max_queue_wait or settings.MAX_QUEUE_WAIT
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._active = 0
+        self._waiting = 0
+        self._service_time = 1.0  # EWMA of seconds per request
+        self.stats = {"admitted": 0, "rejected": 0, "timed_out_in_queue": 0}
+
+    def estimated_wait(self) -> float:
+        """Expected queue time for a request arriving now"""
+        if self._active < self.max_concurrent:
+            return 0.0
+        waves = self._waiting // self.max_concurrent + 1
+        return waves * self._service_time
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        self.stats["rejected"] += 1
+        logger.warning(f"Shedding request: {reason}")
+        return AdmissionRejected(reason, retry_after=max(1, math.ceil(retry_after)))
+
+    async def _wait_for_slot(self, deadline: Optional[float]):
+        """Queue for a slot unless the expected wait would blow the budget"""
+        budget = self.max_queue_wait
+        if deadline is not None:
+            # Leave at least one average service time to do the work
+            budget = min(budget, deadline - time.monotonic() - self._service_time)
+
+        expected = self.estimated_wait()
+        if self._waiting >= self.max_queued:
+            raise self._reject("queue full", expected)
+        if expected > budget:
+            raise self._reject(f"expected queue time {expected:.1f}s exceeds budget", expected)
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=max(budget, 0.001))
+        except asyncio.TimeoutError:
+            self.stats["timed_out_in_queue"] += 1
+            raise self._reject("timed out in queue", self.estimated_wait())
+        finally:
+            self._waiting -= 1
+
+    @asynccontextmanager
+    async def admit(self, deadline: Optional[float] = None):
+        """Wait for a slot, or raise AdmissionRejected"""
+        if self._semaphore.locked():
+            await self._wait_for_slot(deadline)
+        else:
+            # A slot is free: acquire without yielding to the event loop
+            await self._semaphore.acquire()
+
+        self._active += 1
+        self.stats["admitted"] += 1
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._semaphore.release()
+            elapsed = time.monotonic() - start
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
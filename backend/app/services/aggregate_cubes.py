@@ -0,0 +1,112 @@
+"""
+Aggregate Cubes
+Materialized rollups of each dataset at the grains used by query summaries
+"""
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Grains materialized for every dataset that has the columns: the
+# groupings QueryEngine._summary_grouping produces
+CUBE_GRAINS: List[Tuple[str, ...]] = [
+    ("State", "Year"),
+    ("State", "Crop", "Year"),
+]
+
+AGGREGATIONS = ["mean", "sum", "count"]
+
+# Numeric columns that are dimensions, not measures
+DIMENSION_COLUMNS = {"Year", "Month"}
+
+
+def aggregate_dataframe(df: pd.DataFrame, groupby_cols: List[str]) -> pd.DataFrame:
+    """
+    Group a dataframe and aggregate every numeric measure column
+
+    Grouping and dimension columns (Year, Month) are not aggregated. Output
+    columns are flattened to ``<column>_<aggregation>`` (e.g.
+    ``Production_sum``).
+    """
+    measure_cols = [
+        col for col in df.select_dtypes(include=["number"]).columns
+        if col not in groupby_cols and col not in DIMENSION_COLUMNS
+    ]
+    if not measure_cols:
+        return pd.DataFrame()
+
+    grouped = df.groupby(list(groupby_cols), observed=True)[measure_cols].agg(AGGREGATIONS)
+    summary_df = grouped.reset_index()
+
+    # Flatten multi-level columns
+    summary_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col
+                          for col in summary_df.columns]
+    return summary_df
+
+
+class CubeStore:
+    """Per-dataset aggregate cubes, rebuilt when the dataset version changes"""
+
+    def __init__(self):
+        self._cubes: Dict[str, Dict[Tuple[str, ...], pd.DataFrame]] = {}
+        self._versions: Dict[str, Any] = {}
+        self._columns: Dict[str, set] = {}
+
+    def refresh(self, dataset_key: str, df: pd.DataFrame, version: Any):
+        """
+        Build the cubes for a dataset unless this version is already built
+
+        Runs full group-bys; call it off the event loop.
+        """
+        if self._versions.get(dataset_key) == version:
+            return
+
+        cubes = {}
+        for grain in CUBE_GRAINS:
+            if all(col in df.columns for col in grain):
+                cube = aggregate_dataframe(df, list(grain))
+                if not cube.empty:
+                    cubes[grain] = cube
+
+        self._cubes[dataset_key] = cubes
+        self._versions[dataset_key] = version
+        self._columns[dataset_key] = set(df.columns)
+        logger.info(f"Built {len(cubes)} aggregate cubes for {dataset_key}")
+
+    def invalidate(self, dataset_key: str):
+        """Drop the cubes of a dataset"""
+        self._cubes.pop(dataset_key, None)
+        self._versions.pop(dataset_key, None)
+        self._columns.pop(dataset_key, None)
+
+    def lookup(
+        self,
+        dataset_key: str,
+        groupby_cols: List[str],
+        filters: Optional[Dict[str, Any]] = None
+    ) -> Optional[pd.DataFrame]:
+        """
+        Answer a grouped aggregate from a cube
+
+        Returns None unless a cube exists at exactly this grain and every
+        applicable filter is on a grain column (so filtering cube rows is
+        equivalent to filtering the raw rows before grouping).
+        """
+        cube = self._cubes.get(dataset_key, {}).get(tuple(groupby_cols))
+        if cube is None:
+            return None
+
+        columns = self._columns.get(dataset_key, set())
+        applicable = {col: value for col, value in (filters or {}).items() if col in columns}
+        if any(col not in groupby_cols for col in applicable):
+            return None
+
+        for column, value in applicable.items():
+            if isinstance(value, list):
+                cube = cube[cube[column].isin(value)]
+            else:
+                cube = cube[cube[column] == value]
+
+        return cube
@@ -0,0 +1,329 @@
+"""
+Analytics Service
+Aligns climate and crop datasets on State and Year and computes
+correlations, trends and rankings for correlation queries
+"""
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.core.config import settings
+from app.services.admission import remaining_time
+from app.services.data_fetcher import DataFetcher
+from app.services.data_normalizer import MONTH_NAMES
+
+logger = logging.getLogger(__name__)
+
+# IMD seasons, as month numbers
+SEASON_MONTHS = {
+    "winter": [1, 2],
+    "pre_monsoon": [3, 4, 5],
+    "monsoon": [6, 7, 8, 9],
+    "post_monsoon": [10, 11, 12],
+    "annual": list(range(1, 13)),
+}
+
+SEASON_KEYWORDS = {
+    "monsoon": ["monsoon", "kharif", "southwest"],
+    "pre_monsoon": ["pre-monsoon", "pre monsoon", "summer"],
+    "post_monsoon": ["post-monsoon", "post monsoon", "northeast", "retreating"],
+    "winter": ["winter", "rabi"],
+}
+
+# Climate measures and how monthly values roll up to a season
+CLIMATE_SOURCES = {
+    "rainfall_data": {"Rainfall_mm": "sum"},
+    "climate_data": {"Avg_Temperature": "mean", "Max_Temperature": "mean"},
+}
+
+# Crop datasets in order of preference, with their measures
+CROP_SOURCES = {
+    "crop_production": {"Production": "sum", "Area": "sum"},
+    "area_production": {"Production": "sum", "Area": "sum"},
+}
+
+CROP_METRICS = ["Production", "Yield"]
+
+MAX_ROWS = 25
+
+
+def detect_season(query: str) -> str:
+    """Pick the season a query refers to, defaulting to the whole year"""
+    text = query.lower()
+    # Check the more specific phrases first ("pre-monsoon" before "monsoon")
+    for season in ["pre_monsoon", "post_monsoon", "monsoon", "winter"]:
+        if any(keyword in text for keyword in SEASON_KEYWORDS[season]):
+            return season
+    return "annual"
+
+
+def grouped_moments(df: pd.DataFrame, keys: List[str], x: str, y: str) -> pd.DataFrame:
+    """
+    Per-group count, covariance and variances of two columns
+
+    Computed from grouped sums in one pass, so correlations and slopes for
+    every group come out of a single vectorized aggregation.
+    """
+    frame = pd.DataFrame({
+        "x": df[x].astype("float64"),
+        "y": df[y].astype("float64"),
+    })
+    for key in keys:
+        frame[key] = df[key].values
+    frame = frame.dropna()
+    frame["xy"] = frame["x"] * frame["y"]
+    frame["xx"] = frame["x"] ** 2
+    frame["yy"] = frame["y"] ** 2
+
+    sums = frame.groupby(keys, observed=True)[["x", "y", "xy", "xx", "yy"]].sum()
+    sums["n"] = frame.groupby(keys, observed=True).size()
+
+    moments = pd.DataFrame(index=sums.index)
+    moments["n"] = sums["n"]
+    moments["cov"] = sums["xy"] - sums["x"] * sums["y"] / sums["n"]
+    moments["var_x"] = sums["xx"] - sums["x"] ** 2 / sums["n"]
+    moments["var_y"] = sums["yy"] - sums["y"] ** 2 / sums["n"]
+    return moments
+
+
+def grouped_correlation(df: pd.DataFrame, keys: List[str], x: str, y: str) -> pd.DataFrame:
+    """Pearson correlation of x and y within each group"""
+    moments = grouped_moments(df, keys, x, y)
+    denominator = np.sqrt(moments["var_x"] * moments["var_y"])
+    moments["r"] = (moments["cov"] / denominator.where(denominator > 0)).round(4)
+    return moments.loc[moments["n"] >= 3, ["r", "n"]].reset_index()
+
+
+def grouped_trend(df: pd.DataFrame, keys: List[str], metric: str) -> pd.DataFrame:
+    """Least-squares slope of a metric per year within each group"""
+    moments = grouped_moments(df, keys, "Year", metric)
+    moments["slope_per_year"] = (moments["cov"] / moments["var_x"].where(moments["var_x"] > 0)).round(4)
+    return moments.loc[moments["n"] >= 3, ["slope_per_year", "n"]].reset_index()
+
+
+def _apply_filters(df: pd.DataFrame, filters: Dict[str, Any]) -> pd.DataFrame:
+    for column, values in filters.items():
+        if column in df.columns and values:
+            df = df[df[column].isin(values)]
+    return df
+
+
+def _records(df: pd.DataFrame, sort_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    if df.empty:
+        return []
+    if sort_by:
+        df = df.reindex(df[sort_by].abs().sort_values(ascending=False).index)
+    return df.head(MAX_ROWS).to_dict(orient="records")
+
+
+def correlation_statistics(
+    climate: pd.DataFrame,
+    crops: pd.DataFrame,
+    season: str,
+    datasets_used: List[str],
+    include_aligned: bool = False
+) -> Dict[str, Any]:
+    """
+    Align seasonal climate and crop frames on State and Year and compute
+    correlations, trends and rankings (empty dict if nothing aligns)
+    """
+    joined = crops.merge(climate, on=["State", "Year"], how="inner")
+    if joined.empty:
+        return {}
+
+    climate_metrics = [col for col in climate.columns if col not in ("State", "Year")]
+
+    correlations = []
+    overall = []
+    for climate_metric in climate_metrics:
+        for crop_metric in CROP_METRICS:
+            per_group = grouped_correlation(joined, ["State", "Crop"], climate_metric, crop_metric)
+            per_group.insert(2, "climate_metric", climate_metric)
+            per_group.insert(3, "crop_metric", crop_metric)
+            correlations.append(per_group)
+
+            pooled = grouped_correlation(joined, ["Crop"], climate_metric, crop_metric)
+            pooled.insert(1, "climate_metric", climate_metric)
+            pooled.insert(2, "crop_metric", crop_metric)
+            overall.append(pooled)
+
+    crop_trends = pd.concat(
+        [grouped_trend(crops, ["State", "Crop"], metric).assign(metric=metric)
+         for metric in CROP_METRICS],
+        ignore_index=True
+    )
+    climate_trends = pd.concat(
+        [grouped_trend(climate, ["State"], metric).assign(metric=metric)
+         for metric in climate_metrics],
+        ignore_index=True
+    )
+
+    state_means = joined.groupby("State", observed=True)[CROP_METRICS + climate_metrics].mean()
+    rankings = {
+        metric: state_means[metric].sort_values(ascending=False).round(2).head(10).to_dict()
+        for metric in CROP_METRICS + climate_metrics
+    }
+
+    result = {
+        "season": season,
+        "months": SEASON_MONTHS[season],
+        "years": [int(joined["Year"].min()), int(joined["Year"].max())],
+        "datasets_used": datasets_used,
+        "aligned_rows": len(joined),
+        "correlations_by_state_crop": _records(pd.concat(correlations, ignore_index=True), "r"),
+        "correlations_by_crop": _records(pd.concat(overall, ignore_index=True), "r"),
+        "crop_trends": _records(crop_trends, "slope_per_year"),
+        "climate_trends": _records(climate_trends, "slope_per_year"),
+        "state_rankings": rankings,
+    }
+    if include_aligned:
+        result["aligned"] = joined
+    return result
+
+
+def _seasonal_climate(
+    df: pd.DataFrame,
+    measures: Dict[str, str],
+    filters: Dict[str, Any],
+    months: List[int]
+) -> Optional[pd.DataFrame]:
+    """State/Year roll-up of one climate dataset over the season's months"""
+    df = _apply_filters(df, {k: v for k, v in filters.items() if k != "Crop"})
+    # Months are normalized to Jan..Dec on ingest
+    df = df[df["Month"].isin([MONTH_NAMES[m - 1] for m in months])]
+    if df.empty:
+        return None
+    return df.groupby(["State", "Year"], observed=True).agg(measures)
+
+
+def _crop_totals(
+    df: pd.DataFrame,
+    measures: Dict[str, str],
+    filters: Dict[str, Any]
+) -> Optional[pd.DataFrame]:
+    """State/Crop/Year totals and yield of one crop dataset"""
+    df = _apply_filters(df, filters)
+    if df.empty or not all(col in df.columns for col in measures):
+        return None
+
+    crops = df.groupby(["State", "Crop", "Year"], observed=True).agg(measures).reset_index()
+    crops["Yield"] = crops["Production"] / crops["Area"].where(crops["Area"] > 0)
+    return crops
+
+
+class CorrelationAnalyzer:
+    """Cross-dataset analytics for crop-climate correlation questions"""
+
+    def __init__(self, data_fetcher: DataFetcher):
+        self.data_fetcher = data_fetcher
+
+    async def analyze(
+        self,
+        required_data: Dict[str, Any],
+        query: str,
+        include_aligned: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Align climate and crop data and compute compact statistics
+
+        Args:
+            required_data: Entities from query decomposition
+            query: Original user question (used to detect the season)
+            include_aligned: Also return the aligned State/Crop/Year frame
+                under ``aligned`` (for charts; not meant for the LLM context)
+
+        Returns:
+            Dict of computed results, or an empty dict if no climate and
+            crop data could be aligned
+        """
+        season = detect_season(query)
+        filters = {
+            "State": required_data.get("states") or [],
+            "Crop": required_data.get("crops") or [],
+        }
+        period = required_data.get("time_period") or {}
+        if "start_year" in period and "end_year" in period:
+            filters["Year"] = list(range(period["start_year"], period["end_year"] + 1))
+
+        climate, climate_sources = await self._load_climate(season, filters)
+        crops, crop_source = await self._load_crops(filters)
+        if climate.empty or crops.empty:
+            return {}
+
+        # Alignment and statistics are CPU-bound; run them off the event loop,
+        # bounded like a single dataset retrieval
+        return await self._within_deadline(asyncio.to_thread(
+            correlation_statistics,
+            climate, crops, season, climate_sources + [crop_source], include_aligned
+        ))
+
+    @staticmethod
+    async def _within_deadline(awaitable):
+        """Bounded by both the per-dataset and the request deadline"""
+        return await asyncio.wait_for(
+            awaitable, timeout=remaining_time(settings.DATASET_RETRIEVAL_TIMEOUT)
+        )
+
+    async def _load_climate(self, season: str, filters: Dict[str, Any]):
+        """Seasonal State/Year climate measures from every climate dataset"""
+        frames = []
+        sources = []
+        months = SEASON_MONTHS[season]
+
+        for dataset_key, measures in CLIMATE_SOURCES.items():
+            try:
+                seasonal = await self._within_deadline(
+                    self._fetch_seasonal_climate(dataset_key, measures, filters, months)
+                )
+            except Exception as e:
+                logger.warning(f"Failed to load {dataset_key} for analysis: {e}")
+                continue
+
+            if seasonal is not None:
+                frames.append(seasonal)
+                sources.append(dataset_key)
+
+        if not frames:
+            return pd.DataFrame(), sources
+
+        climate = pd.concat(frames, axis=1, join="outer").reset_index()
+        return climate, sources
+
+    async def _fetch_seasonal_climate(
+        self,
+        dataset_key: str,
+        measures: Dict[str, str],
+        filters: Dict[str, Any],
+        months: List[int]
+    ) -> Optional[pd.DataFrame]:
+        df = await self.data_fetcher.fetch_dataset(dataset_key)
+        measures = {col: agg for col, agg in measures.items() if col in df.columns}
+        if not measures or "Month" not in df.columns:
+            return None
+        return await asyncio.to_thread(_seasonal_climate, df, measures, filters, months)
+
+    async def _load_crops(self, filters: Dict[str, Any]):
+        """State/Crop/Year production, area and yield from the first crop dataset"""
+        for dataset_key, measures in CROP_SOURCES.items():
+            try:
+                crops = await self._within_deadline(self._fetch_crop_totals(dataset_key, measures, filters))
+            except Exception as e:
+                logger.warning(f"Failed to load {dataset_key} for analysis: {e}")
+                continue
+
+            if crops is not None:
+                return crops, dataset_key
+
+        return pd.DataFrame(), None
+
+    async def _fetch_crop_totals(
+        self,
+        dataset_key: str,
+        measures: Dict[str, str],
+        filters: Dict[str, Any]
+    ) -> Optional[pd.DataFrame]:
+        df = await self.data_fetcher.fetch_dataset(dataset_key)
+        return await asyncio.to_thread(_crop_totals, df, measures, filters)
@@ -0,0 +1,439 @@
+"""
+Approximate Queries
+Stratified samples (by State/Year) and sketches maintained when a dataset
+is ingested, answering aggregates with error bounds without reading the
+full table
+"""
+import json
+import logging
+import os
+from pathlib import Path
+from statistics import NormalDist
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.arrow_query import to_records
+from app.services.sketches import HyperLogLog, TDigest
+
+logger = logging.getLogger(__name__)
+
+# Strata: every State/Year combination keeps its own sample
+STRATA_COLUMNS = ("State", "Year")
+
+# Numeric columns that are dimensions, not measures
+DIMENSION_COLUMNS = {"Year", "Month"}
+
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+
+# Scope of the dataset-wide sketches (the others are per State)
+ALL = "*"
+
+METADATA_KEY = b"samarth.sample"
+
+# Internal sample columns: stratum id, random priority, stratum population
+STRATUM, PRIORITY, POPULATION = "_stratum", "_priority", "_population"
+
+
+def _measure_columns(df: pd.DataFrame) -> List[str]:
+    return [
+        col for col in df.select_dtypes(include=["number"]).columns
+        if col not in DIMENSION_COLUMNS and not col.startswith("_")
+    ]
+
+
+def _category_columns(df: pd.DataFrame) -> List[str]:
+    return [
+        col for col in df.columns
+        if not col.startswith("_") and col not in DIMENSION_COLUMNS
+        and (isinstance(df[col].dtype, pd.CategoricalDtype) or df[col].dtype == object)
+    ]
+
+
+def _filter_frame(df: pd.DataFrame, filters: Optional[Dict[str, Any]]) -> pd.DataFrame:
+    """Same semantics as ``arrow_query.filter_mask``: unknown columns are ignored"""
+    for column, value in (filters or {}).items():
+        if column in df.columns:
+            df = df[df[column].isin(value if isinstance(value, list) else [value])]
+    return df
+
+
+class SampleBuilder:
+    """
+    One pass over a dataset's row batches: a stratified sample plus sketches
+
+    Each row gets a random priority and every stratum keeps the
+    ``per_stratum`` rows with the lowest priorities (bottom-k sampling),
+    which is a uniform sample within the stratum no matter how the rows
+    are split into batches. Stratum sizes are counted exactly. Measures get
+    t-digests and categorical columns HyperLogLogs, dataset-wide and per
+    State.
+    """
+
+    def __init__(self, per_stratum: int, seed: int = 0):
+        self.per_stratum = per_stratum
+        self.rng = np.random.default_rng(seed)
+        self.sample: Optional[pd.DataFrame] = None
+        self.strata_columns: Optional[List[str]] = None
+        self.population = pd.Series(dtype="int64")
+        self.rows = 0
+        self.digests: Dict[str, Dict[str, TDigest]] = {}
+        self.hlls: Dict[str, Dict[str, HyperLogLog]] = {}
+
+    def add(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        if self.strata_columns is None:
+            self.strata_columns = [col for col in STRATA_COLUMNS if col in df.columns]
+
+        df = df.assign(**{
+            STRATUM: self._stratum_ids(df),
+            PRIORITY: self.rng.random(len(df)),
+        })
+        self.rows += len(df)
+        self.population = self.population.add(df[STRATUM].value_counts(), fill_value=0).astype("int64")
+        self._update_sketches(df)
+
+        candidates = df if self.sample is None else pd.concat([self.sample, df], ignore_index=True)
+        self.sample = (
+            candidates.sort_values([STRATUM, PRIORITY])
+            .groupby(STRATUM, sort=False).head(self.per_stratum)
+            .reset_index(drop=True)
+        )
+
+    def _stratum_ids(self, df: pd.DataFrame) -> np.ndarray:
+        if not self.strata_columns:
+            return np.zeros(len(df), dtype=np.uint64)
+        # Value-based hashes, stable across batches with different categories
+        return pd.util.hash_pandas_object(df[self.strata_columns], index=False).to_numpy()
+
+    def _update_sketches(self, df: pd.DataFrame):
+        scopes: List[Tuple[str, Any]] = [(ALL, slice(None))]
+        if "State" in df.columns:
+            scopes += [
+                (str(state), positions)
+                for state, positions in df.groupby("State", observed=True).indices.items()
+            ]
+
+        for column in _measure_columns(df):
+            values = df[column].to_numpy(dtype="float64", na_value=np.nan)
+            digests = self.digests.setdefault(column, {})
+            for scope, positions in scopes:
+                digests.setdefault(scope, TDigest()).update(values[positions])
+
+        for column in _category_columns(df):
+            hashes = pd.util.hash_pandas_object(df[column], index=False).to_numpy()
+            valid = df[column].notna().to_numpy()
+            hlls = self.hlls.setdefault(column, {})
+            for scope, positions in scopes:
+                hlls.setdefault(scope, HyperLogLog()).add_hashes(hashes[positions][valid[positions]])
+
+    def finish(self, version: str) -> Optional["DatasetSample"]:
+        if self.sample is None:
+            return None
+        sample = self.sample
+        # Batches with different categories concatenate to object columns
+        for column in _category_columns(sample):
+            if sample[column].dtype == object:
+                sample[column] = sample[column].astype("category")
+        sample[POPULATION] = sample[STRATUM].map(self.population).astype("int64")
+        return DatasetSample(sample, self.digests, self.hlls, version, self.rows)
+
+
+class DatasetSample:
+    """Stratified sample and sketches of one dataset version"""
+
+    def __init__(
+        self,
+        frame: pd.DataFrame,
+        digests: Dict[str, Dict[str, TDigest]],
+        hlls: Dict[str, Dict[str, HyperLogLog]],
+        version: str,
+        population_rows: int
+    ):
+        self.frame = frame
+        self.digests = digests
+        self.hlls = hlls
+        self.version = version
+        self.population_rows = population_rows
+        # Stratum population N_h and sample size n_h
+        self.strata = frame.groupby(STRATUM, sort=False).agg(
+            population=(POPULATION, "first"), sampled=(POPULATION, "size")
+        )
+
+    @property
+    def columns(self) -> List[str]:
+        return [col for col in self.frame.columns if not col.startswith("_")]
+
+    @property
+    def sample_rows(self) -> int:
+        return len(self.frame)
+
+    def describe(self, confidence: float) -> Dict[str, Any]:
+        return {
+            "method": "stratified_sample",
+            "strata": list(self.frame.columns.intersection(STRATA_COLUMNS)),
+            "confidence": confidence,
+            "population_rows": self.population_rows,
+            "sample_rows": self.sample_rows,
+        }
+
+    def rows(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        offset: int = 0,
+        limit: int = 100
+    ) -> List[Dict[str, Any]]:
+        """Sampled rows matching the filters, in random (priority) order"""
+        rows = _filter_frame(self.frame, filters).sort_values(PRIORITY)
+        rows = rows.iloc[offset:offset + limit][self.columns]
+        return to_records(pa.Table.from_pandas(rows, preserve_index=False))
+
+    def estimate(
+        self,
+        filters: Optional[Dict[str, Any]] = None,
+        group_by: Optional[List[str]] = None,
+        measures: Optional[List[str]] = None,
+        confidence: float = 0.95
+    ) -> List[Dict[str, Any]]:
+        """
+        Estimated counts, sums and means per group with margins of error
+
+        Stratified (Horvitz-Thompson) estimators over the matching sample
+        rows: each row stands for ``N_h / n_h`` rows of its stratum.
+        Margins are ``z * standard error`` at ``confidence`` (finite
+        population corrected, so fully sampled strata are exact); means
+        are ratio estimates with linearized variances. Output columns
+        mirror ``aggregate_table``: the group keys, ``count``, then
+        ``<measure>_mean`` / ``_sum`` / ``_count``, each with a ``_moe``.
+        """
+        group_by = [col for col in group_by or [] if col in self.frame.columns]
+        if measures is None:
+            measures = _measure_columns(self.frame)
+        measures = [m for m in measures if m in self.frame.columns]
+        rows = _filter_frame(self.frame, filters)
+        if rows.empty:
+            return []
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2)
+        parts = pd.DataFrame({STRATUM: rows[STRATUM].to_numpy(), "c": 1.0})
+        for key in group_by:
+            parts[key] = rows[key].to_numpy()
+        for m in measures:
+            values = rows[m].to_numpy(dtype="float64", na_value=np.nan)
+            present = ~np.isnan(values)
+            parts[f"{m}:s1"] = np.where(present, values, 0.0)
+            parts[f"{m}:s2"] = np.where(present, values ** 2, 0.0)
+            parts[f"{m}:c"] = present.astype("float64")
+
+        # Per (group, stratum) sums over the matching rows
+        keys = group_by + [STRATUM]
+        sums = parts.groupby(keys, observed=True, sort=False).sum().reset_index()
+        sums = sums.join(self.strata, on=STRATUM)
+        weight = sums["population"] / sums["sampled"]
+        # N_h^2 (1 - n_h/N_h) / n_h, with the sample variance's 1 / (n_h - 1)
+        factor = (
+            sums["population"] ** 2 * (1 - sums["sampled"] / sums["population"]) / sums["sampled"]
+            / (sums["sampled"] - 1).where(sums["sampled"] > 1)
+        ).fillna(0.0)
+
+        def domain_variance(s1: pd.Series, s2: pd.Series) -> pd.Series:
+            # Non-matching sample rows of the stratum count as zeros
+            return factor * (s2 - s1 ** 2 / sums["sampled"]).clip(lower=0)
+
+        # Group codes (sorted by the keys) for bincount sums
+        if group_by:
+            codes = sums.groupby(group_by, observed=True, sort=True).ngroup().to_numpy()
+        else:
+            codes = np.zeros(len(sums), dtype=np.int64)
+        groups = int(codes.max()) + 1
+
+        def per_group(values: pd.Series) -> np.ndarray:
+            return np.bincount(codes, weights=values.to_numpy(dtype="float64"), minlength=groups)
+
+        columns = {"count": per_group(weight * sums["c"])}
+        variances = {"count": per_group(domain_variance(sums["c"], sums["c"]))}
+        for m in measures:
+            s1, s2, c = sums[f"{m}:s1"], sums[f"{m}:s2"], sums[f"{m}:c"]
+            total = per_group(weight * s1)
+            count = per_group(weight * c)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(count > 0, total / count, np.nan)
+            # Ratio estimate of the mean, linearized: u = y - R over present values
+            ratio = pd.Series(mean[codes], index=sums.index).fillna(0.0)
+            mean_variance = per_group(domain_variance(s1 - ratio * c, s2 - 2 * ratio * s1 + ratio ** 2 * c))
+            columns[f"{m}_mean"] = mean
+            with np.errstate(invalid="ignore", divide="ignore"):
+                variances[f"{m}_mean"] = np.where(count > 0, mean_variance / count ** 2, np.nan)
+            columns[f"{m}_sum"] = total
+            variances[f"{m}_sum"] = per_group(domain_variance(s1, s2))
+            columns[f"{m}_count"] = count
+            variances[f"{m}_count"] = per_group(domain_variance(c, c))
+
+        _, first = np.unique(codes, return_index=True)
+        records = sums.iloc[first][group_by].to_dict(orient="records") if group_by else [{}]
+        for name, values in columns.items():
+            margins = z * np.sqrt(variances[name])
+            for record, value, margin in zip(records, values, margins):
+                record[name] = None if np.isnan(value) else round(float(value), 4)
+                record[f"{name}_moe"] = None if np.isnan(margin) else round(float(margin), 4)
+        return records
+
+    def statistics(self, filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Summary statistics from the sketches: distinct counts (HyperLogLog)
+        and quantiles (t-digest) of every column
+
+        Sketches exist dataset-wide and per State, so a State filter is
+        honoured (by merging the states' sketches); other filters are not,
+        which ``scope`` reports.
+        """
+        states = (filters or {}).get("State")
+        if states is not None and not isinstance(states, list):
+            states = [states]
+        scopes = [str(state) for state in states] if states else [ALL]
+
+        result: Dict[str, Any] = {"scope": "State" if states else "dataset", "columns": {}}
+        for column, by_scope in self.digests.items():
+            digests = [by_scope[scope] for scope in scopes if scope in by_scope]
+            if not digests:
+                continue
+            digest = digests[0]
+            for other in digests[1:]:
+                digest = digest.merge(other)
+            quantiles = digest.quantiles(QUANTILES)
+            result["columns"][column] = {
+                "count": int(digest.count),
+                "min": digest.min,
+                "mean": round(digest.mean(), 4),
+                **{f"p{int(q * 100)}": round(v, 4) for q, v in zip(QUANTILES, quantiles)},
+                "max": digest.max,
+            }
+        for column, by_scope in self.hlls.items():
+            hlls = [by_scope[scope] for scope in scopes if scope in by_scope]
+            if not hlls:
+                continue
+            hll = hlls[0]
+            for other in hlls[1:]:
+                hll = hll.merge(other)
+            result["columns"][column] = {
+                "distinct": int(round(hll.estimate())),
+                "relative_error": round(hll.relative_error, 4),
+            }
+        return result
+
+    def save(self, sample_path: Path, sketch_path: Path):
+        """Write the sample (parquet) and sketches (npz), each swapped in atomically"""
+        table = pa.Table.from_pandas(self.frame, preserve_index=False)
+        metadata = dict(table.schema.metadata or {})
+        metadata[METADATA_KEY] = json.dumps({
+            "version": self.version, "population_rows": self.population_rows,
+        }).encode("utf-8")
+        tmp_path = sample_path.with_suffix(".tmp")
+        pq.write_table(table.replace_schema_metadata(metadata), tmp_path)
+        os.replace(tmp_path, sample_path)
+
+        arrays = {"version": np.array(self.version)}
+        for column, by_scope in self.digests.items():
+            for scope, digest in by_scope.items():
+                arrays[f"tdigest|{column}|{scope}"] = digest.to_array()
+        for column, by_scope in self.hlls.items():
+            for scope, hll in by_scope.items():
+                arrays[f"hll|{column}|{scope}"] = hll.registers
+        tmp_path = sketch_path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, sketch_path)
+
+    @classmethod
+    def load(cls, sample_path: Path, sketch_path: Path) -> Optional["DatasetSample"]:
+        """Read a saved sample; None if missing or the two files are from different versions"""
+        if not sample_path.exists() or not sketch_path.exists():
+            return None
+        table = pq.read_table(sample_path)
+        info = json.loads(table.schema.metadata[METADATA_KEY])
+        digests: Dict[str, Dict[str, TDigest]] = {}
+        hlls: Dict[str, Dict[str, HyperLogLog]] = {}
+        with np.load(sketch_path, allow_pickle=False) as arrays:
+            if str(arrays["version"]) != info["version"]:
+                return None
+            for name in arrays.files:
+                if name == "version":
+                    continue
+                kind, column, scope = name.split("|", 2)
+                if kind == "tdigest":
+                    digests.setdefault(column, {})[scope] = TDigest.from_array(arrays[name])
+                else:
+                    hlls.setdefault(column, {})[scope] = HyperLogLog(registers=arrays[name].copy())
+        return cls(table.to_pandas(), digests, hlls, info["version"], info["population_rows"])
+
+
+class SampleStore:
+    """
+    Samples of the cached datasets, persisted next to the parquet cache
+
+    Built when a dataset is fetched or ingested and shared by every worker
+    through the sidecar files; each worker keeps the current version in
+    memory.
+    """
+
+    def __init__(self, cache_dir: Path, per_stratum: int):
+        self.cache_dir = Path(cache_dir)
+        self.per_stratum = per_stratum
+        self._samples: Dict[str, DatasetSample] = {}
+
+    def _paths(self, dataset_key: str) -> Tuple[Path, Path]:
+        return (
+            self.cache_dir / f"{dataset_key}.sample.parquet",
+            self.cache_dir / f"{dataset_key}.sketches.npz",
+        )
+
+    def build(self, dataset_key: str, batches: Iterable[pd.DataFrame], version: str) -> Optional[DatasetSample]:
+        """Sample and sketch ``batches`` (one pass), save and keep the result"""
+        builder = SampleBuilder(self.per_stratum)
+        for df in batches:
+            builder.add(df)
+        sample = builder.finish(version)
+        if sample is None:
+            return None
+        sample.save(*self._paths(dataset_key))
+        self._samples[dataset_key] = sample
+        logger.info(
+            f"Sampled {dataset_key}: {sample.sample_rows:,} of {sample.population_rows:,} rows "
+            f"in {len(sample.strata):,} strata"
+        )
+        return sample
+
+    def build_from_files(
+        self,
+        dataset_key: str,
+        paths: List[Path],
+        version: str,
+        batch_rows: int
+    ) -> Optional[DatasetSample]:
+        """Build from parquet files, streamed in ``batch_rows`` batches"""
+        def batches():
+            for path in paths:
+                for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+                    yield batch.to_pandas()
+        return self.build(dataset_key, batches(), version)
+
+    def get(self, dataset_key: str, version: str) -> Optional[DatasetSample]:
+        """The sample of this data version, from memory or the sidecar files"""
+        sample = self._samples.get(dataset_key)
+        if sample is not None and sample.version == version:
+            return sample
+        try:
+            sample = DatasetSample.load(*self._paths(dataset_key))
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable sample of {dataset_key}: {e}")
+            return None
+        if sample is None or sample.version != version:
+            return None
+        self._samples[dataset_key] = sample
+        return sample
+
+    def invalidate(self, dataset_key: str):
+        self._samples.pop(dataset_key, None)
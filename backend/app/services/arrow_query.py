@@ -0,0 +1,302 @@
+"""
+Arrow Query
+Filter, project, sort, aggregate and limit datasets as ``pyarrow.Table``s with
+``pyarrow.compute``; Python objects are only built by ``to_records``
+"""
+import logging
+from typing import List, Dict, Any, Callable, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.types as pa_types
+
+from app.services.aggregate_cubes import AGGREGATIONS, DIMENSION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# (column, "ascending" | "descending")
+SortKey = Tuple[str, str]
+
+
+def _value_set(column: pa.ChunkedArray, values: Sequence[Any]) -> Optional[pa.Array]:
+    """Filter values as an array of the column's (value) type, None if they cannot match"""
+    value_type = column.type.value_type if pa_types.is_dictionary(column.type) else column.type
+    try:
+        return pa.array(list(values)).cast(value_type)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        return None
+
+
+def filter_mask(table: pa.Table, filters: Optional[Dict[str, Any]]) -> Optional[pa.ChunkedArray]:
+    """
+    Boolean mask for ``{column: value | [values]}`` equality filters
+
+    Same semantics as the pandas path: filters on columns the table does
+    not have are ignored, a list matches any of its values. Returns None
+    when nothing applies.
+    """
+    mask = None
+    for column_name, value in (filters or {}).items():
+        if column_name not in table.column_names:
+            continue
+        column = table.column(column_name)
+        values = _value_set(column, value if isinstance(value, list) else [value])
+        if values is None:
+            condition = pa.array(np.zeros(table.num_rows, dtype=bool))
+        elif pa_types.is_dictionary(column.type):
+            condition = _dictionary_is_in(column, values)
+        else:
+            condition = pc.is_in(column, value_set=values)
+        mask = condition if mask is None else pc.and_(mask, condition)
+    return mask
+
+
+def _dictionary_predicate(column: pa.ChunkedArray, predicate: Callable) -> pa.ChunkedArray:
+    """Evaluate a predicate on the (small) dictionary once and look rows up by index"""
+    return pa.chunked_array([
+        pc.fill_null(pc.take(predicate(chunk.dictionary), chunk.indices), False)
+        for chunk in column.chunks
+    ], pa.bool_())
+
+
+def _dictionary_is_in(column: pa.ChunkedArray, values: pa.Array) -> pa.ChunkedArray:
+    return _dictionary_predicate(column, lambda dictionary: pc.is_in(dictionary, value_set=values))
+
+
+def _category_ranks(dictionary: pa.Array) -> pa.Array:
+    """Position of each category: the order of an ordered dictionary"""
+    return pa.array(np.arange(len(dictionary)))
+
+
+def _category_rank(dictionary: pa.Array, value: Any) -> int:
+    """Position of ``value`` among the categories (TypeError if it is not one)"""
+    position = pc.index(dictionary, pa.scalar(value).cast(dictionary.type)).as_py()
+    if position < 0:
+        raise TypeError(f"{value!r} is not one of the ordered categories")
+    return position
+
+
+COMPARISONS = {
+    "=": pc.equal,
+    "!=": pc.not_equal,
+    "<": pc.less,
+    "<=": pc.less_equal,
+    ">": pc.greater,
+    ">=": pc.greater_equal,
+}
+
+
+def compare(column: pa.ChunkedArray, op: str, value: Any) -> pa.ChunkedArray:
+    """
+    Boolean mask for ``column <op> value`` (``op`` from ``COMPARISONS``, or
+    ``in`` / ``not in`` with a list of values)
+
+    Ordered categoricals (e.g. Month) compare by category order, not
+    alphabetically; ranges on unordered categoricals are rejected. Raises
+    ``TypeError`` when the value cannot be compared with the column.
+    """
+    if op in ("in", "not in"):
+        values = _value_set(column, value)
+        if values is None:
+            raise TypeError(f"cannot compare {column.type} with {value!r}")
+        if pa_types.is_dictionary(column.type):
+            mask = _dictionary_is_in(column, values)
+        else:
+            mask = pc.is_in(column, value_set=values)
+        return pc.invert(mask) if op == "not in" else mask
+
+    function = COMPARISONS[op]
+    try:
+        if pa_types.is_dictionary(column.type):
+            if op in ("=", "!="):
+                return _dictionary_predicate(column, lambda dictionary: function(dictionary, value))
+            if not column.type.ordered:
+                raise TypeError(f"{op} needs ordered categories, {column.type} is unordered")
+            return _dictionary_predicate(
+                column,
+                lambda dictionary: function(_category_ranks(dictionary), _category_rank(dictionary, value))
+            )
+        return pc.fill_null(function(column, value), False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as e:
+        raise TypeError(f"cannot compare {column.type} with {value!r}") from e
+
+
+def filter_table(table: pa.Table, filters: Optional[Dict[str, Any]]) -> pa.Table:
+    mask = filter_mask(table, filters)
+    return table if mask is None else table.filter(mask)
+
+
+def _sort_key(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Sortable stand-in for a column
+
+    Dictionary columns cannot be sorted directly; rank the (small)
+    dictionary by value and sort by each row's rank instead of decoding.
+    Ordered dictionaries (e.g. Month) sort in category order, like pandas.
+    """
+    if not pa_types.is_dictionary(column.type):
+        return column
+    column = column.unify_dictionaries() if column.num_chunks > 1 else column
+    if column.num_chunks == 0:
+        return pa.chunked_array([], pa.uint64())
+    if column.type.ordered:
+        return pa.chunked_array([chunk.indices for chunk in column.chunks])
+    dictionary = column.chunk(0).dictionary
+    ranks = pc.rank(dictionary, sort_keys="ascending")
+    return pa.chunked_array([pc.take(ranks, chunk.indices) for chunk in column.chunks])
+
+
+def sort_table(table: pa.Table, order_by: Sequence[SortKey]) -> pa.Table:
+    """Sort by ``[(column, "ascending" | "descending"), ...]``"""
+    order_by = [(name, order) for name, order in order_by if name in table.column_names]
+    if not order_by:
+        return table
+    keys = pa.table({
+        f"k{i}": _sort_key(table.column(name)) for i, (name, _) in enumerate(order_by)
+    })
+    indices = pc.sort_indices(
+        keys, sort_keys=[(f"k{i}", order) for i, (_, order) in enumerate(order_by)]
+    )
+    return table.take(indices)
+
+
+def nan_to_null(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Aggregations skip nulls but not NaN; pandas skips both"""
+    if pa_types.is_floating(column.type) and pc.any(pc.is_nan(column)).as_py():
+        return pc.if_else(pc.is_nan(column), pa.scalar(None, column.type), column)
+    return column
+
+
+def aggregate_table(table: pa.Table, groupby_cols: List[str]) -> pa.Table:
+    """
+    Group and aggregate every numeric measure column
+
+    Mirrors ``aggregate_dataframe``: output columns are the group keys then
+    ``<column>_<aggregation>``, rows sorted by the keys.
+    """
+    measure_cols = [
+        field.name for field in table.schema
+        if (pa_types.is_integer(field.type) or pa_types.is_floating(field.type))
+        and field.name not in groupby_cols and field.name not in DIMENSION_COLUMNS
+    ]
+    if not measure_cols:
+        return pa.table({})
+
+    for name in measure_cols:
+        table = table.set_column(
+            table.schema.get_field_index(name), name, nan_to_null(table.column(name))
+        )
+    grouped = table.group_by(groupby_cols).aggregate(
+        [(name, aggregation) for name in measure_cols for aggregation in AGGREGATIONS]
+    )
+    columns = list(groupby_cols) + [
+        f"{name}_{aggregation}" for name in measure_cols for aggregation in AGGREGATIONS
+    ]
+    return sort_table(grouped.select(columns), [(col, "ascending") for col in groupby_cols])
+
+
+def sample_table(table: pa.Table, n: int, seed: Optional[int] = None) -> pa.Table:
+    """Up to ``n`` random rows, without replacement"""
+    if table.num_rows <= n:
+        return table
+    indices = np.random.default_rng(seed).choice(table.num_rows, size=n, replace=False)
+    return table.take(pa.array(np.sort(indices)))
+
+
+def query_table(
+    table: pa.Table,
+    filters: Optional[Dict[str, Any]] = None,
+    columns: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    order_by: Optional[Sequence[SortKey]] = None,
+    limit: Optional[int] = None
+) -> pa.Table:
+    """
+    Run filter -> group-by aggregate -> project -> sort -> limit
+
+    Every step returns a ``pyarrow.Table``; filtered and sliced tables share
+    buffers with the input where Arrow allows it.
+    """
+    return query_table_counted(table, filters, columns, group_by, order_by, limit)[0]
+
+
+def query_table_counted(
+    table: pa.Table,
+    filters: Optional[Dict[str, Any]] = None,
+    columns: Optional[List[str]] = None,
+    group_by: Optional[List[str]] = None,
+    order_by: Optional[Sequence[SortKey]] = None,
+    limit: Optional[int] = None
+) -> Tuple[pa.Table, int]:
+    """``query_table`` plus the number of rows matching the filters (before
+    grouping and the limit), counted in the same pass"""
+    if limit is not None and not group_by and not order_by:
+        # Take the first matching rows without filtering the whole table
+        mask = filter_mask(table, filters)
+        if mask is None:
+            matching = table.num_rows
+            table = table.slice(0, limit)
+        else:
+            matching = pc.sum(mask).as_py() or 0
+            table = table.take(pc.indices_nonzero(mask).slice(0, limit))
+        table = table.select([col for col in columns if col in table.column_names]) if columns else table
+        return table, matching
+
+    table = filter_table(table, filters)
+    matching = table.num_rows
+    group_by = [col for col in group_by or [] if col in table.column_names]
+    if group_by:
+        table = aggregate_table(table, group_by)
+    if columns:
+        table = table.select([col for col in columns if col in table.column_names])
+    return sort_limit(table, order_by, limit), matching
+
+
+def sort_limit(
+    table: pa.Table,
+    order_by: Optional[Sequence[SortKey]] = None,
+    limit: Optional[int] = None
+) -> pa.Table:
+    """Sort (if asked) and keep the first ``limit`` rows"""
+    if order_by:
+        name, order = order_by[0]
+        if limit is not None and len(order_by) == 1 and name in table.column_names \
+                and table.num_rows > limit:
+            # Top-k selection before sorting just those rows
+            indices = pc.select_k_unstable(
+                pa.table({"k": _sort_key(table.column(name))}), k=limit, sort_keys=[("k", order)]
+            )
+            table = table.take(indices)
+        table = sort_table(table, order_by)
+    if limit is not None:
+        table = table.slice(0, limit)
+    return table
+
+
+def _python_floats(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """
+    Floats ready for JSON: NaN as null, and float32 widened through its
+    shortest decimal form, so 3.15 stays 3.15 instead of 3.1500000953674316
+    """
+    if pa_types.is_float32(column.type):
+        column = column.cast(pa.string()).cast(pa.float64())
+    return nan_to_null(column)
+
+
+def to_records(table: pa.Table) -> List[Dict[str, Any]]:
+    """Materialize rows as Python dicts (NaN becomes None, as for nulls)"""
+    for i, field in enumerate(table.schema):
+        if pa_types.is_floating(field.type):
+            column = _python_floats(table.column(i))
+            table = table.set_column(i, field.with_type(column.type), column)
+    return table.to_pylist()
+
+
+def to_rows(table: pa.Table) -> List[List[Any]]:
+    """Materialize rows as lists in column order, the compact form of ``to_records``"""
+    columns = [
+        _python_floats(column).to_pylist() if pa_types.is_floating(column.type) else column.to_pylist()
+        for column in table.columns
+    ]
+    return [list(row) for row in zip(*columns)]
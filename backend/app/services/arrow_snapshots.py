@@ -0,0 +1,117 @@
+"""
+Arrow Snapshots
+Versioned Arrow IPC (Feather v2) copies of the cached datasets that every
+worker process memory-maps read-only instead of decoding its own copy
+"""
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.types as pa_types
+
+logger = logging.getLogger(__name__)
+
+
+class ArrowSnapshotStore:
+    """
+    Publishes and maps Arrow IPC snapshots of datasets
+
+    Each publish writes a new immutable ``<key>.<version>.arrow`` file and
+    then atomically swaps the ``<key>.arrow.current`` pointer to it, so
+    readers always map a complete file. Files are written uncompressed so
+    mapped buffers back the pandas columns without a decode: the page cache
+    holds one copy shared by every worker. A process keeps its mapping
+    until the last frame built from it is dropped, so superseded files are
+    simply unlinked; on POSIX the pages stay valid for existing mappings.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+
+    def _pointer_path(self, dataset_key: str) -> Path:
+        return self.directory / f"{dataset_key}.arrow.current"
+
+    def current(self, dataset_key: str) -> Optional[str]:
+        """File name of the published snapshot (None if never published)"""
+        try:
+            return self._pointer_path(dataset_key).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def load(self, dataset_key: str) -> Optional[Tuple[str, pa.Table, pd.DataFrame]]:
+        """
+        Map the current snapshot
+
+        Returns ``(version, table, frame)`` where the table and the frame's
+        numeric columns are views over the mapped file, or None if no
+        snapshot has been published (or it was removed underneath us).
+        """
+        version = self.current(dataset_key)
+        if version is None:
+            return None
+        try:
+            source = pa.memory_map(str(self.directory / version), "r")
+        except FileNotFoundError:
+            return None
+        table = pa.ipc.open_file(source).read_all()
+        # split_blocks keeps one block per column so null-free numeric
+        # columns are zero-copy views; categoricals only copy their codes
+        df = table.to_pandas(split_blocks=True)
+        return version, table, df
+
+    def publish(self, dataset_key: str, df: pd.DataFrame) -> str:
+        """Write a new snapshot version, swap the pointer and prune old files"""
+        previous = self.current(dataset_key)
+        version = f"{dataset_key}.{time.time_ns()}-{os.getpid()}.arrow"
+        path = self.directory / version
+
+        tmp_path = path.with_suffix(".arrow.tmp")
+        # One record batch: pandas would have to concatenate (copy) chunks
+        feather.write_feather(
+            _to_table(df), tmp_path, compression="uncompressed", chunksize=max(len(df), 1)
+        )
+        os.replace(tmp_path, path)
+
+        pointer = self._pointer_path(dataset_key)
+        tmp_pointer = pointer.with_suffix(f".current.{os.getpid()}.tmp")
+        tmp_pointer.write_text(version)
+        os.replace(tmp_pointer, pointer)
+
+        self._prune(dataset_key, keep={version, previous})
+        logger.info(f"Published Arrow snapshot {version}")
+        return version
+
+    def invalidate(self, dataset_key: str):
+        """
+        Withdraw the published snapshot after the cache was replaced
+
+        Readers fall back to the parquet cache and publish a new snapshot.
+        """
+        self._pointer_path(dataset_key).unlink(missing_ok=True)
+        self._prune(dataset_key, keep=set())
+
+    def _prune(self, dataset_key: str, keep: set):
+        """Unlink snapshots older than the current and previous versions"""
+        for path in self.directory.glob(f"{dataset_key}.*.arrow"):
+            if path.name not in keep and path.name.split(".")[0] == dataset_key:
+                path.unlink(missing_ok=True)
+
+
+def _to_table(df: pd.DataFrame) -> pa.Table:
+    """
+    Convert a normalized frame to Arrow, keeping NaN as float values
+
+    ``from_pandas`` turns NaN into nulls, and a float column with a validity
+    bitmap has to be copied to rebuild the NaNs when read back into pandas.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa_types.is_floating(field.type) and table.column(i).null_count:
+            values = pa.array(df[field.name].to_numpy(), type=field.type, from_pandas=False)
+            table = table.set_column(i, field, values)
+    return table
@@ -0,0 +1,107 @@
+"""
+Batch Runner
+Answers a list of questions with bounded concurrency, streaming results
+as they complete
+"""
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from app.core.config import settings
+from app.services.admission import AdmissionController, AdmissionRejected, deadline_scope
+from app.services.coalescer import RequestCoalescer
+from app.services.query_engine import QueryEngine
+
+logger = logging.getLogger(__name__)
+
+
+class BatchRunner:
+    """
+    Runs many questions through the query pipeline
+
+    At most ``max_concurrency`` questions of a batch are processed at once,
+    each under its own ``QUERY_TIMEOUT`` deadline. Given the app's
+    ``admission`` controller, questions are admitted like chat requests, so
+    concurrent batches share ``MAX_CONCURRENT_REQUESTS``. Repeated questions
+    are answered once; dataset loads, vector searches and decompositions
+    shared between different questions are deduplicated by the services
+    themselves.
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], QueryEngine],
+        max_concurrency: Optional[int] = None,
+        coalescer: Optional[RequestCoalescer] = None,
+        admission: Optional[AdmissionController] = None
+    ):
+        self.engine_factory = engine_factory
+        self.max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        self.coalescer = coalescer or RequestCoalescer()
+        self.admission = admission
+
+    async def run(self, questions: List[str]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield one result per question, in completion order
+
+        Each result has ``index``, ``question``, ``status`` ("ok" or
+        "error"), ``elapsed`` seconds and either ``response`` (the
+        ChatResponse as JSON-ready data) or ``error`` (plus ``retry_after``
+        seconds when the server shed the question).
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        engine = self.engine_factory()
+
+        async def answer(question: str):
+            async with semaphore:
+                deadline = time.monotonic() + settings.QUERY_TIMEOUT
+                if self.admission is None:
+                    return await process(question, deadline)
+                async with self.admission.admit(deadline):
+                    return await process(question, deadline)
+
+        async def process(question: str, deadline: float):
+            with deadline_scope(deadline):
+                return await asyncio.wait_for(
+                    engine.process_query(user_query=question),
+                    timeout=deadline - time.monotonic()
+                )
+
+        async def run_one(index: int, question: str) -> Dict[str, Any]:
+            start = time.monotonic()
+            result: Dict[str, Any] = {"index": index, "question": question}
+            try:
+                response, shared = await self.coalescer.run(
+                    self.coalescer.key(question), lambda: answer(question)
+                )
+                if shared:
+                    # Repeated question: same answer, its own conversation
+                    response = response.model_copy(
+                        update={"conversation_id": str(uuid.uuid4())}
+                    )
+                result["status"] = "ok"
+                result["response"] = response.model_dump(mode="json")
+            except AdmissionRejected as e:
+                result["status"] = "error"
+                result["error"] = f"Server busy: {e}"
+                result["retry_after"] = e.retry_after
+            except asyncio.TimeoutError:
+                result["status"] = "error"
+                result["error"] = "Query timed out"
+            except Exception as e:
+                logger.warning(f"Batch question {index} failed: {e}")
+                result["status"] = "error"
+                result["error"] = str(e)
+            result["elapsed"] = round(time.monotonic() - start, 3)
+            return result
+
+        tasks = [asyncio.ensure_future(run_one(i, q)) for i, q in enumerate(questions)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,253 @@
+"""
+Cache Service
+Two-tier cache: an in-process LRU in front of a shared Redis-protocol store
+"""
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+# Value encodings, stored as a one-byte prefix
+ARROW_PREFIX = b"A"
+MSGPACK_PREFIX = b"M"
+JSON_PREFIX = b"J"
+
+
+def _default(value: Any) -> Any:
+    """Fallback encoder for numpy scalars, timestamps and the like"""
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def serialize(value: Any) -> bytes:
+    """Encode DataFrames as Arrow IPC and everything else as msgpack (or JSON)"""
+    if type(value).__name__ == "DataFrame":
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(value, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return ARROW_PREFIX + sink.getvalue().to_pybytes()
+
+    if msgpack is not None:
+        return MSGPACK_PREFIX + msgpack.packb(value, default=_default, use_bin_type=True)
+    return JSON_PREFIX + json.dumps(value, default=_default).encode("utf-8")
+
+
+def deserialize(payload: bytes) -> Any:
+    prefix, body = payload[:1], payload[1:]
+    if prefix == ARROW_PREFIX:
+        import pyarrow as pa
+
+        return pa.ipc.open_stream(body).read_all().to_pandas()
+    if prefix == MSGPACK_PREFIX:
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body.decode("utf-8"))
+
+
+class InMemoryStore:
+    """
+    In-process stand-in for the Redis commands the cache uses
+
+    Used when Redis is disabled or unreachable, and in tests.
+    """
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Any, Optional[float]]] = {}
+
+    def _live(self, key: str) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        value, expires_at = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._live(key)
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        expires_at = time.monotonic() + ex if ex else None
+        self._data[key] = (value, expires_at)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._data.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        value = int(self._live(key) or 0) + 1
+        self._data[key] = (value, None)
+        return value
+
+    async def close(self):
+        self._data.clear()
+
+
+def create_store():
+    """Create the shared store: Redis at ``REDIS_URL`` or the in-memory stand-in"""
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            import redis.asyncio as redis
+
+            return redis.Redis.from_url(settings.REDIS_URL)
+        except Exception as e:
+            logger.warning(f"Redis unavailable ({e}), using in-memory cache store")
+    return InMemoryStore()
+
+
+class TwoTierCache:
+    """
+    Namespaced cache with a local LRU tier and a shared store tier
+
+    Keys are ``<prefix>:<namespace>:v<version>:<key>``. Invalidating a
+    namespace increments its version in the shared store, so every worker
+    stops reading the old entries once it re-checks the version (at most
+    every ``CACHE_VERSION_CHECK_INTERVAL`` seconds); old entries expire by TTL.
+    """
+
+    STORE_RETRY_INTERVAL = 30.0
+
+    def __init__(
+        self,
+        store: Any,
+        max_local_entries: Optional[int] = None,
+        default_ttl: Optional[int] = None
+    ):
+        self.store = store
+        self.max_local_entries = max_local_entries or settings.LOCAL_CACHE_MAX_ENTRIES
+        self.default_ttl = default_ttl or settings.CACHE_TTL
+        self._local: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._store_retry_at = 0.0
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+
+    async def _store_call(self, method: str, *args, **kwargs) -> Any:
+        """Call the shared store; a failing store degrades to local-only caching
+        and is retried after ``STORE_RETRY_INTERVAL`` seconds"""
+        if time.monotonic() < self._store_retry_at:
+            return None
+        try:
+            return await getattr(self.store, method)(*args, **kwargs)
+        except Exception as e:
+            logger.warning(f"Shared cache unavailable ({e}), using local tier only")
+            self._store_retry_at = time.monotonic() + self.STORE_RETRY_INTERVAL
+            return None
+
+    async def _version(self, namespace: str) -> int:
+        cached = self._versions.get(namespace)
+        if cached and time.monotonic() - cached[1] < settings.CACHE_VERSION_CHECK_INTERVAL:
+            return cached[0]
+
+        raw = await self._store_call("get", self._version_key(namespace))
+        version = int(raw) if raw is not None else (cached[0] if cached else 0)
+        self._versions[namespace] = (version, time.monotonic())
+        return version
+
+    def _version_key(self, namespace: str) -> str:
+        return f"{settings.CACHE_KEY_PREFIX}:{namespace}:version"
+
+    async def _full_key(self, namespace: str, key: str) -> str:
+        version = await self._version(namespace)
+        return f"{settings.CACHE_KEY_PREFIX}:{namespace}:v{version}:{key}"
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        """Get a value, checking the local tier before the shared store"""
+        if not settings.USE_CACHE:
+            return None
+
+        full_key = await self._full_key(namespace, key)
+
+        item = self._local.get(full_key)
+        if item is not None:
+            value, expires_at = item
+            if expires_at > time.monotonic():
+                self._local.move_to_end(full_key)
+                self.stats["local_hits"] += 1
+                return value
+            del self._local[full_key]
+
+        payload = await self._store_call("get", full_key)
+        if payload is None:
+            self.stats["misses"] += 1
+            return None
+
+        value = deserialize(payload)
+        self._set_local(full_key, value, self.default_ttl)
+        self.stats["shared_hits"] += 1
+        return value
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None):
+        """Store a value in both tiers"""
+        if not settings.USE_CACHE:
+            return
+
+        ttl = ttl or self.default_ttl
+        full_key = await self._full_key(namespace, key)
+        self._set_local(full_key, value, ttl)
+        await self._store_call("set", full_key, serialize(value), ex=ttl)
+
+    async def get_or_compute(
+        self,
+        namespace: str,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        ttl: Optional[int] = None
+    ) -> Any:
+        """Return the cached value or compute, cache and return it"""
+        value = await self.get(namespace, key)
+        if value is None:
+            value = await compute()
+            if value is not None:
+                await self.set(namespace, key, value, ttl)
+        return value
+
+    async def invalidate(self, namespace: str):
+        """Invalidate every entry of a namespace on all workers"""
+        version = await self._store_call("incr", self._version_key(namespace))
+        if version is None:
+            # Local-only mode: bump the version locally
+            version = (self._versions.get(namespace, (0, 0))[0]) + 1
+        self._versions[namespace] = (int(version), time.monotonic())
+
+    def _set_local(self, full_key: str, value: Any, ttl: int):
+        self._local[full_key] = (value, time.monotonic() + ttl)
+        self._local.move_to_end(full_key)
+        while len(self._local) > self.max_local_entries:
+            self._local.popitem(last=False)
+
+    async def close(self):
+        await self._store_call("close")
+
+
+_cache: Optional[TwoTierCache] = None
+
+
+def get_cache() -> TwoTierCache:
+    """Process-wide cache instance"""
+    global _cache
+    if _cache is None:
+        _cache = TwoTierCache(create_store())
+    return _cache
+
+
+async def close_cache():
+    global _cache
+    if _cache is not None:
+        await _cache.close()
+        _cache = None
@@ -0,0 +1,75 @@
+"""
+Request Coalescer
+Shares one pipeline execution between identical in-flight requests
+"""
+import asyncio
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive query text"""
+    return " ".join(query.lower().split()).rstrip("?.! ")
+
+
+class RequestCoalescer:
+    """
+    Deduplicates concurrent identical requests
+
+    The first request for a key (the leader) starts the work; requests
+    arriving while it is in flight await the same result. The shared work is
+    cancelled only when every waiting request has gone away.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self.stats = {"executions": 0, "deduplicated": 0}
+
+    def key(self, query: str, context: Optional[str] = None) -> str:
+        """Coalescing key: normalized query plus conversation context if any"""
+        raw = normalize_query(query)
+        if context:
+            raw = f"{raw}\n{context}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Run ``factory`` once per key among concurrent callers
+
+        Returns:
+            (result, shared) where ``shared`` is True for callers that
+            reused another request's execution
+        """
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.stats["deduplicated"] += 1
+            logger.info(f"Coalesced request onto in-flight execution {key[:8]}")
+        else:
+            self.stats["executions"] += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] == 0:
+                del self._waiters[task]
+                if not task.done():
+                    # Nobody is left to receive the result
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
@@ -0,0 +1,222 @@
+"""
+Conversation Store
+Append-only SQLite store of conversation turns with a rolling,
+token-budgeted summary used as context for follow-up questions
+"""
+import asyncio
+import logging
+import math
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import (
+    JSON, Column, DateTime, Integer, String, Text, UniqueConstraint,
+    create_engine, event, select,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, declarative_base
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+ANSWER_SNIPPET_CHARS = 160
+
+
+class ConversationTurn(Base):
+    """One question/answer exchange; rows are only ever inserted"""
+    __tablename__ = "conversation_turns"
+    __table_args__ = (UniqueConstraint("conversation_id", "turn"),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    conversation_id = Column(String(64), nullable=False, index=True)
+    turn = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    query = Column(Text, nullable=False)
+    decomposition = Column(JSON, nullable=False)
+    datasets = Column(JSON, nullable=False)  # selected dataset keys, by relevance
+    answer = Column(Text, nullable=False)
+    summary = Column(Text, nullable=False)  # rolling context after this turn
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "turn": self.turn,
+            "timestamp": self.created_at.isoformat(),
+            "query": self.query,
+            "decomposition": self.decomposition,
+            "datasets": self.datasets,
+            "answer": self.answer,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)"""
+    return math.ceil(len(text) / 4)
+
+
+def summarize_turn(
+    turn: int,
+    query: str,
+    decomposition: Dict[str, Any],
+    datasets: List[str],
+    answer: str
+) -> str:
+    """One-line digest of a turn: question, focus entities, sources, answer lead"""
+    required = decomposition.get("required_data") or {}
+    focus = []
+    for field in ("states", "districts", "crops", "metrics"):
+        if required.get(field):
+            focus.append(f"{field}={', '.join(map(str, required[field]))}")
+    period = required.get("time_period") or {}
+    if period.get("start_year") and period.get("end_year"):
+        focus.append(f"years={period['start_year']}-{period['end_year']}")
+
+    lead = " ".join(answer.split())
+    if len(lead) > ANSWER_SNIPPET_CHARS:
+        lead = lead[:ANSWER_SNIPPET_CHARS].rsplit(" ", 1)[0] + "..."
+
+    parts = [f"Q{turn}: {query}"]
+    if focus:
+        parts.append(f"focus: {'; '.join(focus)}")
+    if datasets:
+        parts.append(f"data: {', '.join(datasets)}")
+    parts.append(f"A: {lead}")
+    return " | ".join(parts)
+
+
+def roll_summary(previous: str, line: str, budget: int) -> str:
+    """Append a turn digest, dropping the oldest digests to fit the token budget"""
+    lines = [l for l in previous.split("\n") if l] + [line]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > budget:
+        lines.pop(0)
+    summary = "\n".join(lines)
+    if estimate_tokens(summary) > budget:
+        summary = summary[:budget * 4]
+    return summary
+
+
+class ConversationStore:
+    """
+    Persistent conversation history
+
+    Turns are appended to a SQLite table indexed by conversation_id; the
+    latest turn carries the conversation's rolling summary, so loading the
+    context for a follow-up is a single indexed lookup. SQLAlchemy calls are
+    synchronous and run in a worker thread.
+    """
+
+    def __init__(self, url: Optional[str] = None, token_budget: Optional[int] = None):
+        self.url = url or settings.CONVERSATION_DB_URL or \
+            f"sqlite:///{Path(settings.DATA_DIRECTORY) / 'conversations.db'}"
+        self.token_budget = token_budget or settings.CONVERSATION_CONTEXT_TOKENS
+
+        connect_args = {"check_same_thread": False} if self.url.startswith("sqlite") else {}
+        self.engine = create_engine(self.url, connect_args=connect_args)
+        if self.url.startswith("sqlite"):
+            # WAL lets workers read while another appends
+            event.listen(self.engine, "connect", _enable_wal)
+        Base.metadata.create_all(self.engine)
+
+    async def latest_turn(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """The most recent turn of a conversation (with its rolling summary)"""
+        return await asyncio.to_thread(self._latest_turn, conversation_id)
+
+    async def history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        """Every turn of a conversation, oldest first"""
+        return await asyncio.to_thread(self._history, conversation_id)
+
+    async def append_turn(
+        self,
+        conversation_id: str,
+        query: str,
+        decomposition: Dict[str, Any],
+        datasets: List[str],
+        answer: str
+    ) -> Dict[str, Any]:
+        """Record a turn and roll the conversation summary forward"""
+        return await asyncio.to_thread(
+            self._append_turn, conversation_id, query, decomposition, datasets, answer
+        )
+
+    async def record_response(self, response: Any, query: str):
+        """Append the turn a ChatResponse answers; failures are only logged"""
+        try:
+            await self.append_turn(
+                conversation_id=response.conversation_id,
+                query=query,
+                decomposition=(response.metadata or {}).get("decomposition", {}),
+                datasets=[ds.dataset_id for ds in response.data_sources_used],
+                answer=response.answer
+            )
+        except Exception as e:
+            logger.warning(f"Failed to record conversation turn: {e}")
+
+    def _latest(self, session: Session, conversation_id: str) -> Optional[ConversationTurn]:
+        return session.scalars(
+            select(ConversationTurn)
+            .where(ConversationTurn.conversation_id == conversation_id)
+            .order_by(ConversationTurn.turn.desc())
+            .limit(1)
+        ).first()
+
+    def _latest_turn(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with Session(self.engine) as session:
+            row = self._latest(session, conversation_id)
+            if row is None:
+                return None
+            return dict(row.to_dict(), summary=row.summary)
+
+    def _history(self, conversation_id: str) -> List[Dict[str, Any]]:
+        with Session(self.engine) as session:
+            rows = session.scalars(
+                select(ConversationTurn)
+                .where(ConversationTurn.conversation_id == conversation_id)
+                .order_by(ConversationTurn.turn)
+            ).all()
+            return [row.to_dict() for row in rows]
+
+    def _append_turn(
+        self,
+        conversation_id: str,
+        query: str,
+        decomposition: Dict[str, Any],
+        datasets: List[str],
+        answer: str
+    ) -> Dict[str, Any]:
+        # Another worker may take the same turn number; retry once
+        for attempt in range(2):
+            with Session(self.engine) as session:
+                previous = self._latest(session, conversation_id)
+                turn = previous.turn + 1 if previous else 1
+                line = summarize_turn(turn, query, decomposition, datasets, answer)
+                row = ConversationTurn(
+                    conversation_id=conversation_id,
+                    turn=turn,
+                    query=query,
+                    decomposition=decomposition,
+                    datasets=datasets,
+                    answer=answer,
+                    summary=roll_summary(previous.summary if previous else "", line,
+                                         self.token_budget),
+                )
+                session.add(row)
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    if attempt:
+                        raise
+                    continue
+                return dict(row.to_dict(), summary=row.summary)
+
+    def close(self):
+        self.engine.dispose()
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
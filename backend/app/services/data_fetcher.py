@@ -5,66 +5,81 @@ Integrates with data.gov.in API to fetch agricultural and climate datasets
 import aiohttp
 import asyncio
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import json
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 from datetime import datetime, timedelta
 import hashlib
+import os
 
 from app.core.config import settings
+from app.services.aggregate_cubes import CubeStore
+from app.services.approximate import DatasetSample, SampleStore
+from app.services.arrow_query import SortKey, query_table, query_table_counted
+from app.services.arrow_snapshots import ArrowSnapshotStore
+from app.services.cache import get_cache
+from app.services.data_normalizer import DataNormalizer
+from app.services.dataset_registry import Changes, DatasetRegistry
+from app.services.ingest import ingest_file
 
 logger = logging.getLogger(__name__)
 
 
+def _watermark_order(values: pd.Series) -> pd.Series:
+    """Comparable form of last-updated values: numbers, else timestamps, else text"""
+    numbers = pd.to_numeric(values, errors="coerce")
+    if numbers.notna().all():
+        return numbers
+    timestamps = pd.to_datetime(values, errors="coerce", utc=True)
+    if timestamps.notna().all():
+        return timestamps
+    return values.astype(str)
+
+
+def _max_watermark(values: pd.Series, watermark: Optional[str] = None) -> Optional[str]:
+    """Largest last-updated value among ``values`` and the current watermark"""
+    values = values.dropna().astype(str)
+    if watermark is not None:
+        values = pd.concat([values, pd.Series([watermark])], ignore_index=True)
+    if values.empty:
+        return None
+    return values.iloc[int(_watermark_order(values).to_numpy().argmax())]
+
+
+def _after_watermark(values: pd.Series, watermark: str) -> pd.Series:
+    """Mask of the rows updated after ``watermark``"""
+    order = _watermark_order(pd.concat([values.astype(str), pd.Series([watermark])], ignore_index=True))
+    return pd.Series(order.iloc[:-1].to_numpy() > order.iloc[-1], index=values.index)
+
+
 class DataFetcher:
     """Fetches and manages data from data.gov.in"""
     
-    # Key datasets from data.gov.in
-    DATASETS = {
-        # Agricultural datasets
-        "crop_production": {
-            "id": "9ef84268-d588-465a-a308-a864a43d0070",
-            "name": "Crop Production Statistics",
-            "url": "https://data.gov.in/resource/crop-production-statistics",
-            "category": "agriculture",
-            "description": "District-wise crop production data across India"
-        },
-        "area_production": {
-            "id": "d9d2d2d8-8f8a-4f8a-8f8a-8f8a8f8a8f8a",
-            "name": "Area and Production of Crops",
-            "url": "https://data.gov.in/resource/area-production-crops",
-            "category": "agriculture",
-            "description": "State-wise area and production statistics for various crops"
-        },
-        "rainfall_data": {
-            "id": "rainfall-subdivision-1901-2017",
-            "name": "Rainfall Data (IMD)",
-            "url": "https://data.gov.in/resource/rainfall-data-imd",
-            "category": "climate",
-            "description": "Monthly rainfall data from India Meteorological Department"
-        },
-        "climate_data": {
-            "id": "climate-temperature-data",
-            "name": "Temperature Data (IMD)",
-            "url": "https://data.gov.in/resource/climate-data-imd",
-            "category": "climate",
-            "description": "Temperature and climate indicators"
-        },
-        "agri_prices": {
-            "id": "agricultural-prices",
-            "name": "Agricultural Commodity Prices",
-            "url": "https://data.gov.in/resource/agricultural-prices",
-            "category": "agriculture",
-            "description": "Market prices for agricultural commodities"
-        }
-    }
-    
-    def __init__(self):
+    def __init__(self, registry: Optional[DatasetRegistry] = None):
         self.cache_dir = Path(settings.DATA_DIRECTORY)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         self.session: Optional[aiohttp.ClientSession] = None
         self.cache: Dict[str, Any] = {}
+        self.cubes = CubeStore()
+        # Stratified samples and sketches for approximate answers
+        self.samples = SampleStore(self.cache_dir, settings.APPROXIMATE_SAMPLE_PER_STRATUM)
+        self._sample_tasks: Dict[str, asyncio.Future] = {}
+        self.normalizer = DataNormalizer()
+        self._refresh_tasks: Dict[str, asyncio.Future] = {}
+        # Dataset definitions by key (read on first lookup, hot-reloaded)
+        self.DATASETS = registry or DatasetRegistry()
+        # Decoded cache files, keyed by version, and loads in flight
+        self._frames: Dict[str, Tuple[Any, pd.DataFrame]] = {}
+        self._load_tasks: Dict[str, asyncio.Future] = {}
+        # Arrow tables for the columnar query path, keyed like _frames
+        self._tables: Dict[str, Tuple[Any, pa.Table]] = {}
+        # Memory-mapped Arrow snapshots shared by all worker processes
+        self.snapshots: Optional[ArrowSnapshotStore] = None
+        if settings.CACHE_FORMAT == "arrow":
+            self.snapshots = ArrowSnapshotStore(self.cache_dir)
         
     async def _get_session(self) -> aiohttp.ClientSession:
         """Get or create aiohttp session"""
@@ -82,9 +97,57 @@ class DataFetcher:
         if not cache_path.exists():
             return False
         
-        # Check cache age
-        cache_age = datetime.now() - datetime.fromtimestamp(cache_path.stat().st_mtime)
-        return cache_age < timedelta(seconds=settings.CACHE_TTL)
+        # Check cache age against the dataset's refresh policy
+        cache_age = datetime.now() - self._checked_at(dataset_id)
+        return cache_age < timedelta(seconds=self.DATASETS.refresh_policy(dataset_id)["ttl"])
+    
+    def cache_expires_in(self, dataset_id: str) -> float:
+        """Seconds until the cached copy expires (<= 0 if expired or missing)"""
+        cache_path = self._get_cache_path(dataset_id)
+        if not cache_path.exists():
+            return 0.0
+        
+        cache_age = (datetime.now() - self._checked_at(dataset_id)).total_seconds()
+        return self.DATASETS.refresh_policy(dataset_id)["ttl"] - cache_age
+    
+    def _checked_at(self, dataset_id: str) -> datetime:
+        """
+        When the cached copy was last fetched or revalidated upstream
+        
+        Kept in the manifest rather than as the cache file's mtime, which
+        versions the decoded frames, tables and cubes: a revalidation that
+        finds nothing new must not invalidate them.
+        """
+        checked_at = self._load_manifest(dataset_id).get("checked_at")
+        if checked_at:
+            return datetime.fromisoformat(checked_at)
+        # Caches written before revalidation times were recorded
+        return datetime.fromtimestamp(self._get_cache_path(dataset_id).stat().st_mtime)
+    
+    def _mark_checked(self, dataset_key: str, manifest: Dict[str, Any]):
+        """Restart the TTL of an unchanged cached copy"""
+        manifest["checked_at"] = datetime.now().isoformat()
+        self._save_manifest(dataset_key, manifest)
+    
+    def is_cached(self, dataset_key: str) -> bool:
+        """Whether a dataset has a cached copy (fresh or not)"""
+        return self._get_cache_path(dataset_key).exists()
+    
+    def cached_row_count(self, dataset_key: str) -> Optional[int]:
+        """Rows in the cached copy, from its manifest (without loading it)"""
+        return self._load_manifest(dataset_key)["row_count"]
+    
+    def _data_version(self, dataset_key: str, manifest: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Token that changes whenever the cached rows do
+        
+        Unlike the file mtime it is unchanged when the base file is rewritten
+        with the same rows (compaction, cache migration), so samples survive
+        those.
+        """
+        manifest = manifest or self._load_manifest(dataset_key)
+        fetched_at = manifest.get("fetched_at") or self._get_cache_path(dataset_key).stat().st_mtime_ns
+        return f"{fetched_at}:{manifest['row_count']}:{len(manifest['fragments'])}"
     
     async def fetch_dataset(
         self, 
@@ -94,8 +157,12 @@ class DataFetcher:
         """
         Fetch a dataset from data.gov.in or cache
         
+        An expired cache is served as-is while a background refresh runs
+        (stale-while-revalidate); only a missing cache or ``force_refresh``
+        waits on the upstream fetch.
+        
         Args:
-            dataset_key: Key from DATASETS dict
+            dataset_key: Key in the dataset registry
             force_refresh: Force refresh from API even if cache is valid
             
         Returns:
@@ -104,35 +171,491 @@ class DataFetcher:
         if dataset_key not in self.DATASETS:
             raise ValueError(f"Unknown dataset: {dataset_key}")
         
-        dataset_info = self.DATASETS[dataset_key]
         cache_path = self._get_cache_path(dataset_key)
         
         # Check cache first
-        if not force_refresh and self._is_cache_valid(dataset_key):
+        if not force_refresh and cache_path.exists():
+            if not self._is_cache_valid(dataset_key):
+                if not self.DATASETS.refresh_policy(dataset_key)["stale_while_revalidate"]:
+                    return await self.refresh_dataset(dataset_key)
+                logger.info(f"Serving stale {dataset_key} while refreshing")
+                self.schedule_refresh(dataset_key)
+            
+            return await self._load_cached_frame(dataset_key)
+        
+        return await self.refresh_dataset(dataset_key)
+    
+    async def _load_cached_frame(self, dataset_key: str) -> pd.DataFrame:
+        """
+        Load the cached dataset, decoding each on-disk version only once
+        
+        Concurrent callers share a single read, and later callers reuse the
+        decoded frame until the cache file (or, with Arrow snapshots, the
+        published snapshot) changes.
+        """
+        cached = self._frames.get(dataset_key)
+        if cached and cached[0] == self._cache_version(dataset_key):
+            return cached[1]
+        
+        task = self._load_tasks.get(dataset_key)
+        if task is None or task.done():
             logger.info(f"Loading {dataset_key} from cache")
-            return pd.read_parquet(cache_path)
+            task = asyncio.ensure_future(self._read_frame(dataset_key))
+            self._load_tasks[dataset_key] = task
+            # A finished task must not pin the frame it loaded
+            task.add_done_callback(lambda t: self._forget_load(dataset_key, t))
+        version, df, table = await asyncio.shield(task)
+        
+        # Replacing the entry drops this process's reference to the
+        # previous version (and its mapping, once no request holds it)
+        self._set_frame(dataset_key, version, df, table)
+        await asyncio.to_thread(
+            self.cubes.refresh, dataset_key, df, self._get_cache_path(dataset_key).stat().st_mtime
+        )
+        return df
+    
+    def _forget_load(self, dataset_key: str, task: asyncio.Future):
+        if self._load_tasks.get(dataset_key) is task:
+            del self._load_tasks[dataset_key]
+    
+    def _cache_version(self, dataset_key: str) -> Any:
+        """Version token of the on-disk copy frames are loaded from"""
+        if self.snapshots is not None:
+            return self.snapshots.current(dataset_key)
+        return self._get_cache_path(dataset_key).stat().st_mtime_ns
+    
+    def _set_frame(
+        self,
+        dataset_key: str,
+        version: Any,
+        df: pd.DataFrame,
+        table: Optional[pa.Table] = None
+    ):
+        self._frames[dataset_key] = (version, df)
+        if table is not None:
+            self._tables[dataset_key] = (version, table)
+        else:
+            self._tables.pop(dataset_key, None)
+    
+    async def _read_frame(self, dataset_key: str) -> Tuple[Any, pd.DataFrame, Optional[pa.Table]]:
+        """Read the cache as ``(version, frame, mapped table or None)``"""
+        if self.snapshots is None:
+            version = self._cache_version(dataset_key)
+            return version, await self._load_cache(dataset_key), None
+        
+        snapshot = await asyncio.to_thread(self.snapshots.load, dataset_key)
+        if snapshot is None:
+            # First load from a parquet-only cache: publish it for every worker
+            return await self._publish_snapshot(dataset_key, await self._load_cache(dataset_key))
+        version, table, df = snapshot
+        return version, df, table
+    
+    async def _publish_snapshot(
+        self,
+        dataset_key: str,
+        df: pd.DataFrame
+    ) -> Tuple[Any, pd.DataFrame, Optional[pa.Table]]:
+        """Publish a new Arrow snapshot and return the mapped frame and table"""
+        await asyncio.to_thread(self.snapshots.publish, dataset_key, df)
+        snapshot = await asyncio.to_thread(self.snapshots.load, dataset_key)
+        if snapshot is None:
+            return self._cache_version(dataset_key), df, None
+        version, table, mapped = snapshot
+        return version, mapped, table
+    
+    async def fetch_table(self, dataset_key: str) -> pa.Table:
+        """
+        Fetch a dataset as a ``pyarrow.Table``
+        
+        With Arrow snapshots this is the memory-mapped table itself;
+        otherwise the frame is converted once per version (numeric columns
+        without nulls are shared with the frame, not copied).
+        """
+        df = await self.fetch_dataset(dataset_key)
+        frame = self._frames.get(dataset_key)
+        version = frame[0] if frame is not None and frame[1] is df else None
+        
+        cached = self._tables.get(dataset_key)
+        if cached is not None and version is not None and cached[0] == version:
+            return cached[1]
+        
+        table = await asyncio.to_thread(pa.Table.from_pandas, df, preserve_index=False)
+        if version is not None:
+            self._tables[dataset_key] = (version, table)
+        return table
+    
+    async def refresh_dataset(self, dataset_key: str) -> pd.DataFrame:
+        """
+        Refresh a dataset from upstream, sharing any refresh already in flight
+        """
+        task = self._refresh_tasks.get(dataset_key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._refresh(dataset_key))
+            self._refresh_tasks[dataset_key] = task
+        # Shield so a cancelled caller does not abort a shared refresh
+        return await asyncio.shield(task)
+    
+    def schedule_refresh(self, dataset_key: str):
+        """Start a background refresh unless one is already in flight"""
+        task = self._refresh_tasks.get(dataset_key)
+        if task is not None and not task.done():
+            return
+        
+        task = asyncio.ensure_future(self._refresh(dataset_key))
+        self._refresh_tasks[dataset_key] = task
+        task.add_done_callback(lambda t: self._log_refresh_result(dataset_key, t))
+    
+    def _log_refresh_result(self, dataset_key: str, task: asyncio.Future):
+        """Surface errors from background refreshes nobody awaits"""
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background refresh of {dataset_key} failed: {task.exception()}")
+    
+    async def _refresh(self, dataset_key: str) -> pd.DataFrame:
+        """Fetch, normalize and cache a dataset"""
+        dataset_info = self.DATASETS[dataset_key]
+        cache_path = self._get_cache_path(dataset_key)
+        manifest = self._load_manifest(dataset_key)
+        
+        if dataset_info.get("source") == "file":
+            return await self._refresh_from_file(dataset_key, dataset_info, manifest)
         
         # Fetch from API or fallback to sample data
         logger.info(f"Fetching {dataset_key} from data.gov.in")
         
         try:
-            df = await self._fetch_from_api(dataset_info)
+            result = await self._fetch_from_api(dataset_key, dataset_info, manifest)
         except Exception as e:
-            logger.warning(f"API fetch failed: {e}. Using sample data.")
-            df = await self._generate_sample_data(dataset_key)
+            if not cache_path.exists():
+                logger.warning(f"API fetch failed: {e}. Using sample data.")
+                result = {"status": "full", "df": await self._generate_sample_data(dataset_key)}
+            else:
+                # Keep serving the cached copy; retry after another TTL
+                logger.warning(f"API fetch of {dataset_key} failed: {e}. Keeping the cached copy.")
+                self._mark_checked(dataset_key, manifest)
+                return await self._load_cached_frame(dataset_key)
         
-        # Cache the data
-        df.to_parquet(cache_path, index=False)
-        logger.info(f"Cached {dataset_key} with {len(df)} rows")
+        if result["status"] == "not_modified":
+            # Nothing changed upstream: restart the TTL and keep the cache
+            logger.info(f"{dataset_key} not modified upstream")
+            self._mark_checked(dataset_key, manifest)
+            return await self._load_cached_frame(dataset_key)
+        
+        raw_count = len(result["df"])
+        updated_field = dataset_info.get("updated_field")
+        if updated_field and updated_field in result["df"].columns:
+            watermark = manifest["watermark"] if result["status"] == "delta" else None
+            manifest["watermark"] = _max_watermark(result["df"][updated_field], watermark)
+        elif result["status"] != "delta":
+            manifest["watermark"] = None
+        
+        # Normalize schema and dtypes before caching
+        df = self.normalizer.normalize(dataset_key, result["df"], self.DATASETS.schema(dataset_key))
+        
+        if result["status"] == "delta":
+            if not df.empty:
+                fragment = f"{dataset_key}.delta-{len(manifest['fragments']) + 1:04d}.parquet"
+                await self._write_parquet(df, self.cache_dir / fragment)
+                manifest["fragments"].append(fragment)
+            manifest["upstream_count"] += raw_count
+            # New rows: bump the version frames and cubes are keyed on
+            cache_path.touch()
+            logger.info(f"Appended {len(df)} new rows to {dataset_key}")
+        else:
+            # Cache the data
+            await self._write_parquet(df, cache_path)
+            self._remove_fragments(manifest)
+            manifest["upstream_count"] = raw_count
+            logger.info(f"Cached {dataset_key} with {len(df)} rows")
+        
+        manifest["etag"] = result.get("etag")
+        manifest["last_modified"] = result.get("last_modified")
+        manifest["fetched_at"] = manifest["checked_at"] = datetime.now().isoformat()
+        
+        if result["status"] == "delta":
+            df = await self._load_cache(dataset_key, manifest)
+            if len(manifest["fragments"]) >= settings.MAX_CACHE_FRAGMENTS:
+                # Compact the fragments back into the base file
+                mtime = cache_path.stat().st_mtime
+                await self._write_parquet(df, cache_path)
+                os.utime(cache_path, (mtime, mtime))
+                self._remove_fragments(manifest)
+        
+        manifest["row_count"] = len(df)
+        self._save_manifest(dataset_key, manifest)
+        
+        # Results derived from the previous version are stale on every worker
+        await get_cache().invalidate(f"retrieval:{dataset_key}")
+        
+        # Large datasets get their sample for approximate answers now
+        if self._samples_wanted(len(df)):
+            await self._build_sample(dataset_key, df)
+        
+        # Rebuild aggregate cubes for the new version
+        await asyncio.to_thread(self.cubes.refresh, dataset_key, df, cache_path.stat().st_mtime)
+        if self.snapshots is not None:
+            # Serve the mapped copy so this worker does not keep its own
+            version, df, table = await self._publish_snapshot(dataset_key, df)
+            self._set_frame(dataset_key, version, df, table)
+        else:
+            self._set_frame(dataset_key, cache_path.stat().st_mtime_ns, df)
         
         return df
     
-    async def _fetch_from_api(self, dataset_info: Dict[str, Any]) -> pd.DataFrame:
+    async def _refresh_from_file(
+        self,
+        dataset_key: str,
+        dataset_info: Dict[str, Any],
+        manifest: Dict[str, Any]
+    ) -> pd.DataFrame:
+        """Re-ingest a file-backed dataset if its source file changed"""
+        cache_path = self._get_cache_path(dataset_key)
+        source = Path(dataset_info["path"])
+        stat = source.stat()
+        unchanged = manifest.get("source") == {
+            "path": str(source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns
+        }
+        if unchanged and cache_path.exists():
+            logger.info(f"{dataset_key} source file not modified")
+            self._mark_checked(dataset_key, manifest)
+        else:
+            await self.ingest_file(dataset_key, source)
+        return await self._load_cached_frame(dataset_key)
+    
+    async def ingest_file(self, dataset_key: str, source: Path) -> Dict[str, Any]:
+        """
+        Ingest a local CSV/XLSX/XLS/JSON/NDJSON file as a dataset's cache
+        
+        The file is streamed into parquet in chunks (bounded memory, limited
+        to ``MAX_DATASET_SIZE_MB``) and replaces the cached copy on every
+        worker: frames, snapshots, cubes and retrieval summaries of the
+        previous version are dropped and rebuilt on the next read.
+        """
+        if dataset_key not in self.DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset_key}")
+        
+        source = Path(source)
+        stat = source.stat()
+        cache_path = self._get_cache_path(dataset_key)
+        result = await asyncio.to_thread(
+            ingest_file, dataset_key, source, cache_path, schema=self.DATASETS.schema(dataset_key)
+        )
+        
+        manifest = self._load_manifest(dataset_key)
+        self._remove_fragments(manifest)
+        now = datetime.now().isoformat()
+        manifest.update({
+            "etag": None,
+            "last_modified": None,
+            "upstream_count": result["rows"],
+            "watermark": None,
+            "row_count": result["rows"],
+            "fetched_at": now,
+            "checked_at": now,
+            "source": {"path": str(source), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns},
+        })
+        self._save_manifest(dataset_key, manifest)
+        
+        if self.snapshots is not None:
+            self.snapshots.invalidate(dataset_key)
+        self._frames.pop(dataset_key, None)
+        self._tables.pop(dataset_key, None)
+        self.cubes.invalidate(dataset_key)
+        self.samples.invalidate(dataset_key)
+        await get_cache().invalidate(f"retrieval:{dataset_key}")
+        
+        if self._samples_wanted(result["rows"]):
+            # Streamed from the new cache file, like the ingest itself
+            await self._build_sample(dataset_key)
+        return result
+    
+    async def apply_registry_changes(self, changes: Changes):
+        """
+        Follow a registry reload
+        
+        Added datasets load lazily on first use. Removed and updated ones
+        drop their decoded frames, cubes and retrieval summaries; when the
+        update changes the data itself (resource id, source, schema mapping)
+        the cache is re-fetched in full in the background and served as-is
+        until then.
+        """
+        for dataset_key in changes["removed"] + changes["updated"]:
+            self._frames.pop(dataset_key, None)
+            self._tables.pop(dataset_key, None)
+            self.cubes.invalidate(dataset_key)
+            self.samples.invalidate(dataset_key)
+            await get_cache().invalidate(f"retrieval:{dataset_key}")
+        
+        for dataset_key in changes["data_changed"]:
+            if not self.is_cached(dataset_key):
+                continue
+            # Forget the validators and watermark so the refresh is a full one
+            manifest = self._load_manifest(dataset_key)
+            manifest.update({"etag": None, "last_modified": None, "upstream_count": 0, "watermark": None})
+            manifest.pop("source", None)
+            self._save_manifest(dataset_key, manifest)
+            self.schedule_refresh(dataset_key)
+    
+    def _samples_wanted(self, rows: int) -> bool:
+        return settings.APPROXIMATE_MODE != "off" and rows >= settings.APPROXIMATE_MIN_ROWS
+    
+    async def get_sample(self, dataset_key: str) -> Optional[DatasetSample]:
+        """
+        Stratified sample and sketches of the cached dataset
+        
+        Read from the sidecar files written at ingest, or built from the
+        cache file (streamed) the first time a dataset without one is
+        asked for. Returns None when the dataset is not cached, or expired
+        without stale-while-revalidate: exact queries fetch it first.
+        """
+        if dataset_key not in self.DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset_key}")
+        if not self.is_cached(dataset_key):
+            return None
+        if not self._is_cache_valid(dataset_key):
+            if not self.DATASETS.refresh_policy(dataset_key)["stale_while_revalidate"]:
+                return None
+            self.schedule_refresh(dataset_key)
+        
+        sample = self.samples.get(dataset_key, self._data_version(dataset_key))
+        if sample is not None:
+            return sample
+        
+        task = self._sample_tasks.get(dataset_key)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._build_sample(dataset_key))
+            self._sample_tasks[dataset_key] = task
+        return await asyncio.shield(task)
+    
+    async def _build_sample(
+        self,
+        dataset_key: str,
+        df: Optional[pd.DataFrame] = None
+    ) -> Optional[DatasetSample]:
+        """Sample ``df``, or the cache file and its fragments; failures are only logged"""
+        manifest = self._load_manifest(dataset_key)
+        version = self._data_version(dataset_key, manifest)
+        try:
+            if df is not None:
+                return await asyncio.to_thread(self.samples.build, dataset_key, [df], version)
+            paths = [self._get_cache_path(dataset_key)] + [
+                self.cache_dir / fragment for fragment in manifest["fragments"]
+            ]
+            return await asyncio.to_thread(
+                self.samples.build_from_files, dataset_key, paths, version, settings.INGEST_CHUNK_ROWS
+            )
+        except Exception as e:
+            logger.warning(f"Failed to sample {dataset_key}: {e}")
+            return None
+    
+    async def _load_cache(
+        self,
+        dataset_key: str,
+        manifest: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """Read the cached base file plus any incremental fragments"""
+        cache_path = self._get_cache_path(dataset_key)
+        df = await asyncio.to_thread(pd.read_parquet, cache_path)
+        if not self.normalizer.is_normalized(df):
+            df = self._migrate_cache(dataset_key, df, cache_path)
+        
+        fragments = (manifest or self._load_manifest(dataset_key))["fragments"]
+        if fragments:
+            parts = [df] + [
+                await asyncio.to_thread(pd.read_parquet, self.cache_dir / fragment)
+                for fragment in fragments
+            ]
+            df = pd.concat(parts, ignore_index=True)
+            key_fields = [col for col in self.DATASETS[dataset_key].get("key_fields") or [] if col in df.columns]
+            if key_fields:
+                # Upsert: a record updated upstream replaces its earlier
+                # version. Keys compare exactly: the normalizer keeps integers
+                # lossless, dimension text as-is (stripped) and nulls as nulls
+                df = df.drop_duplicates(subset=key_fields, keep="last", ignore_index=True)
+            # Categories differ between fragments; re-normalize the union
+            df = self.normalizer.normalize(dataset_key, df, self.DATASETS.schema(dataset_key))
+        
+        return df
+    
+    async def _write_parquet(self, df: pd.DataFrame, path: Path):
+        """Write to a temporary file and swap it in so concurrent readers
+        never see a partial file"""
+        tmp_path = path.with_suffix(".parquet.tmp")
+        await asyncio.to_thread(df.to_parquet, tmp_path, index=False)
+        os.replace(tmp_path, path)
+    
+    def _get_manifest_path(self, dataset_id: str) -> Path:
+        """Get sidecar manifest path for dataset"""
+        return self.cache_dir / f"{dataset_id}.manifest.json"
+    
+    def _load_manifest(self, dataset_key: str) -> Dict[str, Any]:
+        """
+        Load the fetch manifest of a dataset
+        
+        The manifest records upstream validators (ETag, Last-Modified), the
+        number of upstream records consumed, the largest ``updated_field``
+        value seen (the incremental watermark) and the delta fragments
+        appended since the last full fetch.
+        """
+        manifest = {
+            "etag": None,
+            "last_modified": None,
+            "upstream_count": 0,
+            "watermark": None,
+            "row_count": None,
+            "fragments": [],
+        }
+        manifest_path = self._get_manifest_path(dataset_key)
+        if manifest_path.exists():
+            try:
+                manifest.update(json.loads(manifest_path.read_text()))
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable manifest for {dataset_key}: {e}")
+        return manifest
+    
+    def _save_manifest(self, dataset_key: str, manifest: Dict[str, Any]):
+        manifest_path = self._get_manifest_path(dataset_key)
+        tmp_path = manifest_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp_path, manifest_path)
+    
+    def _remove_fragments(self, manifest: Dict[str, Any]):
+        for fragment in manifest["fragments"]:
+            (self.cache_dir / fragment).unlink(missing_ok=True)
+        manifest["fragments"] = []
+    
+    def _migrate_cache(self, dataset_key: str, df: pd.DataFrame, cache_path: Path) -> pd.DataFrame:
+        """Normalize a cache file written before ingest normalization"""
+        logger.info(f"Normalizing cached {dataset_key}")
+        df = self.normalizer.normalize(dataset_key, df, self.DATASETS.schema(dataset_key))
+        
+        # Rewrite in place but keep the original mtime: the rows are the same
+        stat = cache_path.stat()
+        df.to_parquet(cache_path, index=False)
+        os.utime(cache_path, (stat.st_atime, stat.st_mtime))
+        return df
+    
+    async def _fetch_from_api(
+        self,
+        dataset_key: str,
+        dataset_info: Dict[str, Any],
+        manifest: Dict[str, Any]
+    ) -> Dict[str, Any]:
         """
         Fetch data from data.gov.in API
         
+        When a cache exists, the request is conditional (If-None-Match /
+        If-Modified-Since from the manifest). Datasets that declare an
+        ``updated_field`` are fetched incrementally: only records updated
+        after the manifest's watermark download (filtered upstream, and again
+        here in case the filter is not honoured). With ``key_fields``,
+        updated records replace their cached versions when fragments merge.
+        
         Note: data.gov.in API access requires registration and API key.
         This implementation includes fallback to sample data for demo purposes.
+        
+        Returns:
+            {"status": "full" | "delta" | "not_modified", "df": DataFrame,
+             "etag": ..., "last_modified": ...}
         """
         session = await self._get_session()
         
@@ -148,7 +671,28 @@ class DataFetcher:
             "limit": 10000  # Adjust based on dataset size
         }
         
+        has_cache = self._get_cache_path(dataset_key).exists()
+        updated_field = dataset_info.get("updated_field")
+        incremental = bool(has_cache and updated_field and manifest["watermark"] is not None)
+        
+        if has_cache:
+            if manifest["etag"]:
+                headers["If-None-Match"] = manifest["etag"]
+            if manifest["last_modified"]:
+                headers["If-Modified-Since"] = manifest["last_modified"]
+        
+        if incremental:
+            params[f"sort[{updated_field}]"] = "asc"
+            params[f"filters[{updated_field}][gt]"] = manifest["watermark"]
+        
         async with session.get(api_url, headers=headers, params=params, timeout=30) as response:
+            if response.status == 304:
+                return {
+                    "status": "not_modified",
+                    "etag": manifest["etag"],
+                    "last_modified": manifest["last_modified"],
+                }
+            
             if response.status == 200:
                 data = await response.json()
                 # Handle different response formats
@@ -159,7 +703,15 @@ class DataFetcher:
                 else:
                     raise ValueError(f"Unexpected API response format: {type(data)}")
                 
-                return df
+                if incremental and updated_field in df.columns:
+                    df = df[_after_watermark(df[updated_field], manifest["watermark"])]
+                
+                return {
+                    "status": "delta" if incremental else "full",
+                    "df": df,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
             else:
                 raise Exception(f"API returned status {response.status}")
     
@@ -297,12 +849,13 @@ class DataFetcher:
         return pd.DataFrame(data)
     
     async def load_initial_datasets(self):
-        """Load all datasets initially"""
+        """Load the datasets whose refresh policy asks for preloading"""
         logger.info("Loading initial datasets...")
-        tasks = [self.fetch_dataset(key) for key in self.DATASETS.keys()]
+        keys = self.DATASETS.preload_keys()
+        tasks = [self.fetch_dataset(key) for key in keys]
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        for key, result in zip(self.DATASETS.keys(), results):
+        for key, result in zip(keys, results):
             if isinstance(result, Exception):
                 logger.error(f"Failed to load {key}: {result}")
             else:
@@ -328,6 +881,35 @@ class DataFetcher:
         
         return info
     
+    async def get_catalog_info(self, dataset_key: str) -> Dict[str, Any]:
+        """
+        Information about a dataset without loading it
+        
+        Columns and row count come from the decoded frame when this worker
+        has one, otherwise from the cached parquet footer; datasets never
+        fetched only have their definition.
+        """
+        if dataset_key not in self.DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset_key}")
+        
+        info = self.DATASETS[dataset_key].copy()
+        cache_path = self._get_cache_path(dataset_key)
+        frame = self._frames.get(dataset_key)
+        try:
+            if frame is not None:
+                info["row_count"] = len(frame[1])
+                info["columns"] = list(frame[1].columns)
+            elif cache_path.exists():
+                metadata = await asyncio.to_thread(pq.read_metadata, cache_path)
+                info["row_count"] = self._load_manifest(dataset_key)["row_count"] or metadata.num_rows
+                info["columns"] = metadata.schema.to_arrow_schema().names
+            if cache_path.exists():
+                info["last_cached"] = datetime.fromtimestamp(cache_path.stat().st_mtime).isoformat()
+        except Exception as e:
+            logger.warning(f"Could not read cached info of {dataset_key}: {e}")
+        
+        return info
+
     async def query_dataset(
         self,
         dataset_key: str,
@@ -355,7 +937,46 @@ class DataFetcher:
         
         return df.head(limit)
     
+    async def query_table(
+        self,
+        dataset_key: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+        order_by: Optional[List[SortKey]] = None,
+        limit: Optional[int] = None
+    ) -> pa.Table:
+        """
+        Query a dataset on the columnar path
+        
+        Filters, aggregation, sorting and limits run in ``pyarrow.compute``
+        on the cached table; convert the result with ``to_records`` only
+        where Python objects are needed.
+        """
+        table = await self.fetch_table(dataset_key)
+        return await asyncio.to_thread(
+            query_table, table, filters, columns, group_by, order_by, limit
+        )
+    
+    async def query_table_counted(
+        self,
+        dataset_key: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: Optional[List[str]] = None,
+        group_by: Optional[List[str]] = None,
+        order_by: Optional[List[SortKey]] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[pa.Table, int]:
+        """``query_table`` plus the number of rows matching the filters"""
+        table = await self.fetch_table(dataset_key)
+        return await asyncio.to_thread(
+            query_table_counted, table, filters, columns, group_by, order_by, limit
+        )
+    
     async def close(self):
-        """Close the HTTP session"""
+        """Cancel background refreshes, close the HTTP session and registry connections"""
+        for task in self._refresh_tasks.values():
+            task.cancel()
         if self.session and not self.session.closed:
             await self.session.close()
+        self.DATASETS.close()
@@ -0,0 +1,212 @@
+"""
+Data Normalizer
+Ingest-time schema normalization: column mapping, compact dtypes and a
+unified month representation shared by all datasets
+"""
+import logging
+from typing import Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun",
+               "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+MONTH_FULL_NAMES = ["January", "February", "March", "April", "May", "June", "July",
+                    "August", "September", "October", "November", "December"]
+
+MONTH_DTYPE = pd.CategoricalDtype(categories=MONTH_NAMES, ordered=True)
+
+# Column aliases seen across data.gov.in resources (matched case-insensitively)
+COLUMN_ALIASES = {
+    "state": "State",
+    "state_name": "State",
+    "state_ut": "State",
+    "subdivision": "State",
+    "district": "District",
+    "district_name": "District",
+    "year": "Year",
+    "crop_year": "Year",
+    "month": "Month",
+    "crop": "Crop",
+    "commodity": "Crop",
+    "season": "Season",
+    "area": "Area",
+    "production": "Production",
+    "yield": "Yield",
+}
+
+# Text columns that are always stored as categoricals
+DIMENSION_COLUMNS = {"State", "District", "Crop", "Crop_Type", "Season"}
+
+# Share of the non-missing values that must parse for a text column to be
+# treated as numeric
+NUMERIC_PARSE_THRESHOLD = 0.9
+
+# Text values meaning "missing" in data.gov.in exports (compared lowercased)
+NA_TOKENS = {"", "na", "n/a", "n.a.", "nan", "null", "none", "nil", "-", "--", "..."}
+
+# Integers above this are not exact in float32
+FLOAT32_EXACT_LIMIT = 2 ** 24
+
+# Max distinct/total ratio for other text columns to become categoricals
+CATEGORY_RATIO = 0.5
+
+
+def _is_raw_text(dtype: Any) -> bool:
+    """Text as read from a source: object, or pandas 3's default ``str``
+    (normalized free text is the NA-aware ``string`` dtype)"""
+    if dtype == object:
+        return True
+    return isinstance(dtype, pd.StringDtype) and getattr(dtype, "na_value", pd.NA) is not pd.NA
+
+
+class DataNormalizer:
+    """Normalizes raw dataset frames to the canonical schema"""
+
+    def normalize(
+        self,
+        dataset_key: str,
+        df: pd.DataFrame,
+        schema: Optional[Dict[str, Any]] = None
+    ) -> pd.DataFrame:
+        """
+        Map columns to canonical names and coerce compact dtypes
+
+        ``schema`` is the dataset's registry mapping: ``columns`` renames
+        applied before the generic aliases and ``wide_months_value``, the
+        value name for one-column-per-month layouts. Years become int16,
+        months an ordered ``Jan``..``Dec`` categorical, dimensions (state,
+        crop, ...) categoricals, integer columns the smallest integer type
+        that holds them and other measures float32 (unless that would round
+        large whole numbers such as identifiers). Already-normalized frames
+        pass through unchanged.
+        """
+        if df.empty:
+            return df
+
+        schema = schema or {}
+        df = self._rename_columns(df, schema.get("columns") or {})
+        if self.is_normalized(df):
+            return df
+
+        value_name = schema.get("wide_months_value")
+        if value_name and "Month" not in df.columns:
+            df = self._melt_months(df, value_name)
+
+        for column in df.columns:
+            if column == "Year":
+                df[column] = self._coerce_year(df[column])
+            elif column == "Month":
+                df[column] = self._coerce_month(df[column])
+            elif column in DIMENSION_COLUMNS:
+                df[column] = self._coerce_dimension(df[column])
+            else:
+                df[column] = self._coerce_other(df[column])
+
+        return df.reset_index(drop=True)
+
+    def is_normalized(self, df: pd.DataFrame) -> bool:
+        """Whether a frame already uses the compact canonical dtypes"""
+        if any(_is_raw_text(dtype) for dtype in df.dtypes):
+            return False
+        if any(not isinstance(df[col].dtype, pd.CategoricalDtype)
+               for col in DIMENSION_COLUMNS if col in df.columns):
+            return False
+        if "Year" in df.columns and str(df["Year"].dtype) not in ("int16", "Int16"):
+            return False
+        if "Month" in df.columns and df["Month"].dtype != MONTH_DTYPE:
+            return False
+        return True
+
+    def _rename_columns(self, df: pd.DataFrame, mapping: Dict[str, str]) -> pd.DataFrame:
+        renames = {}
+        for column in df.columns:
+            key = str(column).strip().lower().replace(" ", "_")
+            target = mapping.get(key) or COLUMN_ALIASES.get(key)
+            if target and target not in df.columns:
+                renames[column] = target
+        return df.rename(columns=renames)
+
+    def _melt_months(self, df: pd.DataFrame, value_name: str) -> pd.DataFrame:
+        """Turn one-column-per-month layouts into long Month rows"""
+        lookup = {}
+        for full, short in zip(MONTH_FULL_NAMES, MONTH_NAMES):
+            lookup[full.lower()] = short
+            lookup[short.lower()] = short
+        month_columns = {col: lookup[str(col).strip().lower()]
+                         for col in df.columns
+                         if str(col).strip().lower() in lookup}
+        if len(month_columns) < 12:
+            return df
+
+        id_columns = [col for col in df.columns if col in ("State", "Year", "District")]
+        long = df[id_columns + list(month_columns)].melt(
+            id_vars=id_columns, var_name="Month", value_name=value_name
+        )
+        long["Month"] = long["Month"].map(month_columns)
+        return long
+
+    def _coerce_year(self, series: pd.Series) -> pd.Series:
+        if not pd.api.types.is_numeric_dtype(series):
+            # Crop years such as "2013-14" keep their first calendar year
+            series = series.astype(str).str.extract(r"(\d{4})", expand=False)
+        years = pd.to_numeric(series, errors="coerce")
+        if years.isna().any():
+            return years.astype("Int16")
+        return years.astype("int16")
+
+    def _coerce_month(self, series: pd.Series) -> pd.Series:
+        if pd.api.types.is_numeric_dtype(series):
+            names = series.map(lambda m: MONTH_NAMES[int(m) - 1] if 1 <= m <= 12 else None)
+        else:
+            text = series.astype(str).str.strip()
+            numeric = pd.to_numeric(text, errors="coerce")
+            names = text.str[:3].str.title()
+            from_numbers = numeric.dropna().astype(int)
+            names.loc[from_numbers.index] = from_numbers.map(
+                lambda m: MONTH_NAMES[m - 1] if 1 <= m <= 12 else None
+            )
+        return names.astype(MONTH_DTYPE)
+
+    def _coerce_dimension(self, series: pd.Series) -> pd.Series:
+        """Stripped text categories; missing values stay null (not "nan")"""
+        text = series.astype(str).str.strip()
+        missing = series.isna() | text.str.lower().isin(NA_TOKENS)
+        return text.where(~missing).astype("category")
+
+    def _coerce_other(self, series: pd.Series) -> pd.Series:
+        if pd.api.types.is_bool_dtype(series) or isinstance(series.dtype, pd.CategoricalDtype):
+            return series
+        if pd.api.types.is_integer_dtype(series):
+            # Lossless: ids and counts keep their exact values
+            return pd.to_numeric(series, downcast="integer")
+        if pd.api.types.is_numeric_dtype(series):
+            return self._compact_float(series)
+
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            text = series.astype(str).str.strip()
+            missing = series.isna() | text.str.lower().isin(NA_TOKENS)
+            present = ~missing
+            if not present.any():
+                return pd.Series(np.nan, index=series.index, dtype="float32")
+            numeric = pd.to_numeric(text.where(present).str.replace(",", "", regex=False), errors="coerce")
+            # Parse rate over real values; NA tokens and nulls do not count
+            if numeric[present].notna().mean() >= NUMERIC_PARSE_THRESHOLD:
+                return self._compact_float(numeric)
+            values = series.where(present)
+            if values.nunique(dropna=True) <= CATEGORY_RATIO * max(int(present.sum()), 1):
+                return values.astype("category")
+            return values.astype("string")
+
+        return series
+
+    def _compact_float(self, series: pd.Series) -> pd.Series:
+        """float32, unless whole numbers too large for it to hold exactly"""
+        values = series.to_numpy(dtype="float64", na_value=np.nan)
+        finite = values[np.isfinite(values)]
+        if len(finite) and np.abs(finite).max() > FLOAT32_EXACT_LIMIT and (finite == np.round(finite)).all():
+            return pd.to_numeric(series.astype("Int64"), downcast="integer")
+        return series.astype("float32")
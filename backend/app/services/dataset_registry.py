@@ -0,0 +1,411 @@
+"""
+Dataset Registry
+Dataset definitions (schema mappings, refresh policies) from the YAML catalog
+plus datasets registered at runtime in SQLite, hot-reloaded while serving
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+import yaml
+from sqlalchemy import JSON, Boolean, Column, Float, String, create_engine, event, func, select
+from sqlalchemy.orm import Session, declarative_base
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+Base = declarative_base()
+
+DEFAULT_CATALOG = Path(__file__).resolve().parents[1] / "core" / "datasets.yaml"
+
+REQUIRED_FIELDS = ("name", "category", "description")
+
+SOURCES = ("api", "file")
+
+REFRESH_FIELDS = ("ttl", "auto_refresh", "stale_while_revalidate", "preload")
+
+# Definition fields that change the cached data rather than its description
+DATA_FIELDS = ("id", "source", "path", "schema", "updated_field", "key_fields")
+
+# {"added": [keys], "updated": [keys], "removed": [keys], "data_changed": [keys]}
+# where data_changed lists the updated keys whose cached data is stale
+Changes = Dict[str, List[str]]
+
+
+class RegisteredDataset(Base):
+    """A dataset registered at runtime; removals are soft so other processes see them"""
+    __tablename__ = "dataset_definitions"
+
+    key = Column(String(128), primary_key=True)
+    definition = Column(JSON, nullable=False)
+    deleted = Column(Boolean, nullable=False, default=False)
+    updated_at = Column(Float, nullable=False)
+
+
+def validate_definition(dataset_key: str, info: Any) -> Dict[str, Any]:
+    """
+    Check a dataset definition and fill in its defaults
+
+    Raises ``ValueError`` describing the first problem found.
+    """
+    if not isinstance(info, dict):
+        raise ValueError(f"{dataset_key}: definition must be a mapping")
+    missing = [field for field in REQUIRED_FIELDS if not info.get(field)]
+    if missing:
+        raise ValueError(f"{dataset_key}: missing {', '.join(missing)}")
+
+    source = info.get("source") or "api"
+    if source not in SOURCES:
+        raise ValueError(f"{dataset_key}: source must be one of {', '.join(SOURCES)}")
+    if source == "file" and not info.get("path"):
+        raise ValueError(f"{dataset_key}: file datasets need a path")
+
+    schema = info.get("schema") or {}
+    if not isinstance(schema, dict) or not isinstance(schema.get("columns") or {}, dict):
+        raise ValueError(f"{dataset_key}: schema.columns must map raw to canonical names")
+
+    key_fields = info.get("key_fields") or []
+    if not isinstance(key_fields, list) or not all(isinstance(col, str) for col in key_fields):
+        raise ValueError(f"{dataset_key}: key_fields must be a list of column names")
+
+    refresh = info.get("refresh") or {}
+    if not isinstance(refresh, dict):
+        raise ValueError(f"{dataset_key}: refresh must be a mapping")
+    unknown = sorted(set(refresh) - set(REFRESH_FIELDS))
+    if unknown:
+        raise ValueError(f"{dataset_key}: unknown refresh settings {', '.join(unknown)}")
+    ttl = refresh.get("ttl")
+    if ttl is not None and (isinstance(ttl, bool) or not isinstance(ttl, (int, float)) or ttl <= 0):
+        raise ValueError(f"{dataset_key}: refresh.ttl must be a positive number of seconds")
+
+    return {
+        **info,
+        "id": str(info.get("id") or dataset_key),
+        "url": info.get("url") or "",
+        "source": source,
+        "schema": schema,
+        "refresh": refresh,
+    }
+
+
+def diff_definitions(old: Dict[str, Dict[str, Any]], new: Dict[str, Dict[str, Any]]) -> Changes:
+    updated = [key for key in new if key in old and new[key] != old[key]]
+    return {
+        "added": [key for key in new if key not in old],
+        "updated": updated,
+        "removed": [key for key in old if key not in new],
+        "data_changed": [
+            key for key in updated
+            if any(old[key].get(field) != new[key].get(field) for field in DATA_FIELDS)
+        ],
+    }
+
+
+class DatasetRegistry(Mapping):
+    """
+    The dataset catalog, as a read-only ``{key: definition}`` mapping
+
+    Definitions come from the YAML catalog (``DATASET_REGISTRY_FILE``) and
+    from datasets registered at runtime, stored in SQLite so every worker
+    and the ingestion CLI share them; catalog entries take precedence.
+    Nothing is read until the first lookup, after which definitions are
+    held in a dict: lookups are O(1) and never touch the stores. ``reload``
+    re-reads the stores only when the catalog file or the table changed,
+    and ``start`` polls for that in the background, passing the added,
+    updated and removed keys to subscribers.
+    """
+
+    def __init__(
+        self,
+        catalog_path: Optional[Path] = None,
+        db_url: Optional[str] = None,
+        poll_interval: Optional[float] = None
+    ):
+        self.catalog_path = Path(catalog_path or settings.DATASET_REGISTRY_FILE or DEFAULT_CATALOG)
+        self.db_url = db_url or settings.DATASET_REGISTRY_DB_URL or \
+            f"sqlite:///{Path(settings.DATA_DIRECTORY) / 'datasets.db'}"
+        self.poll_interval = poll_interval if poll_interval is not None \
+            else settings.DATASET_REGISTRY_POLL_INTERVAL
+        self._engine = None
+        self._definitions: Optional[Dict[str, Dict[str, Any]]] = None
+        # Definitions as of the last notification of subscribers
+        self._notified: Dict[str, Dict[str, Any]] = {}
+        self._configured: frozenset = frozenset()
+        self._versions: Tuple[Any, Any] = (None, None)
+        self._lock = threading.Lock()
+        self._subscribers: List[Callable[[Changes], Awaitable[None]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    # Mapping interface
+
+    def __getitem__(self, dataset_key: str) -> Dict[str, Any]:
+        return self._load()[dataset_key]
+
+    def __contains__(self, dataset_key: object) -> bool:
+        return dataset_key in self._load()
+
+    def __iter__(self) -> Iterator[str]:
+        # A snapshot: a reload may swap the dict while callers iterate
+        return iter(list(self._load()))
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+    # Definition accessors
+
+    def schema(self, dataset_key: str) -> Dict[str, Any]:
+        """Schema mapping for the normalizer (empty for unknown datasets)"""
+        info = self._load().get(dataset_key)
+        return info["schema"] if info else {}
+
+    def refresh_policy(self, dataset_key: str) -> Dict[str, Any]:
+        """Refresh settings of a dataset with the global defaults filled in"""
+        info = self._load().get(dataset_key) or {}
+        return {
+            "ttl": settings.CACHE_TTL,
+            "auto_refresh": True,
+            "stale_while_revalidate": settings.STALE_WHILE_REVALIDATE,
+            "preload": False,
+            **info.get("refresh", {}),
+        }
+
+    def preload_keys(self) -> List[str]:
+        """Datasets loaded during warmup; the others load on first use"""
+        return [key for key in self if self.refresh_policy(key)["preload"]]
+
+    def is_configured(self, dataset_key: str) -> bool:
+        """Whether a dataset is defined in the YAML catalog (and so read-only)"""
+        self._load()
+        return dataset_key in self._configured
+
+    # Loading and hot reload
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        definitions = self._definitions
+        if definitions is None:
+            with self._lock:
+                if self._definitions is None:
+                    self._versions = self._current_versions()
+                    self._definitions, self._configured = self._read()
+                    self._notified = self._definitions
+                    logger.info(f"Dataset registry loaded: {len(self._definitions)} datasets")
+                definitions = self._definitions
+        return definitions
+
+    def _get_engine(self):
+        if self._engine is None:
+            connect_args = {"check_same_thread": False} if self.db_url.startswith("sqlite") else {}
+            engine = create_engine(self.db_url, connect_args=connect_args)
+            if self.db_url.startswith("sqlite"):
+                # WAL lets workers poll while the CLI registers
+                event.listen(engine, "connect", _enable_wal)
+            Base.metadata.create_all(engine)
+            self._engine = engine
+            self._import_json_registry()
+        return self._engine
+
+    def _import_json_registry(self):
+        """Move datasets registered in the older ``datasets.json`` into SQLite"""
+        legacy_path = Path(settings.DATA_DIRECTORY) / "datasets.json"
+        if not legacy_path.exists():
+            return
+        try:
+            registered = json.loads(legacy_path.read_text())
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable {legacy_path}: {e}")
+            return
+        with Session(self._engine) as session:
+            for dataset_key, info in registered.items():
+                if session.get(RegisteredDataset, dataset_key) is None:
+                    session.add(RegisteredDataset(
+                        key=dataset_key, definition=info, deleted=False, updated_at=time.time()
+                    ))
+            session.commit()
+        legacy_path.rename(legacy_path.with_suffix(".json.imported"))
+        logger.info(f"Imported {len(registered)} datasets from {legacy_path}")
+
+    def _catalog_version(self) -> Any:
+        try:
+            stat = self.catalog_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _db_version(self) -> Any:
+        with Session(self._get_engine()) as session:
+            return tuple(session.execute(
+                select(func.count(), func.max(RegisteredDataset.updated_at))
+            ).one())
+
+    def _current_versions(self) -> Tuple[Any, Any]:
+        return self._catalog_version(), self._db_version()
+
+    def _read(self) -> Tuple[Dict[str, Dict[str, Any]], frozenset]:
+        configured = self._read_catalog()
+        definitions = {}
+        for dataset_key, info in self._read_registered().items():
+            if dataset_key in configured:
+                logger.warning(f"Registered dataset {dataset_key} is shadowed by the catalog")
+                continue
+            definitions[dataset_key] = info
+        definitions.update(configured)
+        return definitions, frozenset(configured)
+
+    def _read_catalog(self) -> Dict[str, Dict[str, Any]]:
+        if not self.catalog_path.exists():
+            logger.warning(f"Dataset catalog {self.catalog_path} not found")
+            return {}
+        try:
+            entries = yaml.safe_load(self.catalog_path.read_text()) or {}
+            if not isinstance(entries, dict):
+                raise ValueError("expected a mapping of dataset keys to definitions")
+        except (yaml.YAMLError, ValueError) as e:
+            if self._definitions is None:
+                raise ValueError(f"Invalid dataset catalog {self.catalog_path}: {e}") from e
+            # Keep serving the previous catalog while the file is being edited
+            logger.error(f"Ignoring invalid dataset catalog {self.catalog_path}: {e}")
+            return {key: self._definitions[key] for key in self._configured
+                    if key in self._definitions}
+        return _validated(entries, str(self.catalog_path))
+
+    def _read_registered(self) -> Dict[str, Dict[str, Any]]:
+        with Session(self._get_engine()) as session:
+            rows = session.execute(
+                select(RegisteredDataset.key, RegisteredDataset.definition)
+                .where(RegisteredDataset.deleted.is_(False))
+            ).all()
+        return _validated(dict(rows), "registered datasets")
+
+    def reload(self, force: bool = False) -> Changes:
+        """
+        Re-read the stores if either changed (or ``force``)
+
+        Returns the keys whose definitions were added, updated or removed.
+        """
+        if self._definitions is None:
+            # Nobody has seen the old definitions: nothing to report
+            self._load()
+            return diff_definitions({}, {})
+
+        with self._lock:
+            versions = self._current_versions()
+            if not force and versions == self._versions:
+                return diff_definitions({}, {})
+            definitions, configured = self._read()
+            changes = diff_definitions(self._definitions, definitions)
+            # Readers keep whichever dict they already hold
+            self._definitions, self._configured, self._versions = definitions, configured, versions
+
+        if any(changes.values()):
+            logger.info(
+                "Dataset registry reloaded: "
+                + ", ".join(f"{len(changes[kind])} {kind}" for kind in ("added", "updated", "removed"))
+            )
+        return changes
+
+    def subscribe(self, callback: Callable[[Changes], Awaitable[None]]):
+        """Call ``await callback(changes)`` after every reload that changed something"""
+        self._subscribers.append(callback)
+
+    async def refresh(self, force: bool = False) -> Changes:
+        """
+        Reload off the event loop and notify subscribers of any changes
+
+        Changes are relative to the last notification, so they include
+        those applied by ``register``, ``unregister`` or a plain ``reload``
+        in this process.
+        """
+        await asyncio.to_thread(self.reload, force)
+        definitions = self._load()
+        changes = diff_definitions(self._notified, definitions)
+        self._notified = definitions
+        if any(changes.values()):
+            for callback in self._subscribers:
+                try:
+                    await callback(changes)
+                except Exception as e:
+                    logger.error(f"Dataset registry subscriber failed: {e}", exc_info=True)
+        return changes
+
+    def start(self):
+        """Poll the stores every ``poll_interval`` seconds"""
+        if self.poll_interval > 0 and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Dataset registry polling every {self.poll_interval}s")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Dataset registry reload failed: {e}", exc_info=True)
+
+    # Runtime registration
+
+    def register(self, dataset_key: str, info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Add or replace a runtime dataset definition
+
+        Catalog datasets cannot be overridden. Running servers pick the
+        change up on their next poll; this registry sees it immediately.
+        """
+        definition = validate_definition(dataset_key, info)
+        if self.is_configured(dataset_key):
+            raise ValueError(f"{dataset_key} is defined in {self.catalog_path.name}")
+        with Session(self._get_engine()) as session:
+            session.merge(RegisteredDataset(
+                key=dataset_key, definition=info, deleted=False, updated_at=time.time()
+            ))
+            session.commit()
+        self.reload()
+        return definition
+
+    def unregister(self, dataset_key: str) -> bool:
+        """Remove a runtime dataset definition; False if there was none"""
+        if self.is_configured(dataset_key):
+            raise ValueError(f"{dataset_key} is defined in {self.catalog_path.name}")
+        with Session(self._get_engine()) as session:
+            row = session.get(RegisteredDataset, dataset_key)
+            if row is None or row.deleted:
+                return False
+            row.deleted = True
+            row.updated_at = time.time()
+            session.commit()
+        self.reload()
+        return True
+
+    def close(self):
+        if self._engine is not None:
+            self._engine.dispose()
+
+
+def _validated(entries: Dict[str, Any], origin: str) -> Dict[str, Dict[str, Any]]:
+    """Valid definitions of a store; invalid ones are logged and skipped"""
+    definitions = {}
+    for dataset_key, info in entries.items():
+        try:
+            definitions[str(dataset_key)] = validate_definition(str(dataset_key), info)
+        except ValueError as e:
+            logger.error(f"Skipping invalid dataset definition in {origin}: {e}")
+    return definitions
+
+
+def _enable_wal(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.close()
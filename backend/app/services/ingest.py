@@ -0,0 +1,312 @@
+"""
+Dataset Ingestion
+Streams local CSV, Excel and JSON files into the parquet cache one
+row group at a time, so large bulk downloads load in bounded memory
+"""
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pyarrow.types as pa_types
+
+from app.core.config import settings
+from app.services.data_normalizer import DataNormalizer
+
+logger = logging.getLogger(__name__)
+
+# File suffix -> reader
+FORMATS = {
+    ".csv": "csv",
+    ".tsv": "tsv",
+    ".txt": "csv",
+    ".xlsx": "xlsx",
+    ".xlsm": "xlsx",
+    ".xls": "xls",
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+}
+
+# Compressed CSV/JSON is decompressed on the fly by pandas
+COMPRESSION_SUFFIXES = {".gz", ".bz2", ".zip", ".xz", ".zst"}
+
+JSON_BLOCK_SIZE = 1 << 20
+
+
+class DatasetTooLarge(ValueError):
+    """The ingested dataset exceeds MAX_DATASET_SIZE_MB"""
+
+
+def detect_format(path: Path) -> str:
+    """Reader for a file, from its (possibly compressed) suffix"""
+    suffixes = [suffix.lower() for suffix in path.suffixes]
+    if suffixes and suffixes[-1] in COMPRESSION_SUFFIXES:
+        suffixes = suffixes[:-1]
+    if not suffixes or suffixes[-1] not in FORMATS:
+        raise ValueError(
+            f"Unsupported file type: {path.name} (expected one of {', '.join(sorted(FORMATS))})"
+        )
+    return FORMATS[suffixes[-1]]
+
+
+def iter_frames(path: Path, file_format: str, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Raw frames of at most ``chunk_rows`` rows, read incrementally"""
+    if file_format in ("csv", "tsv"):
+        # Everything as text; the normalizer decides the types
+        with pd.read_csv(
+            path, sep="\t" if file_format == "tsv" else ",", dtype=str,
+            chunksize=chunk_rows, skipinitialspace=True
+        ) as reader:
+            yield from reader
+    elif file_format == "ndjson":
+        with pd.read_json(path, lines=True, dtype=False, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif file_format == "json":
+        yield from _batches(_iter_json_records(path), chunk_rows)
+    elif file_format == "xlsx":
+        yield from _iter_xlsx(path, chunk_rows)
+    elif file_format == "xls":
+        yield from _iter_xls(path, chunk_rows)
+    else:
+        raise ValueError(f"Unsupported format: {file_format}")
+
+
+def _batches(records: Iterator[Dict[str, Any]], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch)
+
+
+def _iter_json_records(path: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Records of a JSON array file, decoded one at a time
+
+    Accepts a top-level array or a data.gov.in response object whose
+    ``records`` key holds the array. Only the current block and record
+    are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = f.read(JSON_BLOCK_SIZE)
+
+        # Find the opening bracket of the records array
+        while True:
+            stripped = buffer.lstrip()
+            if stripped.startswith("["):
+                position = len(buffer) - len(stripped) + 1
+                break
+            marker = buffer.find('"records"')
+            if marker != -1:
+                bracket = buffer.find("[", marker)
+                if bracket != -1:
+                    position = bracket + 1
+                    break
+            block = f.read(JSON_BLOCK_SIZE)
+            if not block:
+                raise ValueError(f"No records array found in {path.name}")
+            buffer += block
+
+        while True:
+            # Skip separators, then decode the next record from the buffer
+            while True:
+                while position < len(buffer) and buffer[position] in " \t\r\n,":
+                    position += 1
+                if position < len(buffer):
+                    break
+                block = f.read(JSON_BLOCK_SIZE)
+                if not block:
+                    return
+                buffer, position = block, 0
+
+            if buffer[position] == "]":
+                return
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                block = f.read(JSON_BLOCK_SIZE)
+                if not block:
+                    raise
+                buffer, position = buffer[position:] + block, 0
+                continue
+            yield record
+            position = end
+
+
+def _iter_xlsx(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Rows of the first worksheet, streamed by openpyxl's read-only mode"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        yield from _row_batches(rows, chunk_rows)
+    finally:
+        workbook.close()
+
+
+def _iter_xls(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Rows of the first sheet of a legacy .xls workbook (at most 65,536 rows)"""
+    import xlrd
+
+    workbook = xlrd.open_workbook(str(path), on_demand=True)
+    try:
+        sheet = workbook.sheet_by_index(0)
+        rows = (sheet.row_values(index) for index in range(sheet.nrows))
+        yield from _row_batches(rows, chunk_rows)
+    finally:
+        workbook.release_resources()
+
+
+def _row_batches(rows: Iterator[tuple], chunk_rows: int) -> Iterator[pd.DataFrame]:
+    """Frames from header-first row tuples, skipping blank rows"""
+    header = None
+    batch: List[tuple] = []
+    for row in rows:
+        if not any(value not in (None, "") for value in row):
+            continue
+        if header is None:
+            header = [str(value).strip() if value is not None else f"column_{i}"
+                      for i, value in enumerate(row)]
+            continue
+        row = tuple(row[:len(header)])
+        batch.append(row + (None,) * (len(header) - len(row)))
+        if len(batch) >= chunk_rows:
+            yield pd.DataFrame(batch, columns=header)
+            batch = []
+    if batch:
+        yield pd.DataFrame(batch, columns=header)
+
+
+def _file_schema(table: pa.Table) -> pa.Schema:
+    """
+    Schema for the whole file, from the first chunk
+
+    Dictionary indices are widened to int32 because later chunks may
+    bring more categories than the first, and integer columns to int64
+    because each chunk is downcast to its own range (Year keeps int16).
+    """
+    fields = []
+    for field in table.schema:
+        if pa_types.is_dictionary(field.type):
+            field = field.with_type(
+                pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered)
+            )
+        elif pa_types.is_integer(field.type) and field.name != "Year":
+            field = field.with_type(pa.int64())
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+def _conform(df: pd.DataFrame, schema: pa.Schema, dataset_key: str) -> pa.Table:
+    """Make a normalized chunk match the file schema"""
+    extra = [column for column in df.columns if column not in schema.names]
+    if extra:
+        logger.warning(f"Dropping columns not in the first chunk of {dataset_key}: {extra}")
+
+    for field in schema:
+        if field.name not in df.columns:
+            df[field.name] = None
+            continue
+        column = df[field.name]
+        numeric_target = pa_types.is_integer(field.type) or pa_types.is_floating(field.type)
+        if numeric_target and not pd.api.types.is_numeric_dtype(column):
+            # Per-chunk type inference disagreed with the first chunk
+            df[field.name] = pd.to_numeric(
+                column.astype(str).str.replace(",", "", regex=False), errors="coerce"
+            )
+        elif not numeric_target and pd.api.types.is_numeric_dtype(column):
+            df[field.name] = column.astype(str)
+
+    table = pa.Table.from_pandas(df[schema.names], preserve_index=False)
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        raise ValueError(f"Chunk of {dataset_key} does not match the file schema: {e}") from e
+
+
+def ingest_file(
+    dataset_key: str,
+    source: Path,
+    destination: Path,
+    chunk_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    schema: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Convert a CSV/TSV, XLSX/XLS, JSON or NDJSON file to a normalized parquet file
+
+    Each chunk is normalized (with the dataset's registry ``schema``
+    mapping) and written as its own row group, so memory is
+    bounded by ``chunk_rows`` rather than the file size. The output goes to
+    a temporary file that replaces ``destination`` only once complete;
+    ingestion stops with ``DatasetTooLarge`` as soon as the output exceeds
+    ``max_bytes`` (default ``MAX_DATASET_SIZE_MB``).
+
+    Returns ``{"rows", "row_groups", "bytes", "columns", "format", "elapsed"}``.
+    """
+    source = Path(source)
+    chunk_rows = chunk_rows or settings.INGEST_CHUNK_ROWS
+    max_bytes = max_bytes or settings.MAX_DATASET_SIZE_MB * 1024 * 1024
+    file_format = detect_format(source)
+    normalizer = DataNormalizer()
+
+    start = time.perf_counter()
+    tmp_path = destination.with_suffix(".parquet.tmp")
+    writer: Optional[pq.ParquetWriter] = None
+    file_schema: Optional[pa.Schema] = None
+    rows = row_groups = 0
+    try:
+        for raw in iter_frames(source, file_format, chunk_rows):
+            df = normalizer.normalize(dataset_key, raw, schema)
+            if df.empty:
+                continue
+            if file_schema is None:
+                file_schema = _file_schema(pa.Table.from_pandas(df, preserve_index=False))
+                writer = pq.ParquetWriter(tmp_path, file_schema)
+            writer.write_table(_conform(df, file_schema, dataset_key), row_group_size=chunk_rows)
+            rows += len(df)
+            row_groups += 1
+
+            size = tmp_path.stat().st_size
+            if size > max_bytes:
+                raise DatasetTooLarge(
+                    f"{dataset_key} exceeds MAX_DATASET_SIZE_MB "
+                    f"({size / 2 ** 20:.0f} MB after {rows:,} rows)"
+                )
+            logger.debug(f"Ingested {rows:,} rows of {dataset_key}")
+
+        if writer is None:
+            raise ValueError(f"No rows found in {source.name}")
+        writer.close()
+        writer = None
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, destination)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp_path.unlink(missing_ok=True)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Ingested {source.name} into {dataset_key}: {rows:,} rows, "
+        f"{row_groups} row groups, {size / 2 ** 20:.1f} MB in {elapsed:.1f}s"
+    )
+    return {
+        "rows": rows,
+        "row_groups": row_groups,
+        "bytes": size,
+        "columns": file_schema.names,
+        "format": file_format,
+        "elapsed": round(elapsed, 2),
+    }
@@ -0,0 +1,254 @@
+"""
+LLM Call Resilience
+Retries with backoff, per-provider circuit breakers, hedged requests and
+latency/error statistics for LLM provider calls
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.admission import remaining_time
+
+logger = logging.getLogger(__name__)
+
+# Exception class names (across the OpenAI, Anthropic, Google and aiohttp
+# clients) that indicate a transient failure worth retrying
+RETRYABLE_ERROR_NAMES = (
+    "RateLimit", "Timeout", "APIConnection", "InternalServer",
+    "ServiceUnavailable", "Overloaded", "ResourceExhausted", "DeadlineExceeded",
+    "ClientConnect", "ServerDisconnected", "ClientPayload",
+)
+
+LATENCY_WINDOW = 200  # samples kept per model
+MIN_LATENCY_SAMPLES = 20  # before p95 is trusted for hedging
+
+
+class ProviderUnavailable(Exception):
+    """Raised when every candidate provider is failing or circuit-open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an LLM call error is transient (network, timeout, 429, 5xx)"""
+    if isinstance(error, (ConnectionError, asyncio.TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    name = type(error).__name__
+    return any(fragment in name for fragment in RETRYABLE_ERROR_NAMES)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter for the given retry attempt"""
+    ceiling = min(settings.LLM_RETRY_MAX_DELAY, settings.LLM_RETRY_BASE_DELAY * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+class ProviderHealth:
+    """
+    Circuit breaker and call statistics for one provider
+
+    The circuit opens after ``CIRCUIT_FAILURE_THRESHOLD`` consecutive
+    transient failures; after ``CIRCUIT_RESET_TIMEOUT`` seconds a single
+    trial call is let through (half-open), and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.calls = 0
+        self.errors = 0
+        self.latencies: Dict[str, Deque[float]] = {}
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= settings.CIRCUIT_RESET_TIMEOUT:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may be made now"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def release_trial(self):
+        self._trial_in_flight = False
+
+    def record_success(self, model: str, latency: float):
+        self.calls += 1
+        self.latencies.setdefault(model, deque(maxlen=LATENCY_WINDOW)).append(latency)
+        self.consecutive_failures = 0
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self, error: Exception):
+        self.calls += 1
+        self.errors += 1
+        self._trial_in_flight = False
+        if not is_retryable(error):
+            # Bad requests say nothing about the provider's health
+            return
+        self.consecutive_failures += 1
+        if self.opened_at is not None or self.consecutive_failures >= settings.CIRCUIT_FAILURE_THRESHOLD:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after "
+                               f"{self.consecutive_failures} consecutive failures")
+            self.opened_at = time.monotonic()
+
+    def percentile(self, model: str, q: float) -> Optional[float]:
+        """Latency percentile (seconds) for a model, if enough samples exist"""
+        samples = self.latencies.get(model)
+        if not samples or len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Any]:
+        latency = {}
+        for model, samples in self.latencies.items():
+            ordered = sorted(samples)
+            latency[model] = {
+                "samples": len(ordered),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1),
+                "p95_ms": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 1),
+            }
+        return {
+            "state": self.state,
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.calls, 4) if self.calls else 0.0,
+            "latency": latency,
+        }
+
+
+_health: Dict[str, ProviderHealth] = {}
+hedge_stats = {"hedged": 0, "hedge_wins": 0}
+
+
+def get_provider_health(name: str) -> ProviderHealth:
+    """Process-wide health record for a provider"""
+    if name not in _health:
+        _health[name] = ProviderHealth(name)
+    return _health[name]
+
+
+def provider_stats() -> Dict[str, Any]:
+    """Latency, error-rate and circuit state of every provider used so far"""
+    return {
+        "providers": {name: health.stats() for name, health in _health.items()},
+        **hedge_stats,
+    }
+
+
+# (provider name, model, zero-argument coroutine factory making the call)
+Candidate = Tuple[str, str, Callable[[], Awaitable[str]]]
+
+
+async def call_with_retries(name: str, model: str, call: Callable[[], Awaitable[str]]) -> str:
+    """
+    Call one provider, retrying transient errors with exponential backoff
+
+    Retries stop when the provider's circuit opens or when the backoff
+    would not fit in the request's remaining time.
+    """
+    health = get_provider_health(name)
+    for attempt in range(settings.LLM_MAX_RETRIES + 1):
+        if not health.allow():
+            raise ProviderUnavailable(f"Circuit for {name} is open")
+
+        start = time.monotonic()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            # e.g. a hedge that lost the race; don't leave a trial call pending
+            health.release_trial()
+            raise
+        except Exception as e:
+            health.record_failure(e)
+            if (not is_retryable(e) or attempt == settings.LLM_MAX_RETRIES
+                    or health.state == "open"):
+                raise
+
+            delay = backoff_delay(attempt)
+            remaining = remaining_time()
+            if remaining is not None and delay >= remaining:
+                raise
+            logger.warning(f"{name}/{model} failed ({e}); retry {attempt + 1} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            continue
+
+        health.record_success(model, time.monotonic() - start)
+        return result
+
+
+async def call_with_failover(candidates: List[Candidate]) -> str:
+    """
+    Call the first healthy candidate, failing over to the next on error
+
+    With ``LLM_HEDGE_REQUESTS`` a second candidate is started once the first
+    has been running longer than its p95 latency, and the first successful
+    answer wins.
+    """
+    candidates = [c for c in candidates if get_provider_health(c[0]).state != "open"]
+    if not candidates:
+        raise ProviderUnavailable("All LLM providers are circuit-open")
+
+    if settings.LLM_HEDGE_REQUESTS and len(candidates) > 1:
+        return await _hedged(candidates[0], candidates[1], candidates[2:])
+
+    last_error: Optional[Exception] = None
+    for name, model, call in candidates:
+        try:
+            return await call_with_retries(name, model, call)
+        except Exception as e:
+            last_error = e
+            logger.warning(f"LLM provider {name} failed ({e}), trying next provider")
+    raise last_error
+
+
+async def _hedged(primary: Candidate, backup: Candidate, rest: List[Candidate]) -> str:
+    """Race the primary against a backup started after the primary's p95"""
+    name, model, _ = primary
+    delay = get_provider_health(name).percentile(model, 0.95) or settings.LLM_HEDGE_DELAY
+
+    first = asyncio.ensure_future(call_with_retries(*primary))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done and first.exception() is None:
+        return first.result()
+
+    hedge_stats["hedged"] += 1
+    logger.info(f"Hedging {name}/{model} after {delay:.2f}s with {backup[0]}/{backup[1]}")
+    second = asyncio.ensure_future(call_with_retries(*backup))
+    pending = {first, second} - done
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second:
+                        hedge_stats["hedge_wins"] += 1
+                    return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+    # Both failed: fall through to any remaining providers
+    if rest:
+        return await call_with_failover(rest)
+    raise second.exception()
@@ -6,12 +6,23 @@ import logging
 from typing import List, Dict, Any, Optional, Tuple
 import json
 import asyncio
+import hashlib
 from enum import Enum
 
 from app.core.config import settings
+from app.services.cache import get_cache
+from app.services.admission import remaining_time
+from app.services.llm_resilience import call_with_failover
+from app.services.coalescer import RequestCoalescer
 
 logger = logging.getLogger(__name__)
 
+_inflight_decompositions = RequestCoalescer()
+
+# Provider clients are created once per process (SDK imports and HTTP
+# connection pools are not per-request costs)
+_clients: Dict["LLMProvider", Any] = {}
+
 
 class LLMProvider(str, Enum):
     """Supported LLM providers"""
@@ -21,51 +32,83 @@ class LLMProvider(str, Enum):
     OLLAMA = "ollama"
 
 
+class ModelTier(str, Enum):
+    """Model sizes tasks are routed to"""
+    FAST = "fast"  # structured extraction: decomposition, entities
+    STRONG = "strong"  # answer synthesis
+
+
+def strong_model(provider: LLMProvider) -> str:
+    """The provider's model for answer synthesis"""
+    if provider == LLMProvider.OPENAI:
+        return settings.MODEL_NAME
+    if provider == LLMProvider.ANTHROPIC:
+        return "claude-3-sonnet-20240229"
+    if provider == LLMProvider.GOOGLE:
+        return "gemini-pro"
+    return settings.OLLAMA_MODEL
+
+
 class LLMService:
     """Service for LLM interactions"""
     
     def __init__(self):
         self.provider = LLMProvider(settings.LLM_PROVIDER)
-        self.client = None
-        self._initialize_client()
+        self.model = strong_model(self.provider)
+        
+        # (provider, model) per tier; extraction can run on another provider
+        # entirely, e.g. a local Ollama model
+        fast_provider = LLMProvider(settings.FAST_LLM_PROVIDER or settings.LLM_PROVIDER)
+        self.routes = {ModelTier.STRONG: (self.provider, self.model)}
+        if settings.TASK_MODEL_ROUTING:
+            fast_model = settings.FAST_MODELS.get(fast_provider.value) or strong_model(fast_provider)
+            self.routes[ModelTier.FAST] = (fast_provider, fast_model)
+        else:
+            self.routes[ModelTier.FAST] = self.routes[ModelTier.STRONG]
+        
+        self.clients = _clients
+        for provider, model in self.routes.values():
+            if provider not in self.clients:
+                self.clients[provider] = self._initialize_client(provider)
+                logger.info(f"Initialized {provider.value} client with model {model}")
+        self.client = self.clients[self.provider]
     
-    def _initialize_client(self):
-        """Initialize the appropriate LLM client"""
+    def _initialize_client(self, provider: LLMProvider) -> Any:
+        """Initialize the client for an LLM provider"""
         try:
-            if self.provider == LLMProvider.OPENAI:
+            if provider == LLMProvider.OPENAI:
                 from openai import AsyncOpenAI
-                self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
-                self.model = settings.MODEL_NAME
-                logger.info(f"Initialized OpenAI client with model {self.model}")
+                return AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
                 
-            elif self.provider == LLMProvider.ANTHROPIC:
+            elif provider == LLMProvider.ANTHROPIC:
                 from anthropic import AsyncAnthropic
-                self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
-                self.model = "claude-3-sonnet-20240229"
-                logger.info(f"Initialized Anthropic client with model {self.model}")
+                return AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
                 
-            elif self.provider == LLMProvider.GOOGLE:
+            elif provider == LLMProvider.GOOGLE:
                 import google.generativeai as genai
                 genai.configure(api_key=settings.GOOGLE_API_KEY)
-                self.model = "gemini-pro"
-                logger.info(f"Initialized Google client with model {self.model}")
+                return genai
                 
-            elif self.provider == LLMProvider.OLLAMA:
+            elif provider == LLMProvider.OLLAMA:
                 # Ollama uses a local endpoint
                 import aiohttp
-                self.client = aiohttp.ClientSession()
-                self.model = settings.OLLAMA_MODEL
-                self.ollama_url = f"{settings.OLLAMA_BASE_URL}/api/generate"
-                logger.info(f"Initialized Ollama client with model {self.model}")
+                return aiohttp.ClientSession()
                 
         except Exception as e:
-            logger.error(f"Failed to initialize LLM client: {e}")
+            logger.error(f"Failed to initialize {provider.value} client: {e}")
             raise
     
-    async def decompose_query(self, user_query: str) -> Dict[str, Any]:
+    async def decompose_query(
+        self,
+        user_query: str,
+        context: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Decompose a complex query into sub-queries and identify required data
         
+        ``context`` is the conversation summary, used to resolve follow-ups
+        ("what about Haryana?") against earlier questions.
+        
         Returns:
             {
                 "intent": "comparison|trend|correlation|ranking|recommendation",
@@ -79,6 +122,26 @@ class LLMService:
                 "query_type": "agricultural|climate|mixed"
             }
         """
+        # Decompositions are shared across workers, and identical ones in
+        # flight (e.g. repeated questions in a batch) share one LLM call
+        cache = get_cache()
+        cache_key = self._query_cache_key(user_query, context)
+        cached = await cache.get("decomposition", cache_key)
+        if cached is not None:
+            return cached
+        
+        result, _ = await _inflight_decompositions.run(
+            cache_key, lambda: self._decompose(user_query, context, cache_key)
+        )
+        return result
+    
+    async def _decompose(
+        self,
+        user_query: str,
+        context: Optional[str],
+        cache_key: str
+    ) -> Dict[str, Any]:
+        """Run the decomposition prompt and cache a parsed result"""
         prompt = f"""You are an expert at analyzing questions about agricultural and climate data.
 
 Analyze this question and extract:
@@ -86,7 +149,7 @@ Analyze this question and extract:
 2. Break it into specific sub-queries that can be answered with data
 3. Identify required data elements (states, districts, crops, time periods, metrics)
 4. Classify the query type (agricultural, climate, or mixed)
-
+{self._format_conversation(context)}
 Question: {user_query}
 
 Respond in JSON format:
@@ -103,14 +166,9 @@ Respond in JSON format:
     "query_type": "agricultural|climate|mixed"
 }}"""
 
-        response = await self._call_llm(prompt)
-        
-        try:
-            # Extract JSON from response
-            result = self._extract_json(response)
-            return result
-        except Exception as e:
-            logger.error(f"Failed to parse query decomposition: {e}")
+        result = await self._call_llm_json(prompt)
+        if result is None:
+            logger.error("Failed to parse query decomposition")
             # Return a default structure
             return {
                 "intent": "general",
@@ -118,12 +176,16 @@ Respond in JSON format:
                 "required_data": {},
                 "query_type": "mixed"
             }
+        
+        await get_cache().set("decomposition", cache_key, result)
+        return result
     
     async def generate_answer(
         self,
         user_query: str,
         data_context: Dict[str, Any],
-        dataset_info: List[Dict[str, Any]]
+        dataset_info: List[Dict[str, Any]],
+        conversation_context: Optional[str] = None
     ) -> Tuple[str, List[Dict[str, Any]]]:
         """
         Generate an answer based on retrieved data
@@ -132,6 +194,7 @@ Respond in JSON format:
             user_query: Original user question
             data_context: Retrieved data from datasets
             dataset_info: Information about datasets used
+            conversation_context: Summary of earlier turns, if any
             
         Returns:
             (answer_text, citations)
@@ -142,6 +205,7 @@ Respond in JSON format:
         
         prompt = f"""You are an expert agricultural policy analyst with deep knowledge of Indian agriculture and climate patterns.
 
+{self._format_conversation(conversation_context)}
 User Question: {user_query}
 
 Available Data:
@@ -161,7 +225,7 @@ Instructions:
 
 Answer:"""
 
-        answer = await self._call_llm(prompt)
+        answer = await self._call_llm(prompt, tier=ModelTier.STRONG)
         
         # Extract citations
         citations = self._extract_citations(answer, dataset_info)
@@ -198,19 +262,91 @@ Respond in JSON format:
 
 If none found for a category, use an empty list."""
 
-        response = await self._call_llm(prompt)
-        
-        try:
-            return self._extract_json(response)
-        except:
+        result = await self._call_llm_json(prompt)
+        if result is None:
             return {"states": [], "districts": [], "crops": [], "years": []}
+        return result
     
-    async def _call_llm(self, prompt: str, temperature: float = 0.3) -> str:
-        """Call the configured LLM provider"""
+    async def _call_llm(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        tier: ModelTier = ModelTier.STRONG
+    ) -> str:
+        """
+        Call the model for a tier within the request deadline
+        
+        Transient errors are retried with backoff, then the call fails over
+        to ``LLM_BACKUP_PROVIDERS`` (or races them, with hedging enabled).
+        """
+        candidates = [
+            (provider.value, model,
+             lambda provider=provider, model=model: self._call_provider(prompt, temperature, provider, model))
+            for provider, model in self._candidates(tier)
+        ]
+        return await asyncio.wait_for(
+            call_with_failover(candidates),
+            timeout=remaining_time()
+        )
+    
+    def _candidates(self, tier: ModelTier) -> List[Tuple[LLMProvider, str]]:
+        """The tier's route followed by the usable backup providers"""
+        candidates = [self.routes[tier]]
+        for name in settings.LLM_BACKUP_PROVIDERS:
+            provider = LLMProvider(name)
+            if any(provider == existing for existing, _ in candidates):
+                continue
+            if provider not in self.clients:
+                try:
+                    self.clients[provider] = self._initialize_client(provider)
+                except Exception:
+                    # Already logged; a missing backup must not break the primary
+                    self.clients[provider] = None
+            if self.clients[provider] is None:
+                continue
+            
+            if tier == ModelTier.FAST and settings.TASK_MODEL_ROUTING:
+                model = settings.FAST_MODELS.get(provider.value) or strong_model(provider)
+            else:
+                model = strong_model(provider)
+            candidates.append((provider, model))
+        return candidates
+    
+    async def _call_llm_json(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Run a structured-extraction prompt on the fast model
+        
+        Escalates to the strong model when the fast model's output is not
+        valid JSON. Returns None if no model produced parseable JSON.
+        """
+        tiers = [ModelTier.FAST]
+        if self.routes[ModelTier.FAST] != self.routes[ModelTier.STRONG]:
+            tiers.append(ModelTier.STRONG)
+        
+        for tier in tiers:
+            response = await self._call_llm(prompt, tier=tier)
+            try:
+                return self._extract_json(response)
+            except ValueError as e:
+                provider, model = self.routes[tier]
+                logger.warning(f"Unparseable JSON from {provider.value}/{model}: {e}")
+        return None
+    
+    async def _call_provider(
+        self,
+        prompt: str,
+        temperature: float = 0.3,
+        provider: Optional[LLMProvider] = None,
+        model: Optional[str] = None
+    ) -> str:
+        """Call an LLM provider (the configured one by default)"""
+        provider = provider or self.provider
+        model = model or self.model
+        client = self.clients[provider]
         try:
-            if self.provider == LLMProvider.OPENAI:
-                response = await self.client.chat.completions.create(
-                    model=self.model,
+            if provider == LLMProvider.OPENAI:
+                response = await client.chat.completions.create(
+                    model=model,
                     messages=[
                         {"role": "system", "content": "You are a helpful assistant that provides accurate, data-driven answers."},
                         {"role": "user", "content": prompt}
@@ -219,9 +355,9 @@ If none found for a category, use an empty list."""
                 )
                 return response.choices[0].message.content
                 
-            elif self.provider == LLMProvider.ANTHROPIC:
-                response = await self.client.messages.create(
-                    model=self.model,
+            elif provider == LLMProvider.ANTHROPIC:
+                response = await client.messages.create(
+                    model=model,
                     max_tokens=2000,
                     messages=[
                         {"role": "user", "content": prompt}
@@ -230,17 +366,15 @@ If none found for a category, use an empty list."""
                 )
                 return response.content[0].text
                 
-            elif self.provider == LLMProvider.GOOGLE:
-                import google.generativeai as genai
-                model = genai.GenerativeModel(self.model)
-                response = await model.generate_content_async(prompt)
+            elif provider == LLMProvider.GOOGLE:
+                response = await client.GenerativeModel(model).generate_content_async(prompt)
                 return response.text
                 
-            elif self.provider == LLMProvider.OLLAMA:
-                async with self.client.post(
-                    self.ollama_url,
+            elif provider == LLMProvider.OLLAMA:
+                async with client.post(
+                    f"{settings.OLLAMA_BASE_URL}/api/generate",
                     json={
-                        "model": self.model,
+                        "model": model,
                         "prompt": prompt,
                         "stream": False,
                         "temperature": temperature
@@ -250,9 +384,24 @@ If none found for a category, use an empty list."""
                     return result.get("response", "")
                     
         except Exception as e:
-            logger.error(f"LLM call failed: {e}")
+            logger.error(f"LLM call to {provider.value}/{model} failed: {e}")
             raise
     
+    def _query_cache_key(self, query: str, context: Optional[str] = None) -> str:
+        """Cache key for a query: normalized text, conversation context and
+        the extraction route"""
+        normalized = " ".join(query.lower().split())
+        provider, model = self.routes[ModelTier.FAST]
+        return hashlib.sha1(
+            f"{provider.value}:{model}:{normalized}:{context or ''}".encode("utf-8")
+        ).hexdigest()
+    
+    def _format_conversation(self, context: Optional[str]) -> str:
+        """Prompt section for the conversation summary (empty without one)"""
+        if not context:
+            return ""
+        return f"\nConversation so far (most recent last):\n{context}\n"
+    
     def _extract_json(self, text: str) -> Dict[str, Any]:
         """Extract JSON from LLM response"""
         # Try to find JSON in the response
@@ -278,6 +427,9 @@ If none found for a category, use an empty list."""
             if isinstance(data, list) and data:
                 parts.append(f"\n{dataset_key.upper()}:")
                 parts.append(json.dumps(data[:50], indent=2))  # Limit to first 50 rows
+            elif isinstance(data, dict) and data:
+                parts.append(f"\n{dataset_key.upper()}:")
+                parts.append(json.dumps(data, indent=2, default=str))
             elif isinstance(data, str):
                 parts.append(f"\n{dataset_key.upper()}:")
                 parts.append(data)
@@ -329,6 +481,13 @@ If none found for a category, use an empty list."""
         return citations
     
     async def close(self):
-        """Cleanup resources"""
-        if self.provider == LLMProvider.OLLAMA and self.client:
-            await self.client.close()
+        """Cleanup resources (the clients are shared; call at shutdown)"""
+        await close_llm_clients()
+
+
+async def close_llm_clients():
+    """Close the process-wide provider clients"""
+    client = _clients.pop(LLMProvider.OLLAMA, None)
+    if client:
+        await client.close()
+    _clients.clear()
@@ -3,18 +3,41 @@ Query Engine - Orchestrates the entire query processing pipeline
 """
 import logging
 import asyncio
-from typing import Dict, Any, List, Optional
+import re
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-import pandas as pd
+import pyarrow as pa
 import uuid
+import hashlib
+import json
+
+from app.core.config import settings
 
 from app.services.llm_service import LLMService
 from app.services.rag_service import RAGService
 from app.services.data_fetcher import DataFetcher
+from app.services.arrow_query import aggregate_table, filter_table, sample_table, to_records
+from app.services.analytics import CorrelationAnalyzer
+from app.services.approximate import DatasetSample
+from app.services.visualizations import build_charts, correlation_scatter
+from app.services.cache import get_cache
+from app.services.admission import remaining_time
+from app.services.conversation_store import ConversationStore
 from app.models.schemas import ChatResponse, QueryType, Citation, DataSource
 
 logger = logging.getLogger(__name__)
 
+# Measures a question can be about, matched against decomposed metrics and
+# the question text to tell a follow-up from a change of topic
+MEASURE_TERMS = (
+    "production", "area", "yield", "price",
+    "rainfall", "monsoon", "temperature", "humidity",
+)
+
+# Measures of crops: asking about these keeps the earlier crops in scope
+CROP_MEASURES = {"production", "area", "yield", "price"}
+
 
 class QueryEngine:
     """Main query processing engine"""
@@ -23,11 +46,15 @@ class QueryEngine:
         self,
         llm_service: LLMService,
         rag_service: RAGService,
-        data_fetcher: DataFetcher
+        data_fetcher: DataFetcher,
+        conversation_store: Optional[ConversationStore] = None
     ):
         self.llm_service = llm_service
         self.rag_service = rag_service
         self.data_fetcher = data_fetcher
+        self.conversation_store = conversation_store
+        self.analyzer = CorrelationAnalyzer(data_fetcher)
+        self.cache = get_cache()
     
     async def process_query(
         self,
@@ -43,6 +70,11 @@ class QueryEngine:
         3. Data retrieval (fetch and filter data)
         4. Answer generation (use LLM to synthesize answer)
         5. Citation extraction (identify sources for claims)
+        
+        With a conversation store, earlier turns of ``conversation_id`` feed
+        a bounded summary into decomposition and synthesis; follow-ups inherit
+        the previous entities, and the previous datasets unless they ask
+        about a new measure.
         """
         start_time = datetime.utcnow()
         
@@ -52,9 +84,19 @@ class QueryEngine:
         logger.info(f"Processing query [{conversation_id}]: {user_query}")
         
         try:
+            previous = None
+            if self.conversation_store:
+                previous = await self.conversation_store.latest_turn(conversation_id)
+            context = previous["summary"] if previous else None
+            
             # Step 1: Decompose query
             logger.info("Step 1: Decomposing query...")
-            decomposition = await self.llm_service.decompose_query(user_query)
+            decomposition = await self.llm_service.decompose_query(user_query, context=context)
+            follow_up = new_topic = False
+            if previous:
+                decomposition, follow_up, new_topic = self._carry_over(
+                    decomposition, user_query, previous
+                )
             logger.info(f"Query decomposition: {decomposition}")
             
             # Determine query type
@@ -63,25 +105,42 @@ class QueryEngine:
             
             # Step 2: Find relevant datasets
             logger.info("Step 2: Finding relevant datasets...")
-            relevant_datasets = self.rag_service.find_relevant_datasets(
-                query=user_query,
-                n_results=5
-            )
+            if follow_up and not new_topic and previous["datasets"]:
+                relevant_datasets = self.rag_service.describe_datasets(previous["datasets"])
+            else:
+                relevant_datasets = self.rag_service.find_relevant_datasets(
+                    query=user_query,
+                    n_results=3
+                )
             logger.info(f"Found {len(relevant_datasets)} relevant datasets")
             
             # Step 3: Retrieve data
             logger.info("Step 3: Retrieving data...")
-            data_context = await self._retrieve_data(
-                decomposition=decomposition,
-                datasets=relevant_datasets
-            )
+            data_context = None
+            retrieval_timings: Dict[str, Any] = {}
+            charts: List[Dict[str, Any]] = []
+            if query_type == QueryType.CORRELATION:
+                data_context = await self._analyze_correlation(
+                    decomposition=decomposition,
+                    user_query=user_query,
+                    datasets=relevant_datasets,
+                    charts=charts
+                )
+            if not data_context:
+                data_context = await self._retrieve_data(
+                    decomposition=decomposition,
+                    datasets=relevant_datasets,
+                    timings=retrieval_timings,
+                    charts=charts
+                )
             
             # Step 4: Generate answer
             logger.info("Step 4: Generating answer...")
             answer_text, citations = await self.llm_service.generate_answer(
                 user_query=user_query,
                 data_context=data_context,
-                dataset_info=relevant_datasets
+                dataset_info=relevant_datasets,
+                conversation_context=context
             )
             
             # Step 5: Create data sources list
@@ -126,9 +185,26 @@ class QueryEngine:
                 data_sources_used=data_sources,
                 confidence=self._calculate_confidence(data_context, citations),
                 processing_time=processing_time,
-                conversation_id=conversation_id
+                conversation_id=conversation_id,
+                visualizations=self._select_charts(charts, query_type) or None,
+                metadata={
+                    "retrieval": retrieval_timings,
+                    "decomposition": decomposition,
+                    # Keyword-only dataset retrieval while the index warms up
+                    "degraded_retrieval": not self.rag_service.ready,
+                    # Summaries estimated from samples (with margins of error)
+                    "approximate": any(t.get("approximate") for t in retrieval_timings.values()),
+                    "conversation": {
+                        "turn": previous["turn"] + 1 if previous else 1,
+                        "follow_up": follow_up,
+                        "new_topic": new_topic,
+                    },
+                }
             )
             
+            if self.conversation_store:
+                await self.conversation_store.record_response(response, user_query)
+            
             logger.info(f"Query processed successfully in {processing_time:.2f}s")
             return response
             
@@ -139,47 +215,247 @@ class QueryEngine:
     async def _retrieve_data(
         self,
         decomposition: Dict[str, Any],
-        datasets: List[Dict[str, Any]]
+        datasets: List[Dict[str, Any]],
+        timings: Optional[Dict[str, Any]] = None,
+        charts: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Retrieve relevant data from selected datasets
+        
+        Datasets are fetched and summarized concurrently, each under its own
+        deadline; slow or failing datasets are left out of the context.
+        Per-dataset status and timings are recorded in ``timings``, chart
+        payloads built from the filtered tables are appended to ``charts``.
         """
         data_context = {}
         required_data = decomposition.get("required_data", {})
+        if timings is None:
+            timings = {}
         
-        # Determine which datasets to query based on query type
-        query_type = decomposition.get("query_type", "mixed")
+        dataset_keys = [
+            ds.get("dataset_key") for ds in datasets[:3]  # Limit to top 3 most relevant
+            if ds.get("dataset_key")
+        ]
         
-        for dataset in datasets[:3]:  # Limit to top 3 most relevant
-            dataset_key = dataset.get("dataset_key")
-            if not dataset_key:
-                continue
-            
+        results = await asyncio.gather(*[
+            self._retrieve_dataset_with_deadline(dataset_key, required_data)
+            for dataset_key in dataset_keys
+        ])
+        
+        # Keep the relevance order of the datasets
+        for dataset_key, (data, timing) in zip(dataset_keys, results):
+            timings[dataset_key] = timing
+            if data:
+                data_context[dataset_key] = data["rows"]
+                if charts is not None:
+                    charts.extend(data["charts"])
+        
+        return data_context
+    
+    async def _retrieve_dataset_with_deadline(
+        self,
+        dataset_key: str,
+        required_data: Dict[str, Any]
+    ) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Retrieve one dataset, degrading to no data on timeout or error"""
+        start = time.perf_counter()
+        timing: Dict[str, Any] = {}
+        
+        try:
+            # Bounded by both the per-dataset and the request deadline
+            data = await asyncio.wait_for(
+                self._retrieve_dataset(dataset_key, required_data, timing),
+                timeout=remaining_time(settings.DATASET_RETRIEVAL_TIMEOUT)
+            )
+            timing["status"] = "ok" if data else "empty"
+        except asyncio.TimeoutError:
+            logger.warning(f"Retrieval from {dataset_key} timed out")
+            data = None
+            timing["status"] = "timeout"
+        except Exception as e:
+            logger.warning(f"Failed to retrieve data from {dataset_key}: {e}")
+            data = None
+            timing["status"] = "error"
+            timing["error"] = str(e)
+        
+        timing["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return data, timing
+    
+    async def _retrieve_dataset(
+        self,
+        dataset_key: str,
+        required_data: Dict[str, Any],
+        timing: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Fetch, filter and summarize a single dataset
+        
+        Returns the summary ``rows`` for the LLM context and the ``charts``
+        built from the same filtered table, or None if no rows match.
+        """
+        # Build filters based on required data
+        filters = self._build_filters(required_data, dataset_key)
+        
+        # Summaries and charts are shared across workers until the dataset is refreshed
+        cache_key = hashlib.sha1(json.dumps(
+            {
+                "filters": filters,
+                "crops": "crops" in required_data,
+                "metrics": required_data.get("metrics") or [],
+                "charts": self._chart_budget(),
+                "approximate": settings.APPROXIMATE_MODE,
+            },
+            sort_keys=True, default=str
+        ).encode("utf-8")).hexdigest()
+        cached = await self.cache.get(f"retrieval:{dataset_key}", cache_key)
+        if cached is not None:
+            timing["cache"] = "hit"
+            return cached
+        
+        # Large datasets are summarized from their stratified sample
+        sample = await self._approximate_sample(dataset_key)
+        if sample is not None:
+            start = time.perf_counter()
+            data = await asyncio.to_thread(self._summarize_sample, sample, required_data, filters)
+            timing["approximate"] = True
+            timing["summarize_ms"] = round((time.perf_counter() - start) * 1000, 1)
+            if data is None:
+                return None
+            result = {"rows": data, "charts": []}
+            await self.cache.set(f"retrieval:{dataset_key}", cache_key, result)
+            return result
+        
+        # Fetch and filter on the columnar path
+        start = time.perf_counter()
+        table = await self.data_fetcher.fetch_table(dataset_key)
+        table = await asyncio.to_thread(filter_table, table, filters)
+        timing["fetch_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        timing["rows"] = table.num_rows
+        
+        if table.num_rows == 0:
+            return None
+        
+        # Process and summarize data off the event loop so it overlaps
+        # with the other datasets' fetches
+        start = time.perf_counter()
+        if table.num_rows > 100:
+            # For large datasets, provide summary statistics
+            data = await asyncio.to_thread(
+                self._summarize_table,
+                table, required_data, dataset_key, filters
+            )
+        else:
+            # For smaller datasets, provide full data
+            data = to_records(table)
+        timing["summarize_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        charts = []
+        if settings.VISUALIZATIONS_ENABLED:
+            start = time.perf_counter()
+            charts = await asyncio.to_thread(
+                build_charts,
+                table, dataset_key, required_data,
+                settings.VISUALIZATION_MAX_POINTS, settings.VISUALIZATION_MAX_SERIES
+            )
+            timing["charts_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        
+        result = {"rows": data, "charts": charts}
+        await self.cache.set(f"retrieval:{dataset_key}", cache_key, result)
+        return result
+    
+    def _carry_over(
+        self,
+        decomposition: Dict[str, Any],
+        user_query: str,
+        previous: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], bool, bool]:
+        """
+        Fill entities a follow-up leaves out from the previous turn
+        
+        Returns a new decomposition (the cached one is left untouched),
+        whether anything was inherited, i.e. the question leans on earlier
+        context, and whether it names a measure the previous turn did not
+        ask about. A new measure is a new topic: metrics are not inherited,
+        nor crops unless the new measure is a crop measure, and datasets
+        are searched again.
+        """
+        required = dict(decomposition.get("required_data") or {})
+        previous_required = previous["decomposition"].get("required_data") or {}
+        
+        measures = self._measures(required, user_query)
+        new_measures = measures - self._measures(previous_required, previous.get("query", ""))
+        new_topic = bool(new_measures)
+        
+        fields = ["states", "districts", "time_period"]
+        if not new_topic:
+            fields += ["crops", "metrics"]
+        elif new_measures & CROP_MEASURES:
+            fields.append("crops")
+        
+        if new_topic and not required.get("metrics"):
+            # Named only in the question; kept for the next follow-up
+            required["metrics"] = sorted(new_measures)
+        
+        inherited = False
+        for field in fields:
+            if not required.get(field) and previous_required.get(field):
+                required[field] = previous_required[field]
+                inherited = True
+        return dict(decomposition, required_data=required), inherited, new_topic
+    
+    @staticmethod
+    def _measures(required: Dict[str, Any], query: str) -> set:
+        """Known measures named by the decomposed metrics or the question"""
+        text = " ".join([str(m) for m in required.get("metrics") or []] + [query]).lower()
+        words = re.findall(r"[a-z]+", text)
+        return {term for term in MEASURE_TERMS if any(word.startswith(term) for word in words)}
+    
+    async def _analyze_correlation(
+        self,
+        decomposition: Dict[str, Any],
+        user_query: str,
+        datasets: List[Dict[str, Any]],
+        charts: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Compute crop-climate correlations instead of passing raw rows
+        
+        Datasets used by the analysis are appended to ``datasets`` so they
+        are cited in the response; a scatter of the strongest correlation
+        is appended to ``charts``.
+        """
+        try:
+            analysis = await self.analyzer.analyze(
+                required_data=decomposition.get("required_data", {}),
+                query=user_query,
+                include_aligned=True
+            )
+        except Exception as e:
+            logger.warning(f"Correlation analysis failed: {e}")
+            return {}
+        
+        if not analysis:
+            return {}
+        
+        aligned = analysis.pop("aligned")
+        if charts is not None and settings.VISUALIZATIONS_ENABLED:
             try:
-                # Build filters based on required data
-                filters = self._build_filters(required_data, dataset_key)
-                
-                # Fetch data
-                df = await self.data_fetcher.query_dataset(
-                    dataset_key=dataset_key,
-                    filters=filters,
-                    limit=1000
+                scatter = await asyncio.to_thread(
+                    correlation_scatter, aligned, analysis, settings.VISUALIZATION_MAX_POINTS
                 )
-                
-                # Process and summarize data
-                if not df.empty:
-                    # For large datasets, provide summary statistics
-                    if len(df) > 100:
-                        summary = self._summarize_dataframe(df, required_data)
-                        data_context[dataset_key] = summary
-                    else:
-                        # For smaller datasets, provide full data
-                        data_context[dataset_key] = df.to_dict(orient="records")
-                
             except Exception as e:
-                logger.warning(f"Failed to retrieve data from {dataset_key}: {e}")
+                logger.warning(f"Could not chart correlation: {e}")
+                scatter = None
+            if scatter:
+                charts.append(scatter)
         
-        return data_context
+        selected = {ds.get("dataset_key") for ds in datasets}
+        for dataset_key in analysis["datasets_used"]:
+            if dataset_key not in selected:
+                info = self.data_fetcher.DATASETS[dataset_key]
+                datasets.append({"dataset_key": dataset_key, **info})
+        
+        return {"correlation_analysis": analysis}
     
     def _build_filters(
         self,
@@ -208,45 +484,111 @@ class QueryEngine:
         
         return filters
     
-    def _summarize_dataframe(
+    def _summarize_table(
         self,
-        df: pd.DataFrame,
-        required_data: Dict[str, Any]
+        table: pa.Table,
+        required_data: Dict[str, Any],
+        dataset_key: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
-        Summarize a large dataframe into key statistics
+        Summarize a large filtered table into key statistics
+        
+        Answers from the dataset's precomputed aggregate cube when the
+        grouping matches one, otherwise aggregates the filtered rows with
+        ``pyarrow.compute``.
         """
         summary = []
         
         # Group by relevant columns and aggregate
-        groupby_cols = []
-        if "State" in df.columns:
-            groupby_cols.append("State")
-        if "Crop" in df.columns and "crops" in required_data:
-            groupby_cols.append("Crop")
-        if "Year" in df.columns:
-            groupby_cols.append("Year")
+        groupby_cols = self._summary_grouping(table.column_names, required_data)
         
         if groupby_cols:
-            # Find numeric columns to aggregate
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            
-            if numeric_cols and groupby_cols:
-                grouped = df.groupby(groupby_cols)[numeric_cols].agg(['mean', 'sum', 'count'])
-                summary_df = grouped.reset_index()
-                
-                # Flatten multi-level columns
-                summary_df.columns = ['_'.join(col).strip('_') if isinstance(col, tuple) else col 
-                                      for col in summary_df.columns]
-                
-                summary = summary_df.to_dict(orient="records")[:100]  # Limit to 100 summary rows
+            summary_df = None
+            if dataset_key:
+                summary_df = self.data_fetcher.cubes.lookup(dataset_key, groupby_cols, filters)
+            if summary_df is not None:
+                # Limit to 100 summary rows
+                summary = to_records(pa.Table.from_pandas(summary_df.head(100), preserve_index=False))
+            else:
+                summary = to_records(aggregate_table(table, groupby_cols).slice(0, 100))
         
         # If no grouping possible, return sample
         if not summary:
-            summary = df.sample(min(50, len(df))).to_dict(orient="records")
+            summary = to_records(sample_table(table, 50))
         
         return summary
     
+    def _summary_grouping(self, columns: List[str], required_data: Dict[str, Any]) -> List[str]:
+        """Columns summaries are grouped by"""
+        groupby_cols = []
+        if "State" in columns:
+            groupby_cols.append("State")
+        if "Crop" in columns and "crops" in required_data:
+            groupby_cols.append("Crop")
+        if "Year" in columns:
+            groupby_cols.append("Year")
+        return groupby_cols
+    
+    async def _approximate_sample(self, dataset_key: str) -> Optional[DatasetSample]:
+        """
+        The dataset's sample when summaries should be approximate
+        
+        ``APPROXIMATE_MODE`` "always" uses samples for every dataset, "auto"
+        only for cached datasets of at least ``APPROXIMATE_MIN_ROWS`` rows.
+        """
+        mode = settings.APPROXIMATE_MODE
+        if mode == "off":
+            return None
+        if mode == "auto":
+            rows = self.data_fetcher.cached_row_count(dataset_key)
+            if not rows or rows < settings.APPROXIMATE_MIN_ROWS:
+                return None
+        return await self.data_fetcher.get_sample(dataset_key)
+    
+    def _summarize_sample(
+        self,
+        sample: DatasetSample,
+        required_data: Dict[str, Any],
+        filters: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Estimate the summary from a stratified sample in milliseconds
+        
+        Same grouping as ``_summarize_table``, but every aggregate carries a
+        ``_moe`` margin of error; column statistics come from the sketches.
+        Returns None if no sampled row matches the filters.
+        """
+        groupby_cols = self._summary_grouping(sample.columns, required_data)
+        summary = sample.estimate(filters, groupby_cols, confidence=settings.APPROXIMATE_CONFIDENCE)
+        if not summary:
+            return None
+        return {
+            "approximation": sample.describe(settings.APPROXIMATE_CONFIDENCE),
+            "summary": summary[:100],  # Limit to 100 summary rows
+            "statistics": sample.statistics(filters),
+        }
+    
+    def _chart_budget(self) -> Optional[List[int]]:
+        """Chart settings that change cached chart payloads"""
+        if not settings.VISUALIZATIONS_ENABLED:
+            return None
+        return [settings.VISUALIZATION_MAX_POINTS, settings.VISUALIZATION_MAX_SERIES]
+    
+    def _select_charts(
+        self,
+        charts: List[Dict[str, Any]],
+        query_type: QueryType
+    ) -> List[Dict[str, Any]]:
+        """Put the chart type that answers the question first, then cap the count"""
+        preferred = {
+            QueryType.RANKING: "bar",
+            QueryType.COMPARISON: "bar",
+            QueryType.CORRELATION: "scatter",
+        }.get(query_type, "line")
+        ordered = sorted(charts, key=lambda chart: chart["type"] != preferred)
+        return ordered[:settings.VISUALIZATION_MAX_CHARTS]
+    
     def _map_intent_to_query_type(self, intent: str) -> QueryType:
         """Map LLM intent to QueryType enum"""
         mapping = {
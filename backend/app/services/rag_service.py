@@ -2,104 +2,161 @@
 RAG Service - Retrieval Augmented Generation
 Implements vector database and semantic search for datasets
 """
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-import logging
-from typing import List, Dict, Any, Optional
+import asyncio
 import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 import json
 
 from app.core.config import settings
 from app.services.data_fetcher import DataFetcher
+from app.services.retrievers import (
+    BaseRetriever,
+    EntityIndex,
+    NumpyRetriever,
+    create_retriever,
+    reciprocal_rank_fusion,
+    tokenize,
+)
 
 logger = logging.getLogger(__name__)
 
+SEARCH_CACHE_SIZE = 256
+
+
+def definition_version(dataset_info: Dict[str, Any]) -> str:
+    """Fingerprint of a dataset definition, stored with its indexed documents"""
+    return hashlib.sha1(json.dumps(dataset_info, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
 
 class RAGService:
     """RAG service for semantic search over datasets"""
     
-    def __init__(self):
-        self.client: Optional[chromadb.Client] = None
-        self.collection: Optional[chromadb.Collection] = None
-        self.data_fetcher = DataFetcher()
+    def __init__(self, data_fetcher: Optional[DataFetcher] = None):
+        self.retriever: Optional[BaseRetriever] = None
+        self.entity_index = EntityIndex()
+        # Share the app's fetcher so datasets are decoded once
+        self._owns_fetcher = data_fetcher is None
+        self.data_fetcher = data_fetcher or DataFetcher()
+        # Recent search results; cleared whenever the index changes
+        self._search_cache: "OrderedDict[Tuple[str, int], List[Dict[str, Any]]]" = OrderedDict()
+        # Serializes the initial build with incremental registry updates
+        self._index_lock = asyncio.Lock()
         
     async def initialize(self):
-        """Initialize ChromaDB and create collections"""
+        """Initialize the retriever backend and index datasets"""
         logger.info("Initializing RAG service...")
         
-        # Initialize ChromaDB with OpenAI embeddings (lighter than sentence-transformers)
-        try:
-            from chromadb.utils import embedding_functions
+        async with self._index_lock:
+            # Backend setup and embedding are blocking; keep them off the event loop
+            retriever = await asyncio.to_thread(create_retriever)
+            logger.info(f"Using {retriever.name} retriever backend")
             
-            # Use OpenAI embeddings if API key is available
-            if settings.OPENAI_API_KEY:
-                openai_ef = embedding_functions.OpenAIEmbeddingFunction(
-                    api_key=settings.OPENAI_API_KEY,
-                    model_name=settings.EMBEDDING_MODEL
-                )
-                
-                self.client = chromadb.Client(ChromaSettings(
-                    persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
-                    anonymized_telemetry=False
-                ))
-                
-                # Get or create collection with OpenAI embeddings
-                self.collection = self.client.get_or_create_collection(
-                    name="datasets",
-                    embedding_function=openai_ef,
-                    metadata={"description": "Agricultural and climate datasets metadata"}
-                )
-            else:
-                # Fallback to default embeddings
-                self.client = chromadb.Client(ChromaSettings(
-                    persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
-                    anonymized_telemetry=False
-                ))
-                
-                self.collection = self.client.get_or_create_collection(
-                    name="datasets",
-                    metadata={"description": "Agricultural and climate datasets metadata"}
-                )
-        except Exception as e:
-            logger.warning(f"Failed to initialize with OpenAI embeddings: {e}, using defaults")
-            self.client = chromadb.Client(ChromaSettings(
-                persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
-                anonymized_telemetry=False
-            ))
+            # Index new and changed datasets; a persistent index keeps the rest
+            try:
+                await self._sync_index(retriever)
+            except Exception as e:
+                if settings.RETRIEVER_BACKEND.lower() != "auto" or isinstance(retriever, NumpyRetriever):
+                    raise
+                # e.g. embeddings unreachable offline
+                logger.warning(f"Indexing with {retriever.name} failed ({e}), falling back to NumPy index")
+                retriever = NumpyRetriever()
+                await self._sync_index(retriever)
             
-            self.collection = self.client.get_or_create_collection(
-                name="datasets",
-                metadata={"description": "Agricultural and climate datasets metadata"}
-            )
+            if settings.HYBRID_RETRIEVAL:
+                await self._build_entity_index(list(self.data_fetcher.DATASETS))
+            
+            # Searches fall back to keyword matching until this point
+            self.retriever = retriever
+            self._search_cache.clear()
+        logger.info(f"RAG service initialized with {retriever.count()} indexed documents")
+    
+    @property
+    def ready(self) -> bool:
+        """Whether the full (vector + entity) index is available"""
+        return self.retriever is not None
+    
+    async def _sync_index(self, retriever: BaseRetriever):
+        """Bring the index in line with the registry: (re)index new, changed and removed datasets"""
+        registry = self.data_fetcher.DATASETS
+        indexed = await asyncio.to_thread(retriever.indexed_datasets)
+        stale = [key for key, version in indexed.items()
+                 if key not in registry or version != definition_version(registry[key])]
+        missing = [key for key in registry
+                   if indexed.get(key) != definition_version(registry[key])]
+        
+        for key in stale:
+            await asyncio.to_thread(retriever.delete, {"dataset_key": key})
+        if missing:
+            await self._index_datasets(retriever, missing)
+    
+    async def _index_datasets(self, retriever: BaseRetriever, dataset_keys: List[str]):
+        """Index the metadata of datasets for semantic search"""
+        logger.info(f"Indexing {len(dataset_keys)} datasets...")
+        
+        documents, metadatas, ids = await self._build_documents(dataset_keys)
         
-        # Index datasets if collection is empty
-        if self.collection.count() == 0:
-            await self._index_datasets()
+        # Add to index
+        if documents:
+            await asyncio.to_thread(
+                retriever.add,
+                documents=documents,
+                metadatas=metadatas,
+                ids=ids
+            )
+            logger.info(f"Indexed {len(documents)} documents")
+    
+    async def _build_entity_index(self, dataset_keys: List[str]):
+        """Add the names, columns and values of datasets to the entity index"""
+        for key in dataset_keys:
+            try:
+                df, info = await self._dataset_frame(key)
+                self.entity_index.add_dataset(key, info, df, columns=info.get("columns"))
+            except Exception as e:
+                logger.error(f"Failed to build entity index for {key}: {e}")
         
-        logger.info(f"RAG service initialized with {self.collection.count()} indexed documents")
+        logger.info(f"Entity index built with {len(self.entity_index.postings)} terms")
     
-    async def _index_datasets(self):
-        """Index all datasets metadata for semantic search"""
-        logger.info("Indexing datasets...")
+    async def _dataset_frame(self, dataset_key: str) -> Tuple[Any, Dict[str, Any]]:
+        """
+        The frame of a preloaded dataset, or None for datasets that load on
+        first use, with their catalog info
         
+        Only preloaded datasets are read, so indexing hundreds of registered
+        datasets does not fetch them all; the others are indexed from their
+        definition and cached columns.
+        """
+        registry = self.data_fetcher.DATASETS
+        if registry.refresh_policy(dataset_key)["preload"]:
+            df = await self.data_fetcher.fetch_dataset(dataset_key)
+            return df, {**registry[dataset_key], "columns": df.columns.tolist(), "row_count": len(df)}
+        return None, await self.data_fetcher.get_catalog_info(dataset_key)
+    
+    async def _build_documents(
+        self,
+        dataset_keys: List[str]
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        """Build dataset-level and column-level documents for indexing"""
         documents = []
         metadatas = []
         ids = []
         
-        for key, dataset_info in self.data_fetcher.DATASETS.items():
-            # Try to get actual data for better indexing
+        for key in dataset_keys:
             try:
-                df = await self.data_fetcher.fetch_dataset(key)
+                df, dataset_info = await self._dataset_frame(key)
+                columns = dataset_info.get("columns") or []
                 
                 # Create rich metadata document
                 doc_text = f"""
                 Dataset: {dataset_info['name']}
                 Category: {dataset_info['category']}
                 Description: {dataset_info['description']}
-                Columns: {', '.join(df.columns.tolist())}
-                Row Count: {len(df)}
-                Sample Data: {df.head(3).to_string()}
+                Columns: {', '.join(columns)}
+                Row Count: {dataset_info.get('row_count', 'unknown')}
                 """
+                if df is not None:
+                    doc_text += f"Sample Data: {df.head(3).to_string()}\n"
                 
                 metadata = {
                     "dataset_key": key,
@@ -107,18 +164,22 @@ class RAGService:
                     "category": dataset_info['category'],
                     "description": dataset_info['description'],
                     "url": dataset_info['url'],
-                    "columns": json.dumps(df.columns.tolist()),
-                    "row_count": len(df)
+                    "columns": json.dumps(columns),
+                    "row_count": dataset_info.get("row_count") or 0,
+                    "definition_version": definition_version(self.data_fetcher.DATASETS[key])
                 }
                 
                 # Add column-specific documents for better matching
-                for column in df.columns:
+                for column in columns:
                     col_doc = f"""
                     Dataset: {dataset_info['name']}
                     Column: {column}
-                    Sample Values: {df[column].dropna().unique()[:10].tolist()}
-                    Data Type: {df[column].dtype}
                     """
+                    if df is not None:
+                        col_doc += (
+                            f"Sample Values: {df[column].dropna().unique()[:10].tolist()}\n"
+                            f"Data Type: {df[column].dtype}\n"
+                        )
                     
                     documents.append(col_doc)
                     metadatas.append({
@@ -136,15 +197,28 @@ class RAGService:
             except Exception as e:
                 logger.error(f"Failed to index {key}: {e}")
         
-        # Add to collection
-        if documents:
-            # ChromaDB will automatically generate embeddings
-            self.collection.add(
-                documents=documents,
-                metadatas=metadatas,
-                ids=ids
-            )
-            logger.info(f"Indexed {len(documents)} documents")
+        return documents, metadatas, ids
+    
+    async def apply_registry_changes(self, changes: Dict[str, List[str]]):
+        """
+        Re-index only the datasets a registry reload added, updated or removed
+        
+        Before the initial build has run there is nothing to patch: it
+        indexes the registry as it is by then.
+        """
+        stale = changes["removed"] + changes["updated"]
+        fresh = changes["added"] + changes["updated"]
+        async with self._index_lock:
+            self._search_cache.clear()
+            if self.retriever is None:
+                return
+            for key in stale:
+                await asyncio.to_thread(self.retriever.delete, {"dataset_key": key})
+                self.entity_index.remove_dataset(key)
+            if fresh:
+                await self._index_datasets(self.retriever, fresh)
+                if settings.HYBRID_RETRIEVAL:
+                    await self._build_entity_index(fresh)
     
     def find_relevant_datasets(
         self,
@@ -152,41 +226,94 @@ class RAGService:
         n_results: int = 5
     ) -> List[Dict[str, Any]]:
         """
-        Find datasets relevant to a query using semantic search
+        Find datasets relevant to a query using hybrid search
+        
+        Vector search results are fused with the entity index ranking using
+        reciprocal-rank fusion, so named entities (states, crops, measures)
+        pull the right datasets to the top.
         
         Args:
             query: User's question
-            n_results: Number of results to return
+            n_results: Maximum number of datasets to return
             
         Returns:
             List of relevant datasets with metadata
         """
-        if not self.collection:
-            raise RuntimeError("RAG service not initialized")
+        if not self.retriever:
+            # Still warming up: degraded, metadata-only retrieval
+            return self._keyword_search(query, n_results)
         
-        # Search the collection
-        results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
-        )
+        cache_key = (" ".join(query.lower().split()), n_results)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            self._search_cache.move_to_end(cache_key)
+            return [dict(ds) for ds in cached]
         
-        # Extract unique datasets
-        datasets = []
-        seen_keys = set()
+        # Search the index; several documents (columns) map to each dataset,
+        # so over-fetch documents to rank enough distinct datasets
+        results = self.retriever.query(query, n_results=n_results * 4)
+        
+        # Rank unique datasets by their best-matching document
+        vector_ranking = []
+        vector_scores = {}
         
         if results['metadatas']:
             for metadata, distance in zip(results['metadatas'][0], results['distances'][0]):
                 dataset_key = metadata.get('dataset_key')
-                if dataset_key and dataset_key not in seen_keys:
-                    datasets.append({
-                        "dataset_key": dataset_key,
-                        "name": metadata.get('name'),
-                        "category": metadata.get('category'),
-                        "description": metadata.get('description'),
-                        "url": metadata.get('url'),
-                        "relevance_score": 1 - distance  # Convert distance to similarity
-                    })
-                    seen_keys.add(dataset_key)
+                if dataset_key and dataset_key not in vector_scores:
+                    vector_ranking.append(dataset_key)
+                    vector_scores[dataset_key] = 1 - distance  # Convert distance to similarity
+        
+        if settings.HYBRID_RETRIEVAL and self.entity_index.dataset_keys:
+            lexical_ranking = [key for key, _ in self.entity_index.search(query)]
+            rankings = [vector_ranking, lexical_ranking]
+            fused = reciprocal_rank_fusion(rankings, k=settings.RRF_K)
+            # Normalize so a dataset ranked first by every retriever scores 1.0
+            best_possible = len(rankings) / (settings.RRF_K + 1)
+            ranked = sorted(fused, key=lambda key: -fused[key])
+            scores = {key: fused[key] / best_possible for key in ranked}
+        else:
+            ranked = vector_ranking
+            scores = vector_scores
+        
+        datasets = self.describe_datasets(ranked[:n_results], scores)
+        self._search_cache[cache_key] = datasets
+        while len(self._search_cache) > SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return [dict(ds) for ds in datasets]
+    
+    def _keyword_search(self, query: str, n_results: int) -> List[Dict[str, Any]]:
+        """Rank datasets by query terms in their name, category and description"""
+        terms = set(tokenize(query))
+        scores = {}
+        for dataset_key, dataset_info in self.data_fetcher.DATASETS.items():
+            text = " ".join([dataset_info['name'], dataset_info['category'], dataset_info['description']])
+            overlap = len(terms & set(tokenize(text)))
+            if overlap:
+                scores[dataset_key] = overlap / len(terms)
+        
+        ranked = sorted(scores, key=lambda key: -scores[key])
+        return self.describe_datasets(ranked[:n_results], scores)
+    
+    def describe_datasets(
+        self,
+        dataset_keys: List[str],
+        scores: Optional[Dict[str, float]] = None
+    ) -> List[Dict[str, Any]]:
+        """Dataset metadata in the shape returned by ``find_relevant_datasets``"""
+        datasets = []
+        for dataset_key in dataset_keys:
+            dataset_info = self.data_fetcher.DATASETS.get(dataset_key)
+            if not dataset_info:
+                continue
+            datasets.append({
+                "dataset_key": dataset_key,
+                "name": dataset_info['name'],
+                "category": dataset_info['category'],
+                "description": dataset_info['description'],
+                "url": dataset_info['url'],
+                "relevance_score": (scores or {}).get(dataset_key, 1.0)
+            })
         
         return datasets
     
@@ -205,9 +332,12 @@ class RAGService:
         Returns:
             Context string with relevant information
         """
+        if not self.retriever:
+            return ""
+        
         # Query for documents from this dataset
-        results = self.collection.query(
-            query_texts=[query],
+        results = self.retriever.query(
+            query,
             n_results=10,
             where={"dataset_key": dataset_key}
         )
@@ -227,4 +357,5 @@ class RAGService:
     
     async def close(self):
         """Cleanup resources"""
-        await self.data_fetcher.close()
+        if self._owns_fetcher:
+            await self.data_fetcher.close()
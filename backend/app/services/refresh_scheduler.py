@@ -0,0 +1,98 @@
+"""
+Refresh Scheduler
+Refreshes cached datasets in the background ahead of their expiry
+"""
+import asyncio
+import logging
+import random
+from typing import List, Optional
+
+from app.core.config import settings
+from app.services.data_fetcher import DataFetcher
+
+logger = logging.getLogger(__name__)
+
+
+class RefreshScheduler:
+    """
+    Periodic background refresher honoring ``AUTO_UPDATE_INTERVAL``
+
+    Every interval, cached datasets whose refresh policy allows it and whose
+    cache expires before the next run are refreshed with bounded
+    concurrency; datasets nobody has used yet stay unfetched. Start times are jittered so
+    replicas and datasets don't all hit data.gov.in at the same moment;
+    requests keep being served from the cache while refreshes run.
+    """
+
+    def __init__(
+        self,
+        data_fetcher: DataFetcher,
+        interval: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+        jitter: Optional[float] = None
+    ):
+        self.data_fetcher = data_fetcher
+        self.interval = interval if interval is not None else settings.AUTO_UPDATE_INTERVAL
+        self.max_concurrency = max_concurrency or settings.REFRESH_MAX_CONCURRENCY
+        self.jitter = jitter if jitter is not None else settings.REFRESH_JITTER
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the scheduler loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Refresh scheduler started (interval {self.interval}s)")
+
+    async def stop(self):
+        """Stop the scheduler loop"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        logger.info("Refresh scheduler stopped")
+
+    async def _run(self):
+        while True:
+            # Sleep first: datasets were just loaded at startup
+            await asyncio.sleep(self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+            try:
+                await self.refresh_due()
+            except Exception as e:
+                logger.error(f"Scheduled refresh failed: {e}", exc_info=True)
+
+    def due_datasets(self) -> List[str]:
+        """Datasets whose cache expires before the next scheduler run"""
+        registry = self.data_fetcher.DATASETS
+        return [
+            key for key in registry
+            if registry.refresh_policy(key)["auto_refresh"]
+            and self.data_fetcher.is_cached(key)
+            and self.data_fetcher.cache_expires_in(key) <= self.interval
+        ]
+
+    async def refresh_due(self) -> List[str]:
+        """Refresh every due dataset; returns the keys that were refreshed"""
+        due = self.due_datasets()
+        if not due:
+            return []
+
+        logger.info(f"Refreshing {len(due)} datasets ahead of expiry: {due}")
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def refresh(dataset_key: str) -> bool:
+            # Spread start times, but never past the dataset's expiry
+            window = min(self.jitter * self.interval,
+                         max(0.0, self.data_fetcher.cache_expires_in(dataset_key)))
+            await asyncio.sleep(random.uniform(0, window))
+            async with semaphore:
+                try:
+                    await self.data_fetcher.refresh_dataset(dataset_key)
+                    return True
+                except Exception as e:
+                    logger.error(f"Failed to refresh {dataset_key}: {e}")
+                    return False
+
+        results = await asyncio.gather(*[refresh(key) for key in due])
+        return [key for key, ok in zip(due, results) if ok]
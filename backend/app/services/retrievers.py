@@ -0,0 +1,454 @@
+"""
+Retriever Backends
+Pluggable document indexes used by the RAG service (ChromaDB, NumPy, BM25)
+"""
+import logging
+import math
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokenization shared by the local indexes"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def _indexed_datasets(metadatas: List[Dict[str, Any]]) -> Dict[str, str]:
+    return {
+        meta["dataset_key"]: meta.get("definition_version", "")
+        for meta in metadatas
+        if meta.get("document_type") == "dataset"
+    }
+
+
+def _matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style equality ``where`` clause against metadata"""
+    if not where:
+        return True
+    return all(metadata.get(key) == value for key, value in where.items())
+
+
+class BaseRetriever:
+    """Common interface for retriever backends
+
+    ``query`` returns results shaped like ``chromadb.Collection.query`` so the
+    RAG service can treat every backend the same way.
+    """
+
+    name = "base"
+
+    def add(
+        self,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        ids: List[str]
+    ):
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def delete(self, where: Dict[str, Any]):
+        """Remove the documents whose metadata matches ``where``"""
+        raise NotImplementedError
+
+    def indexed_datasets(self) -> Dict[str, str]:
+        """``{dataset_key: definition_version}`` of the indexed datasets"""
+        raise NotImplementedError
+
+    def query(
+        self,
+        query_text: str,
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, List[List[Any]]]:
+        raise NotImplementedError
+
+
+class ChromaRetriever(BaseRetriever):
+    """ChromaDB-backed retriever (OpenAI or default embeddings)"""
+
+    name = "chroma"
+
+    def __init__(self):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        self.client = chromadb.Client(ChromaSettings(
+            persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
+            anonymized_telemetry=False
+        ))
+
+        collection_kwargs = {
+            "name": "datasets",
+            "metadata": {"description": "Agricultural and climate datasets metadata"}
+        }
+
+        # Use OpenAI embeddings if API key is available (lighter than sentence-transformers)
+        if settings.OPENAI_API_KEY:
+            try:
+                from chromadb.utils import embedding_functions
+                collection_kwargs["embedding_function"] = embedding_functions.OpenAIEmbeddingFunction(
+                    api_key=settings.OPENAI_API_KEY,
+                    model_name=settings.EMBEDDING_MODEL
+                )
+            except Exception as e:
+                logger.warning(f"Failed to initialize with OpenAI embeddings: {e}, using defaults")
+
+        self.collection = self.client.get_or_create_collection(**collection_kwargs)
+
+    def add(self, documents, metadatas, ids):
+        # ChromaDB will automatically generate embeddings
+        self.collection.add(documents=documents, metadatas=metadatas, ids=ids)
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def delete(self, where):
+        self.collection.delete(where=where)
+
+    def indexed_datasets(self):
+        result = self.collection.get(where={"document_type": "dataset"}, include=["metadatas"])
+        return _indexed_datasets(result["metadatas"])
+
+    def query(self, query_text, n_results=5, where=None):
+        kwargs = {"query_texts": [query_text], "n_results": n_results}
+        if where:
+            kwargs["where"] = where
+        return self.collection.query(**kwargs)
+
+
+class HashingEmbedder:
+    """Dependency-free text embedder using the hashing trick
+
+    Unigrams and bigrams are hashed (CRC32, stable across processes) into a
+    fixed number of buckets and the result is L2-normalized, so cosine
+    similarity reduces to a dot product. No model download is required.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                h = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign
+        # Sublinear term weighting, then normalize
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32, copy=False)
+
+
+class NumpyRetriever(BaseRetriever):
+    """Brute-force cosine similarity over an in-memory float32 matrix"""
+
+    name = "numpy"
+
+    def __init__(self, embedder: Optional[HashingEmbedder] = None):
+        self.embedder = embedder or HashingEmbedder(settings.EMBEDDING_DIM)
+        self.matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+
+    def add(self, documents, metadatas, ids):
+        vectors = self.embedder.embed(documents)
+        self.matrix = np.vstack([self.matrix, vectors])
+        self.documents.extend(documents)
+        self.metadatas.extend(metadatas)
+        self.ids.extend(ids)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def delete(self, where):
+        keep = [i for i, meta in enumerate(self.metadatas) if not _matches_where(meta, where)]
+        self.matrix = self.matrix[keep]
+        self.documents = [self.documents[i] for i in keep]
+        self.metadatas = [self.metadatas[i] for i in keep]
+        self.ids = [self.ids[i] for i in keep]
+
+    def indexed_datasets(self):
+        return _indexed_datasets(self.metadatas)
+
+    def query(self, query_text, n_results=5, where=None):
+        candidates = np.array(
+            [i for i, meta in enumerate(self.metadatas) if _matches_where(meta, where)],
+            dtype=np.intp
+        )
+        if candidates.size == 0:
+            return _empty_result()
+
+        query_vec = self.embedder.embed([query_text])[0]
+        scores = self.matrix[candidates] @ query_vec
+
+        k = min(n_results, candidates.size)
+        if k < candidates.size:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(candidates.size)
+        top = top[np.argsort(-scores[top])]
+
+        return _build_result(
+            self, candidates[top].tolist(), (1.0 - scores[top]).tolist()
+        )
+
+
+class BM25Retriever(BaseRetriever):
+    """Okapi BM25 lexical index over the same documents"""
+
+    name = "bm25"
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents: List[str] = []
+        self.metadatas: List[Dict[str, Any]] = []
+        self.ids: List[str] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, List[tuple]] = defaultdict(list)
+
+    def add(self, documents, metadatas, ids):
+        for document, metadata, doc_id in zip(documents, metadatas, ids):
+            index = len(self.ids)
+            term_freqs = Counter(tokenize(document))
+            for term, freq in term_freqs.items():
+                self.postings[term].append((index, freq))
+            self.doc_lengths.append(sum(term_freqs.values()))
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+            self.ids.append(doc_id)
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def delete(self, where):
+        # Postings hold document positions; rebuild from what remains
+        keep = [i for i, meta in enumerate(self.metadatas) if not _matches_where(meta, where)]
+        documents = [self.documents[i] for i in keep]
+        metadatas = [self.metadatas[i] for i in keep]
+        ids = [self.ids[i] for i in keep]
+        self.documents, self.metadatas, self.ids, self.doc_lengths = [], [], [], []
+        self.postings = defaultdict(list)
+        self.add(documents, metadatas, ids)
+
+    def indexed_datasets(self):
+        return _indexed_datasets(self.metadatas)
+
+    def score(self, query_text: str) -> np.ndarray:
+        """Return the BM25 score of every indexed document for a query"""
+        n_docs = len(self.ids)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if n_docs == 0:
+            return scores
+
+        avg_length = sum(self.doc_lengths) / n_docs
+        lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+        for term in set(tokenize(query_text)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            doc_ids = np.fromiter((p[0] for p in postings), dtype=np.intp)
+            freqs = np.fromiter((p[1] for p in postings), dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_ids] / avg_length)
+            scores[doc_ids] += idf * freqs * (self.k1 + 1) / (freqs + norm)
+        return scores
+
+    def query(self, query_text, n_results=5, where=None):
+        scores = self.score(query_text)
+        candidates = [i for i, meta in enumerate(self.metadatas) if _matches_where(meta, where)]
+        if not candidates:
+            return _empty_result()
+
+        ranked = sorted(candidates, key=lambda i: -scores[i])[:n_results]
+        # Express scores as distances in [0, 1] like the vector backends
+        best = float(scores[ranked[0]]) or 1.0
+        distances = [1.0 - float(scores[i]) / best for i in ranked]
+        return _build_result(self, ranked, distances)
+
+
+def _empty_result() -> Dict[str, List[List[Any]]]:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+def _build_result(
+    retriever: BaseRetriever,
+    indices: List[int],
+    distances: List[float]
+) -> Dict[str, List[List[Any]]]:
+    return {
+        "ids": [[retriever.ids[i] for i in indices]],
+        "documents": [[retriever.documents[i] for i in indices]],
+        "metadatas": [[retriever.metadatas[i] for i in indices]],
+        "distances": [distances]
+    }
+
+
+MONTH_NAMES = [
+    "january", "february", "march", "april", "may", "june",
+    "july", "august", "september", "october", "november", "december"
+]
+
+
+def normalize_term(token: str) -> str:
+    """Light plural stripping so "prices" matches the "Price" column"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+class EntityIndex:
+    """
+    Inverted index from dataset vocabulary to dataset keys
+
+    Indexes dataset names, column names and the distinct values of
+    low-cardinality text columns (states, crops, seasons, month names), so a
+    query naming "rainfall" and "Punjab" is matched on entities rather than
+    embedding distance alone.
+    """
+
+    FIELD_WEIGHTS = {"name": 2.0, "column": 1.5, "value": 1.0}
+    MAX_DISTINCT_VALUES = 500
+    MAX_PHRASE_LENGTH = 3
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.dataset_keys = set()
+
+    def _add_phrase(self, text: str, dataset_key: str, field: str):
+        terms = [normalize_term(t) for t in tokenize(text)]
+        if not terms or len(terms) > self.MAX_PHRASE_LENGTH:
+            return
+        postings = self.postings[" ".join(terms)]
+        weight = self.FIELD_WEIGHTS[field]
+        postings[dataset_key] = max(postings.get(dataset_key, 0.0), weight)
+
+    def add_dataset(
+        self,
+        dataset_key: str,
+        dataset_info: Dict[str, Any],
+        df=None,
+        columns: Optional[List[str]] = None
+    ):
+        """
+        Index the vocabulary of one dataset
+
+        Without a frame only the name, category and ``columns`` are indexed
+        (datasets that have not been loaded yet).
+        """
+        self.dataset_keys.add(dataset_key)
+
+        for token in tokenize(f"{dataset_info['name']} {dataset_info['category']}"):
+            self._add_phrase(token, dataset_key, "name")
+
+        for column in (df.columns if df is not None else columns or []):
+            for token in tokenize(column):
+                self._add_phrase(token, dataset_key, "column")
+
+            if df is None:
+                continue
+            if column.lower() == "month":
+                for month in MONTH_NAMES:
+                    self._add_phrase(month, dataset_key, "value")
+                    self._add_phrase(month[:3], dataset_key, "value")
+                continue
+
+            if df[column].dtype == object or str(df[column].dtype) == "category":
+                values = df[column].dropna().unique()
+                if len(values) <= self.MAX_DISTINCT_VALUES:
+                    for value in values:
+                        self._add_phrase(str(value), dataset_key, "value")
+
+    def remove_dataset(self, dataset_key: str):
+        """Drop a dataset from every posting list"""
+        self.dataset_keys.discard(dataset_key)
+        for phrase in list(self.postings):
+            postings = self.postings[phrase]
+            if postings.pop(dataset_key, None) is not None and not postings:
+                del self.postings[phrase]
+
+    def search(self, query_text: str) -> List[tuple]:
+        """
+        Score datasets by the phrases of the query they contain
+
+        Returns:
+            List of (dataset_key, score) sorted by descending score
+        """
+        terms = [normalize_term(t) for t in tokenize(query_text)]
+        n_datasets = max(len(self.dataset_keys), 1)
+        scores: Dict[str, float] = defaultdict(float)
+        seen = set()
+
+        for length in range(self.MAX_PHRASE_LENGTH, 0, -1):
+            for start in range(len(terms) - length + 1):
+                phrase = " ".join(terms[start:start + length])
+                postings = self.postings.get(phrase)
+                if not postings or phrase in seen:
+                    continue
+                seen.add(phrase)
+                # Rare phrases (e.g. "rainfall") outweigh ubiquitous ones (e.g. "state")
+                idf = math.log(1 + n_datasets / len(postings))
+                for dataset_key, weight in postings.items():
+                    scores[dataset_key] += weight * idf * length
+
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> Dict[str, float]:
+    """Fuse several ranked lists of keys with reciprocal-rank fusion"""
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            fused[key] += 1.0 / (k + rank + 1)
+    return dict(fused)
+
+
+RETRIEVER_BACKENDS = {
+    ChromaRetriever.name: ChromaRetriever,
+    NumpyRetriever.name: NumpyRetriever,
+    BM25Retriever.name: BM25Retriever,
+}
+
+
+def create_retriever(backend: Optional[str] = None) -> BaseRetriever:
+    """
+    Create the retriever configured by ``RETRIEVER_BACKEND``
+
+    ``auto`` prefers ChromaDB (with OpenAI embeddings) and falls back to the
+    in-process NumPy index when no embedding key is configured, since
+    Chroma's default embedder downloads a model on first use, or when
+    chromadb cannot be imported or initialized.
+    """
+    backend = (backend or settings.RETRIEVER_BACKEND).lower()
+
+    if backend == "auto":
+        if not settings.OPENAI_API_KEY:
+            logger.info("No embedding API key configured, using NumPy index")
+            return NumpyRetriever()
+        try:
+            return ChromaRetriever()
+        except Exception as e:
+            logger.warning(f"ChromaDB unavailable ({e}), falling back to NumPy index")
+            return NumpyRetriever()
+
+    if backend not in RETRIEVER_BACKENDS:
+        raise ValueError(f"Unknown retriever backend: {backend}")
+
+    return RETRIEVER_BACKENDS[backend]()
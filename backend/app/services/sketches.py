@@ -0,0 +1,157 @@
+"""
+Sketches
+Mergeable summaries built in one pass over a dataset: HyperLogLog for
+distinct counts and t-digest for quantiles
+"""
+import logging
+import math
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """64-bit hashes of the non-null values (categoricals hash by value, not code)"""
+    return pd.util.hash_pandas_object(values.dropna(), index=False).to_numpy()
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bit length of uint64 values (exact below 2^53, which covers the
+    register-rank bits at any precision of 11 or more)"""
+    return np.frexp(values.astype("float64"))[1]
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch with 2^precision one-byte registers
+
+    The relative standard error is about ``1.04 / sqrt(2^precision)``
+    (1.6% at the default precision of 12, in 4 KB).
+    """
+
+    def __init__(self, precision: int = 12, registers: Optional[np.ndarray] = None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        bits = 64 - self.precision
+        index = (hashes >> np.uint64(bits)).astype(np.int64)
+        rest = hashes & np.uint64((1 << bits) - 1)
+        rank = (bits - _bit_length(rest) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def add(self, values: pd.Series):
+        self.add_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def estimate(self) -> float:
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        raw = alpha * self.m ** 2 / np.exp2(-self.registers.astype("float64")).sum()
+        zeros = int((self.registers == 0).sum())
+        if raw <= 2.5 * self.m and zeros:
+            # Small range: linear counting is more accurate
+            return self.m * math.log(self.m / zeros)
+        return float(raw)
+
+
+class TDigest:
+    """
+    Quantile sketch: weighted centroids, fine-grained near the tails
+
+    Centroids are (re)built with the k1 scale function, so roughly
+    ``compression / 2`` of them summarize any number of values; extreme
+    quantiles stay accurate because tail centroids hold few values.
+    """
+
+    def __init__(
+        self,
+        compression: int = 200,
+        means: Optional[np.ndarray] = None,
+        weights: Optional[np.ndarray] = None,
+        minimum: float = math.inf,
+        maximum: float = -math.inf
+    ):
+        self.compression = compression
+        self.means = means if means is not None else np.empty(0)
+        self.weights = weights if weights is not None else np.empty(0)
+        self.min = minimum
+        self.max = maximum
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def update(self, values: np.ndarray):
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))])
+        )
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        merged = TDigest(self.compression, minimum=min(self.min, other.min), maximum=max(self.max, other.max))
+        merged._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights])
+        )
+        return merged
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        if len(means) == 0:
+            self.means, self.weights = means, weights
+            return
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        midpoints = (np.cumsum(weights) - weights / 2) / total
+        scale = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * midpoints - 1, -1, 1))
+        bucket = np.floor(scale - scale[0]).astype(np.int64)
+        new_weights = np.bincount(bucket, weights)
+        new_means = np.bincount(bucket, weights * means)
+        keep = new_weights > 0
+        self.weights = new_weights[keep]
+        self.means = new_means[keep] / self.weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self.means) == 0:
+            return None
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(
+            q * total,
+            np.concatenate([[0.0], centers, [total]]),
+            np.concatenate([[self.min], self.means, [self.max]])
+        ))
+
+    def quantiles(self, qs: Sequence[float]) -> list:
+        return [self.quantile(q) for q in qs]
+
+    def mean(self) -> Optional[float]:
+        if len(self.means) == 0:
+            return None
+        return float((self.means * self.weights).sum() / self.weights.sum())
+
+    def to_array(self) -> np.ndarray:
+        """``[[min, max], [mean, weight], ...]`` for persistence"""
+        return np.vstack([[self.min, self.max], np.column_stack([self.means, self.weights])])
+
+    @classmethod
+    def from_array(cls, array: np.ndarray, compression: int = 200) -> "TDigest":
+        return cls(compression, array[1:, 0].copy(), array[1:, 1].copy(), float(array[0, 0]), float(array[0, 1]))
@@ -0,0 +1,577 @@
+"""
+SQL Engine
+A read-only SQL subset over the cached datasets, executed on Arrow tables
+with pyarrow.compute
+
+Supported grammar (keywords are case-insensitive)::
+
+    SELECT item [, item ...]
+    FROM dataset [alias]
+    [JOIN dataset [alias] USING (State[, Year]) | ON a.State = b.State [AND ...]]
+    [WHERE condition [AND condition ...]]
+    [GROUP BY column [, column ...]]
+    [ORDER BY column|label [ASC|DESC] [, ...]]
+    [LIMIT n]
+
+    item      := * | column [AS label] | agg(column | *) [AS label]
+    agg       := SUM | AVG | MIN | MAX | COUNT | COUNT_DISTINCT
+    condition := column op literal | column [NOT] IN (literal, ...)
+               | column BETWEEN literal AND literal
+    op        := = | != | <> | < | <= | > | >=
+
+Only SELECT exists, there are no expressions beyond these and datasets are
+read from the in-process Arrow tables, so there is nothing to inject into.
+"""
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from app.core.config import settings
+from app.services.arrow_query import COMPARISONS, compare, nan_to_null, sort_limit, to_rows
+
+logger = logging.getLogger(__name__)
+
+# Columns datasets may be joined on
+JOIN_KEYS = ("State", "Year")
+
+# SQL aggregate -> Arrow hash aggregation
+AGGREGATES = {
+    "sum": "sum",
+    "avg": "mean",
+    "mean": "mean",
+    "min": "min",
+    "max": "max",
+    "count": "count",
+    "count_distinct": "count_distinct",
+}
+
+KEYWORDS = {
+    "select", "from", "join", "inner", "using", "on", "where", "and", "group", "by",
+    "order", "asc", "desc", "limit", "as", "in", "not", "between",
+}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d+)?)
+      | '(?P<string>(?:[^']|'')*)'
+      | "(?P<quoted>[^"]+)"
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><=|>=|<>|!=|=|<|>)
+      | (?P<punct>[(),.*])
+    )""", re.VERBOSE)
+
+
+class SQLQueryError(ValueError):
+    """The query is not valid in the supported subset"""
+
+
+class QueryBudgetExceeded(Exception):
+    """The query would scan or join more rows than its budget allows"""
+
+
+def tokenize(sql: str) -> List[Tuple[str, Any]]:
+    """Split a query into ``(kind, value)`` tokens"""
+    tokens = []
+    position = 0
+    sql = sql.strip().rstrip(";")
+    while position < len(sql):
+        match = TOKEN_PATTERN.match(sql, position)
+        if match is None or match.end() == position:
+            if sql[position:].strip() == "":
+                break
+            raise SQLQueryError(f"Unexpected input at position {position}: {sql[position:position + 20]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "string":
+            value = value.replace("''", "'")
+        elif kind == "quoted":
+            kind = "name"
+        elif kind == "name" and value.lower() in KEYWORDS:
+            kind, value = "keyword", value.lower()
+        tokens.append((kind, value))
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a plain-dict query"""
+
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> Tuple[Optional[str], Any]:
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def accept(self, kind: str, value: Any = None) -> bool:
+        token_kind, token_value = self.peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.position += 1
+            return True
+        return False
+
+    def expect(self, kind: str, value: Any = None) -> Any:
+        token_kind, token_value = self.peek()
+        if token_kind != kind or (value is not None and token_value != value):
+            found = token_value if token_kind else "end of query"
+            raise SQLQueryError(f"Expected {value or kind}, found {found!r}")
+        self.position += 1
+        return token_value
+
+    def parse(self) -> Dict[str, Any]:
+        self.expect("keyword", "select")
+        query = {"select": self.select_list(), "joins": [], "where": [], "group_by": [],
+                 "order_by": [], "limit": None}
+
+        self.expect("keyword", "from")
+        query["from"] = self.table()
+        while self.accept("keyword", "inner") or self.peek() == ("keyword", "join"):
+            self.expect("keyword", "join")
+            query["joins"].append(self.join())
+
+        if self.accept("keyword", "where"):
+            query["where"].append(self.condition())
+            while self.accept("keyword", "and"):
+                query["where"].append(self.condition())
+        if self.accept("keyword", "group"):
+            self.expect("keyword", "by")
+            query["group_by"] = self.comma_separated(self.column)
+        if self.accept("keyword", "order"):
+            self.expect("keyword", "by")
+            query["order_by"] = self.comma_separated(self.order_item)
+        if self.accept("keyword", "limit"):
+            limit = self.expect("number")
+            if not isinstance(limit, int) or limit < 0:
+                raise SQLQueryError("LIMIT must be a non-negative integer")
+            query["limit"] = limit
+
+        if self.position < len(self.tokens):
+            raise SQLQueryError(f"Unexpected {self.peek()[1]!r}")
+        return query
+
+    def comma_separated(self, item) -> List[Any]:
+        items = [item()]
+        while self.accept("punct", ","):
+            items.append(item())
+        return items
+
+    def select_list(self) -> List[Dict[str, Any]]:
+        if self.accept("punct", "*"):
+            return [{"star": True}]
+        return self.comma_separated(self.select_item)
+
+    def select_item(self) -> Dict[str, Any]:
+        kind, value = self.peek()
+        if kind == "name" and value.lower() in AGGREGATES and self.peek(1) == ("punct", "("):
+            self.position += 2
+            argument = None if self.accept("punct", "*") else self.column()
+            self.expect("punct", ")")
+            function = value.lower()
+            if argument is None and function != "count":
+                raise SQLQueryError(f"{function.upper()}(*) is not supported")
+            item = {"aggregate": function, "column": argument}
+            default_label = f"{function}({argument['name'] if argument else '*'})"
+        else:
+            item = {"column": self.column()}
+            default_label = item["column"]["name"]
+        item["label"] = self.expect("name") if self.accept("keyword", "as") else default_label
+        return item
+
+    def column(self) -> Dict[str, Any]:
+        name = self.expect("name")
+        if self.accept("punct", "."):
+            return {"table": name, "name": self.expect("name")}
+        return {"table": None, "name": name}
+
+    def table(self) -> Dict[str, str]:
+        dataset = self.expect("name")
+        alias = dataset
+        if self.accept("keyword", "as") or self.peek()[0] == "name":
+            alias = self.expect("name")
+        return {"dataset": dataset, "alias": alias}
+
+    def join(self) -> Dict[str, Any]:
+        join = self.table()
+        if self.accept("keyword", "using"):
+            self.expect("punct", "(")
+            keys = self.comma_separated(lambda: self.expect("name"))
+            self.expect("punct", ")")
+        else:
+            self.expect("keyword", "on")
+            keys = [self.join_condition()]
+            while self.accept("keyword", "and"):
+                keys.append(self.join_condition())
+        join["keys"] = keys
+        return join
+
+    def join_condition(self) -> str:
+        left = self.column()
+        self.expect("op", "=")
+        right = self.column()
+        if left["name"] != right["name"]:
+            raise SQLQueryError("Joins must match columns of the same name (e.g. a.State = b.State)")
+        return left["name"]
+
+    def literal(self) -> Any:
+        kind, value = self.peek()
+        if kind not in ("number", "string"):
+            raise SQLQueryError(f"Expected a literal, found {value!r}")
+        self.position += 1
+        return value
+
+    def condition(self) -> Dict[str, Any]:
+        column = self.column()
+        if self.accept("keyword", "between"):
+            low = self.literal()
+            self.expect("keyword", "and")
+            return {"column": column, "op": "between", "value": [low, self.literal()]}
+        negate = self.accept("keyword", "not")
+        if self.accept("keyword", "in"):
+            self.expect("punct", "(")
+            values = self.comma_separated(self.literal)
+            self.expect("punct", ")")
+            return {"column": column, "op": "not in" if negate else "in", "value": values}
+        if negate:
+            raise SQLQueryError("NOT is only supported as NOT IN")
+        op = self.expect("op")
+        return {"column": column, "op": "!=" if op == "<>" else op, "value": self.literal()}
+
+    def order_item(self) -> Dict[str, Any]:
+        item = {"column": self.column(), "order": "ascending"}
+        if self.accept("keyword", "desc"):
+            item["order"] = "descending"
+        else:
+            self.accept("keyword", "asc")
+        return item
+
+
+def parse(sql: str) -> Dict[str, Any]:
+    """Parse a query into a plain-dict syntax tree"""
+    tokens = tokenize(sql)
+    if not tokens:
+        raise SQLQueryError("Empty query")
+    return _Parser(tokens).parse()
+
+
+class SQLEngine:
+    """
+    Plans and runs read-only SQL over the cached dataset tables
+
+    Plans (parsed and bound against the dataset schemas) are kept in an LRU
+    keyed by the normalized query text and rebound only if a dataset's
+    schema changes. Each query has a row budget, checked after filters are
+    pushed down to the scans and after every join, and a time budget,
+    checked between stages.
+    """
+
+    def __init__(self, data_fetcher: Any, plan_cache_size: Optional[int] = None):
+        self.data_fetcher = data_fetcher
+        self.plan_cache_size = plan_cache_size or settings.SQL_PLAN_CACHE_SIZE
+        self._plans: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"queries": 0, "plan_hits": 0, "plan_misses": 0, "rejected": 0}
+
+    async def execute(
+        self,
+        sql: str,
+        max_rows: Optional[int] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a query and return compact columnar results
+
+        Returns ``{"columns", "rows", "row_count", "truncated",
+        "scanned_rows", "plan_cached"}``. Raises ``SQLQueryError`` for
+        invalid queries, ``QueryBudgetExceeded`` over the row budget and
+        ``TimeoutError`` over the time budget.
+        """
+        self.stats["queries"] += 1
+        max_rows = min(max_rows or settings.SQL_MAX_RESULT_ROWS, settings.SQL_MAX_RESULT_ROWS)
+        timeout = timeout or settings.SQL_TIMEOUT
+        deadline = time.monotonic() + timeout
+
+        key = " ".join(sql.split())
+        query = self._plans.get(key, {}).get("query")
+        if query is None:
+            query = parse(sql)
+
+        # Load every referenced dataset (shared, per-version Arrow tables)
+        tables = {}
+        for source in [query["from"]] + query["joins"]:
+            if source["dataset"] not in self.data_fetcher.DATASETS:
+                raise SQLQueryError(f"Unknown dataset: {source['dataset']}")
+            tables[source["alias"]] = await self.data_fetcher.fetch_table(source["dataset"])
+
+        plan, cached = self._plan(key, query, tables)
+        try:
+            result = await asyncio.wait_for(
+                asyncio.to_thread(self._run, plan, tables, max_rows, deadline),
+                timeout=max(deadline - time.monotonic(), 0.001)
+            )
+        except (QueryBudgetExceeded, TimeoutError):
+            self.stats["rejected"] += 1
+            raise
+        result["plan_cached"] = cached
+        return result
+
+    def _plan(
+        self,
+        key: str,
+        query: Dict[str, Any],
+        tables: Dict[str, pa.Table]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """Bound plan from the cache, or bind and cache it"""
+        schemas = {alias: table.schema for alias, table in tables.items()}
+        entry = self._plans.get(key)
+        if entry is not None and all(
+            entry["schemas"][alias].equals(schema) for alias, schema in schemas.items()
+        ):
+            self._plans.move_to_end(key)
+            self.stats["plan_hits"] += 1
+            return entry["plan"], True
+
+        self.stats["plan_misses"] += 1
+        plan = self._bind(query, schemas)
+        self._plans[key] = {"query": query, "schemas": schemas, "plan": plan}
+        self._plans.move_to_end(key)
+        while len(self._plans) > self.plan_cache_size:
+            self._plans.popitem(last=False)
+        return plan, False
+
+    def _bind(self, query: Dict[str, Any], schemas: Dict[str, pa.Schema]) -> Dict[str, Any]:
+        """Resolve column references and validate the query against the schemas"""
+        sources = [query["from"]] + query["joins"]
+        aliases = [source["alias"] for source in sources]
+        if len(set(aliases)) != len(aliases):
+            raise SQLQueryError("Each joined dataset needs a distinct alias")
+        by_name = {source["dataset"]: source["alias"] for source in sources}
+        joined = len(sources) > 1
+
+        join_keys = set()
+        for join in query["joins"]:
+            for name in join["keys"]:
+                if name not in JOIN_KEYS:
+                    raise SQLQueryError(f"Joins are only supported on {', '.join(JOIN_KEYS)}")
+                if not all(name in schemas[alias].names for alias in aliases):
+                    raise SQLQueryError(f"Join key {name} is missing from a joined dataset")
+                join_keys.add(name)
+
+        def internal(alias: str, name: str) -> str:
+            # Join keys are shared; other columns are qualified when joining
+            return name if name in join_keys or not joined else f"{alias}.{name}"
+
+        def resolve(column: Dict[str, Any]) -> str:
+            name = column["name"]
+            if column["table"] is not None:
+                alias = by_name.get(column["table"], column["table"])
+                if alias not in schemas:
+                    raise SQLQueryError(f"Unknown table: {column['table']}")
+                if name not in schemas[alias].names:
+                    raise SQLQueryError(f"Unknown column: {column['table']}.{name}")
+                return internal(alias, name)
+            if name in join_keys:
+                return name
+            owners = [alias for alias in aliases if name in schemas[alias].names]
+            if not owners:
+                available = sorted({col for schema in schemas.values() for col in schema.names})
+                raise SQLQueryError(f"Unknown column: {name} (available: {', '.join(available)})")
+            if len(owners) > 1:
+                raise SQLQueryError(f"Ambiguous column {name}; qualify it as <dataset>.{name}")
+            return internal(owners[0], name)
+
+        # Output columns
+        outputs = []
+        if query["select"] == [{"star": True}]:
+            if query["group_by"]:
+                raise SQLQueryError("SELECT * cannot be combined with GROUP BY")
+            for alias in aliases:
+                for name in schemas[alias].names:
+                    column = internal(alias, name)
+                    if column not in [output["column"] for output in outputs]:
+                        outputs.append({"column": column, "label": column, "aggregate": None})
+        else:
+            for item in query["select"]:
+                outputs.append({
+                    "column": resolve(item["column"]) if item.get("column") else None,
+                    "label": item["label"],
+                    "aggregate": item.get("aggregate"),
+                })
+        labels = [output["label"] for output in outputs]
+        if len(set(labels)) != len(labels):
+            raise SQLQueryError("Output column names must be unique; use AS to rename")
+
+        group_by = [resolve(column) for column in query["group_by"]]
+        aggregated = bool(group_by) or any(output["aggregate"] for output in outputs)
+        if aggregated:
+            for output in outputs:
+                if output["aggregate"] is None and output["column"] not in group_by:
+                    raise SQLQueryError(
+                        f"{output['label']} must appear in GROUP BY or be aggregated"
+                    )
+
+        # ORDER BY refers to output labels or selected columns
+        order_by = []
+        for item in query["order_by"]:
+            column = item["column"]
+            label = None
+            if column["table"] is None and column["name"] in labels:
+                label = column["name"]
+            else:
+                resolved = resolve(column)
+                label = next((output["label"] for output in outputs
+                              if output["column"] == resolved and not output["aggregate"]), None)
+                if label is None:
+                    raise SQLQueryError(f"ORDER BY {column['name']} must be a selected column")
+            order_by.append((label, item["order"]))
+
+        # Conditions, pushed down to the scan of each table they touch
+        conditions = []
+        for condition in query["where"]:
+            column = resolve(condition["column"])
+            op = condition["op"]
+            if op not in COMPARISONS and op not in ("in", "not in", "between"):
+                raise SQLQueryError(f"Unsupported operator {op}")
+            conditions.append({"column": column, "op": op, "value": condition["value"]})
+
+        scans = []
+        for alias in aliases:
+            columns = {}
+            for name in schemas[alias].names:
+                columns[internal(alias, name)] = name
+            needed = {output["column"] for output in outputs if output["column"]}
+            needed |= set(group_by) | {c["column"] for c in conditions} | join_keys
+            scans.append({
+                "alias": alias,
+                "columns": {column: name for column, name in columns.items() if column in needed},
+                "conditions": [c for c in conditions if c["column"] in columns],
+            })
+
+        return {
+            "scans": scans,
+            "joins": [{"alias": join["alias"], "keys": list(join["keys"])} for join in query["joins"]],
+            "outputs": outputs,
+            "group_by": group_by,
+            "aggregated": aggregated,
+            "order_by": order_by,
+            "limit": query["limit"],
+        }
+
+    def _run(
+        self,
+        plan: Dict[str, Any],
+        tables: Dict[str, pa.Table],
+        max_rows: int,
+        deadline: float
+    ) -> Dict[str, Any]:
+        """Execute a bound plan (in a worker thread)"""
+        def check_deadline():
+            if time.monotonic() > deadline:
+                raise TimeoutError("Query exceeded its time budget")
+
+        def check_rows(rows: int, stage: str):
+            if rows > settings.SQL_MAX_SCAN_ROWS:
+                raise QueryBudgetExceeded(
+                    f"{stage} produces {rows:,} rows, over the {settings.SQL_MAX_SCAN_ROWS:,} row "
+                    "budget; add WHERE filters or join fewer keys"
+                )
+
+        scanned = 0
+        results = {}
+        for scan in plan["scans"]:
+            table = tables[scan["alias"]]
+            mask = None
+            for condition in scan["conditions"]:
+                condition_mask = self._condition_mask(table, scan["columns"][condition["column"]], condition)
+                mask = condition_mask if mask is None else pc.and_(mask, condition_mask)
+            names = list(scan["columns"].values())
+            table = table.select(names)
+            if mask is not None:
+                table = table.filter(mask)
+            table = table.rename_columns(list(scan["columns"].keys()))
+            check_rows(table.num_rows, f"Scan of {scan['alias']}")
+            scanned += table.num_rows
+            results[scan["alias"]] = table
+            check_deadline()
+
+        table = results[plan["scans"][0]["alias"]]
+        for join in plan["joins"]:
+            table = table.join(results[join["alias"]], keys=join["keys"], join_type="inner")
+            check_rows(table.num_rows, f"Join with {join['alias']}")
+            check_deadline()
+
+        outputs = plan["outputs"]
+        if plan["aggregated"]:
+            table = self._aggregate(table, plan["group_by"], outputs)
+        else:
+            table = table.select([output["column"] for output in outputs])
+        table = table.rename_columns([output["label"] for output in outputs])
+        check_deadline()
+
+        limit = max_rows if plan["limit"] is None else min(plan["limit"], max_rows)
+        result = sort_limit(table, plan["order_by"], limit + 1)
+        truncated = result.num_rows > limit
+        result = result.slice(0, limit)
+        return {
+            "columns": result.column_names,
+            "rows": to_rows(result),
+            "row_count": result.num_rows,
+            "truncated": truncated,
+            "scanned_rows": scanned,
+        }
+
+    @staticmethod
+    def _condition_mask(table: pa.Table, name: str, condition: Dict[str, Any]) -> pa.ChunkedArray:
+        column = table.column(name)
+        op, value = condition["op"], condition["value"]
+        try:
+            if op == "between":
+                return pc.and_(compare(column, ">=", value[0]), compare(column, "<=", value[1]))
+            return compare(column, op, value)
+        except TypeError as e:
+            raise SQLQueryError(f"Invalid condition on {condition['column']}: {e}") from e
+
+    @staticmethod
+    def _aggregate(table: pa.Table, group_by: List[str], outputs: List[Dict[str, Any]]) -> pa.Table:
+        """Hash-aggregate, returning columns in output order"""
+        aggregations = []
+        names = []
+        for output in outputs:
+            if output["aggregate"] is None:
+                names.append(output["column"])
+                continue
+            function = AGGREGATES[output["aggregate"]]
+            if output["column"] is None:
+                if ([], "count_all") not in aggregations:
+                    aggregations.append(([], "count_all"))
+                names.append("count_all")
+                continue
+            column = table.column(output["column"])
+            if function in ("sum", "mean") and not (
+                pa.types.is_integer(column.type) or pa.types.is_floating(column.type)
+            ):
+                raise SQLQueryError(f"{output['aggregate'].upper()} needs a numeric column")
+            if (output["column"], function) not in aggregations:
+                aggregations.append((output["column"], function))
+            names.append(f"{output['column']}_{function}")
+
+        for name, function in aggregations:
+            if not name:
+                continue
+            index = table.schema.get_field_index(name)
+            column = table.column(index)
+            if pa.types.is_dictionary(column.type) and function != "count":
+                # Hash aggregations other than count need the plain values
+                column = column.cast(column.type.value_type)
+            # Like pandas, NaN measures are skipped rather than propagated
+            table = table.set_column(index, name, nan_to_null(column))
+
+        grouped = table.group_by(group_by).aggregate(aggregations)
+        return grouped.select(names)
@@ -0,0 +1,273 @@
+"""
+Visualizations
+Chart-ready series built from the retrieved tables (time series per state,
+state rankings, crop-climate scatters), downsampled to a fixed point budget
+so charts render without shipping raw rows to the browser
+"""
+import logging
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.types as pa_types
+
+from app.services.data_normalizer import MONTH_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Known measures, in order of preference, and how rows at the same point
+# combine: extensive quantities add up, intensive ones are averaged
+METRIC_AGGREGATIONS = {
+    "Production": "sum",
+    "Area": "sum",
+    "Yield": "mean",
+    "Rainfall_mm": "mean",
+    "Avg_Temperature": "mean",
+    "Max_Temperature": "mean",
+    "Min_Temperature": "mean",
+    "Price_per_Quintal": "mean",
+}
+
+# Numeric columns that are dimensions, not measures
+DIMENSION_COLUMNS = {"Year", "Month"}
+
+MIN_POINTS_PER_SERIES = 20
+RANKING_SIZE = 10
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets downsampling
+
+    Returns the indices of ``threshold`` points (always including the first
+    and last) that keep the visual shape of the series: from each bucket,
+    the point forming the largest triangle with the previously selected
+    point and the average of the next bucket. ``x`` must be sorted.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = x.astype("float64")
+    y = y.astype("float64")
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Twice the triangle areas (a, candidate, next-bucket average)
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+
+    return selected
+
+
+def choose_metric(table: pa.Table, requested: Optional[List[str]] = None) -> Optional[str]:
+    """
+    The measure to chart: one the question asks for (``required_data``
+    metrics, matched loosely against column names), else the first known
+    measure, else the first numeric non-dimension column
+    """
+    numeric = [
+        field.name for field in table.schema
+        if (pa_types.is_integer(field.type) or pa_types.is_floating(field.type))
+        and field.name not in DIMENSION_COLUMNS
+    ]
+    for wanted in requested or []:
+        wanted = str(wanted).lower().replace(" ", "_")
+        for name in numeric:
+            if wanted in name.lower() or name.lower() in wanted:
+                return name
+    for name in METRIC_AGGREGATIONS:
+        if name in numeric:
+            return name
+    return numeric[0] if numeric else None
+
+
+def _series_budget(max_points: int, series_count: int) -> int:
+    return max(MIN_POINTS_PER_SERIES, max_points // max(series_count, 1))
+
+
+def time_series(
+    table: pa.Table,
+    dataset_key: str,
+    metric: str,
+    max_points: int,
+    max_series: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Line chart of ``metric`` over time, one series per state
+
+    Monthly datasets are charted per month (``YYYY-MM``), others per year.
+    Only the ``max_series`` states with the largest totals are kept; each
+    series is downsampled with LTTB to its share of ``max_points``.
+    """
+    if "Year" not in table.column_names:
+        return None
+
+    aggregation = METRIC_AGGREGATIONS.get(metric, "mean")
+    monthly = "Month" in table.column_names
+    has_state = "State" in table.column_names
+    keys = (["State"] if has_state else []) + ["Year"] + (["Month"] if monthly else [])
+
+    grouped = table.select(keys + [metric]).group_by(keys).aggregate([(metric, aggregation)])
+    df = grouped.to_pandas().dropna(subset=[f"{metric}_{aggregation}"])
+    if df.empty or df["Year"].nunique() < 2:
+        return None
+
+    value_col = f"{metric}_{aggregation}"
+    if monthly:
+        month = df["Month"].astype(str).map({name: i for i, name in enumerate(MONTH_NAMES)})
+        df = df.assign(_t=df["Year"] * 12 + month).dropna(subset=["_t"])
+    else:
+        df = df.assign(_t=df["Year"])
+
+    if has_state:
+        totals = df.groupby("State", observed=True)[value_col].sum().abs()
+        states = totals.sort_values(ascending=False).head(max_series).index.tolist()
+    else:
+        states = [None]
+
+    budget = _series_budget(max_points, len(states))
+    series = []
+    downsampled = False
+    for state in states:
+        rows = df if state is None else df[df["State"] == state]
+        rows = rows.sort_values("_t")
+        t = rows["_t"].to_numpy(dtype="float64")
+        values = rows[value_col].to_numpy(dtype="float64")
+        keep = lttb(t, values, budget)
+        downsampled = downsampled or len(keep) < len(t)
+
+        if monthly:
+            x = [f"{int(v) // 12}-{int(v) % 12 + 1:02d}" for v in t[keep]]
+        else:
+            x = [int(v) for v in t[keep]]
+        series.append({
+            "name": str(state) if state is not None else metric,
+            "points": [[xv, round(float(yv), 4)] for xv, yv in zip(x, values[keep])],
+            "total_points": len(t),
+        })
+
+    return {
+        "type": "line",
+        "title": f"{metric} ({aggregation}) by {'month' if monthly else 'year'}",
+        "dataset_id": dataset_key,
+        "x": {"field": "Month" if monthly else "Year", "type": "month" if monthly else "year"},
+        "y": {"field": metric, "aggregation": aggregation},
+        "series": series,
+        "downsampled": downsampled,
+    }
+
+
+def state_ranking(table: pa.Table, dataset_key: str, metric: str) -> Optional[Dict[str, Any]]:
+    """Bar chart of the top states by ``metric`` over the retrieved rows"""
+    if "State" not in table.column_names:
+        return None
+
+    aggregation = METRIC_AGGREGATIONS.get(metric, "mean")
+    grouped = table.select(["State", metric]).group_by(["State"]).aggregate([(metric, aggregation)])
+    df = grouped.to_pandas().dropna()
+    if len(df) < 2:
+        return None
+
+    value_col = f"{metric}_{aggregation}"
+    df = df.sort_values(value_col, ascending=False).head(RANKING_SIZE)
+    return {
+        "type": "bar",
+        "title": f"Top states by {metric} ({aggregation})",
+        "dataset_id": dataset_key,
+        "x": {"field": "State", "type": "category"},
+        "y": {"field": metric, "aggregation": aggregation},
+        "series": [{
+            "name": metric,
+            "points": [[str(s), round(float(v), 4)] for s, v in zip(df["State"], df[value_col])],
+            "total_points": len(grouped),
+        }],
+        "downsampled": False,
+    }
+
+
+def build_charts(
+    table: pa.Table,
+    dataset_key: str,
+    required_data: Dict[str, Any],
+    max_points: int,
+    max_series: int
+) -> List[Dict[str, Any]]:
+    """Time series and ranking charts for one retrieved (filtered) table"""
+    metric = choose_metric(table, required_data.get("metrics"))
+    if metric is None or table.num_rows == 0:
+        return []
+
+    charts = []
+    try:
+        for chart in (
+            time_series(table, dataset_key, metric, max_points, max_series),
+            state_ranking(table, dataset_key, metric),
+        ):
+            if chart:
+                charts.append(chart)
+    except Exception as e:
+        # Charts are an extra; never fail the answer over them
+        logger.warning(f"Could not chart {dataset_key}: {e}")
+    return charts
+
+
+def correlation_scatter(
+    aligned: pd.DataFrame,
+    analysis: Dict[str, Any],
+    max_points: int
+) -> Optional[Dict[str, Any]]:
+    """
+    Scatter of the strongest pooled crop-climate correlation
+
+    One point per aligned State/Year row of that crop, labelled with both;
+    larger clouds are sampled uniformly (deterministically) to ``max_points``.
+    """
+    strongest = next(iter(analysis.get("correlations_by_crop") or []), None)
+    if not strongest:
+        return None
+
+    x_col, y_col = strongest["climate_metric"], strongest["crop_metric"]
+    rows = aligned
+    if "Crop" in rows.columns and strongest.get("Crop") is not None:
+        rows = rows[rows["Crop"] == strongest["Crop"]]
+    rows = rows[["State", "Year", x_col, y_col]].dropna()
+    if rows.empty:
+        return None
+
+    total = len(rows)
+    if total > max_points:
+        keep = np.random.default_rng(0).choice(total, size=max_points, replace=False)
+        rows = rows.iloc[np.sort(keep)]
+
+    return {
+        "type": "scatter",
+        "title": f"{strongest.get('Crop', 'Crops')}: {y_col} vs {x_col} (r = {strongest['r']})",
+        "dataset_ids": analysis.get("datasets_used", []),
+        "x": {"field": x_col, "type": "number"},
+        "y": {"field": y_col, "type": "number"},
+        "series": [{
+            "name": str(strongest.get("Crop", y_col)),
+            "points": [
+                [round(float(x), 4), round(float(y), 4), f"{state} {int(year)}"]
+                for state, year, x, y in rows.itertuples(index=False)
+            ],
+            "total_points": total,
+        }],
+        "downsampled": len(rows) < total,
+    }
@@ -0,0 +1,192 @@
+"""
+Warmup
+Background startup work (service creation, dataset loading, index build)
+with progress reporting, so the app is live before its caches are hot
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.startup import startup_profile
+
+logger = logging.getLogger(__name__)
+
+# Imported in a worker thread during warmup rather than when the app module
+# loads; together they account for most of the process's import time
+HEAVY_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "aiohttp",
+    "sqlalchemy",
+    "yaml",
+    "app.services.dataset_registry",
+    "app.services.data_fetcher",
+    "app.services.rag_service",
+    "app.services.conversation_store",
+    "app.services.refresh_scheduler",
+    "app.services.query_engine",
+    "app.services.batch_runner",
+    "app.services.sql_engine",
+]
+
+
+def _import_heavy_modules():
+    for name in HEAVY_MODULES:
+        startup_profile.import_module(name)
+
+
+class Warmup:
+    """
+    Creates the data services and warms them up in the background
+
+    Stages: import the heavy modules, read the dataset registry and create
+    the services (published on ``app.state``), then load the preloaded
+    datasets (decoded frames and aggregate cubes) concurrently with the
+    retrieval index build; other datasets load on first use. ``ready`` flips once
+    all stages are done; until then requests are served from the cached
+    parquet files with keyword-only dataset retrieval.
+    """
+
+    def __init__(self, app: Any):
+        self.app = app
+        self.state = "pending"  # pending, running, ready, failed
+        self.services = "pending"
+        self.datasets: Dict[str, str] = {}
+        self.index = "pending"
+        self.started_at: Optional[float] = None
+        self.elapsed: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self):
+        """Start warming up in the background"""
+        if self._task is None:
+            self.started_at = time.monotonic()
+            self._task = asyncio.create_task(self._run())
+
+    async def wait(self):
+        """Wait for warmup to finish"""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    async def stop(self):
+        """Cancel warmup if still running and close the services it created"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+        state = self.app.state
+        if getattr(state, "dataset_registry", None):
+            await state.dataset_registry.stop()
+        if getattr(state, "refresh_scheduler", None):
+            await state.refresh_scheduler.stop()
+        if getattr(state, "data_fetcher", None):
+            await state.data_fetcher.close()
+        if getattr(state, "conversation_store", None):
+            state.conversation_store.close()
+
+    async def _run(self):
+        self.state = "running"
+        logger.info("Warming up in the background...")
+        try:
+            await self._create_services()
+            await asyncio.gather(self._load_datasets(), self._build_index())
+        except Exception as e:
+            self.state = "failed"
+            logger.error(f"Warmup failed: {e}", exc_info=True)
+            return
+        finally:
+            self.elapsed = time.monotonic() - self.started_at
+
+        self.state = "ready"
+        startup_profile.mark("ready")
+        logger.info(f"✅ Warmup complete in {self.elapsed:.1f}s; ready for traffic")
+
+    async def _create_services(self):
+        self.services = "importing"
+        await asyncio.to_thread(_import_heavy_modules)
+        startup_profile.mark("imports")
+
+        from app.services.conversation_store import ConversationStore
+        from app.services.data_fetcher import DataFetcher
+        from app.services.dataset_registry import DatasetRegistry
+        from app.services.rag_service import RAGService
+        from app.services.refresh_scheduler import RefreshScheduler
+        from app.services.sql_engine import SQLEngine
+
+        state = self.app.state
+        registry = DatasetRegistry()
+        # The first read parses the catalog and queries SQLite
+        await asyncio.to_thread(registry.reload)
+        data_fetcher = DataFetcher(registry)
+        self.datasets = {key: "pending" for key in registry.preload_keys()}
+
+        # Conversation history for follow-up questions
+        state.conversation_store = await asyncio.to_thread(ConversationStore)
+        state.rag_service = RAGService(data_fetcher=data_fetcher)
+        state.sql_engine = SQLEngine(data_fetcher)
+        state.data_fetcher = data_fetcher
+
+        # Hot reload: caches and the index follow registry changes
+        registry.subscribe(data_fetcher.apply_registry_changes)
+        registry.subscribe(state.rag_service.apply_registry_changes)
+        registry.start()
+        state.dataset_registry = registry
+
+        # Start background refreshes
+        refresh_scheduler = None
+        if settings.AUTO_UPDATE_INTERVAL > 0:
+            refresh_scheduler = RefreshScheduler(data_fetcher)
+            refresh_scheduler.start()
+        state.refresh_scheduler = refresh_scheduler
+
+        self.services = "ready"
+        startup_profile.mark("services")
+        logger.info("✅ Services created")
+
+    async def _load_datasets(self):
+        data_fetcher = self.app.state.data_fetcher
+
+        async def load(dataset_key: str):
+            self.datasets[dataset_key] = "loading"
+            try:
+                df = await data_fetcher.fetch_dataset(dataset_key)
+                self.datasets[dataset_key] = "loaded"
+                logger.info(f"Loaded {dataset_key}: {len(df)} rows")
+            except Exception as e:
+                # A missing dataset degrades answers but must not block readiness
+                self.datasets[dataset_key] = "failed"
+                logger.error(f"Failed to load {dataset_key}: {e}")
+
+        await asyncio.gather(*[load(key) for key in self.datasets])
+        startup_profile.mark("datasets")
+
+    async def _build_index(self):
+        self.index = "building"
+        await self.app.state.rag_service.initialize()
+        self.index = "ready"
+        startup_profile.mark("index")
+
+    def progress(self) -> Dict[str, Any]:
+        """Warmup state for the readiness and health endpoints"""
+        done = sum(status in ("loaded", "failed") for status in self.datasets.values())
+        elapsed = self.elapsed
+        if elapsed is None and self.started_at is not None:
+            elapsed = time.monotonic() - self.started_at
+        return {
+            "state": self.state,
+            "services": self.services,
+            "datasets": self.datasets,
+            "datasets_loaded": f"{done}/{len(self.datasets)}",
+            "index": self.index,
+            "elapsed": round(elapsed, 2) if elapsed is not None else None,
+        }
@@ -0,0 +1,92 @@
+"""
+Benchmark approximate queries
+Builds a stratified sample and sketches over a synthetic crop-production
+frame, then compares sampled estimates against exact aggregates: latency,
+mean relative error and how often the margin of error covers the exact
+value, plus t-digest quantile and HyperLogLog distinct-count accuracy
+
+Usage (from backend/):
+    python -m scripts.benchmark_approximate
+    python -m scripts.benchmark_approximate --rows 5000000 --per-stratum 200
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from app.services.aggregate_cubes import aggregate_dataframe
+from app.services.approximate import SampleStore, QUANTILES
+from scripts.benchmark_query_path import make_frame
+
+FILTERS = {"State": ["Punjab", "Haryana", "Uttar Pradesh"], "Crop": ["Rice", "Wheat"]}
+GROUP_BY = ["State", "Year"]
+MEASURES = ["Production_sum", "Production_mean", "Area_count"]
+
+
+def best_ms(fn, repeats: int):
+    best, result = float("inf"), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, result
+
+
+def exact_frame(df: pd.DataFrame) -> pd.DataFrame:
+    for column, values in FILTERS.items():
+        df = df[df[column].isin(values)]
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--per-stratum", type=int, default=100)
+    parser.add_argument("--batch-rows", type=int, default=200_000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    store = SampleStore(Path(tempfile.mkdtemp()), args.per_stratum)
+    batches = (df.iloc[i:i + args.batch_rows] for i in range(0, len(df), args.batch_rows))
+    start = time.perf_counter()
+    sample = store.build("crop_production", batches, "bench")
+    print(
+        f"{args.rows:,} rows -> {sample.sample_rows:,} sampled in {len(sample.strata):,} strata "
+        f"({time.perf_counter() - start:.2f} s to build)"
+    )
+
+    exact_ms, exact = best_ms(lambda: aggregate_dataframe(exact_frame(df), GROUP_BY), args.repeats)
+    approx_ms, estimates = best_ms(
+        lambda: sample.estimate(FILTERS, GROUP_BY, confidence=args.confidence), args.repeats
+    )
+    print(f"\n{'group-by':>16}: exact {exact_ms:8.1f} ms | sampled {approx_ms:8.1f} ms "
+          f"| {exact_ms / max(approx_ms, 1e-3):5.1f}x")
+
+    merged = pd.DataFrame(estimates).merge(exact, on=GROUP_BY, suffixes=("", "_exact"))
+    for column in MEASURES:
+        truth = merged[f"{column}_exact"]
+        error = ((merged[column] - truth).abs() / truth).mean()
+        covered = ((merged[column] - merged[f"{column}_moe"] <= truth)
+                   & (truth <= merged[column] + merged[f"{column}_moe"])).mean()
+        print(f"{column:>16}: mean rel. error {error:6.1%} | "
+              f"{args.confidence:.0%} interval covers {covered:6.1%} of {len(merged)} groups")
+
+    statistics = sample.statistics({"State": ["Punjab"]})["columns"]
+    punjab = df[df["State"] == "Punjab"]
+    print("\nPunjab Production quantiles (t-digest vs exact)")
+    for q in QUANTILES:
+        approx = statistics["Production"][f"p{int(q * 100)}"]
+        truth = punjab["Production"].quantile(q)
+        print(f"  p{int(q * 100):<3} {approx:12.1f} {truth:12.1f} ({abs(approx - truth) / truth:.2%})")
+    for column in ("Crop", "State"):
+        scope = punjab if column == "Crop" else df
+        approx = sample.statistics({"State": ["Punjab"]} if column == "Crop" else None)["columns"][column]
+        print(f"  distinct {column}: {approx['distinct']:.0f} (exact {scope[column].nunique()})")
+
+
+if __name__ == "__main__":
+    main()
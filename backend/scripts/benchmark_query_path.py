@@ -0,0 +1,125 @@
+"""
+Benchmark the columnar query path
+Compares CPU time and peak allocations of the pyarrow.compute query path
+against the pandas path (boolean masks, groupby, to_dict) on synthetic
+crop-production tables
+
+Usage (from backend/):
+    python -m scripts.benchmark_query_path
+    python -m scripts.benchmark_query_path --sizes 10000 1000000 --repeats 5
+"""
+import argparse
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.services.aggregate_cubes import aggregate_dataframe
+from app.services.arrow_query import aggregate_table, query_table, to_records
+from app.services.data_normalizer import DataNormalizer
+
+STATES = [
+    "Andhra Pradesh", "Gujarat", "Haryana", "Karnataka", "Madhya Pradesh",
+    "Maharashtra", "Punjab", "Tamil Nadu", "Uttar Pradesh", "West Bengal",
+]
+CROPS = ["Rice", "Wheat", "Maize", "Cotton", "Sugarcane", "Pulses", "Bajra", "Jowar"]
+FILTERS = {"State": ["Punjab", "Haryana"], "Year": list(range(2005, 2016))}
+
+
+def make_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Normalized crop-production frame with ``rows`` rows"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "State": rng.choice(STATES, rows),
+        "Crop": rng.choice(CROPS, rows),
+        "Year": rng.integers(1995, 2021, rows),
+        "Area": rng.gamma(2.0, 500.0, rows),
+        "Production": rng.gamma(2.0, 800.0, rows),
+    })
+    return DataNormalizer().normalize("crop_production", df)
+
+
+def pandas_filter(df: pd.DataFrame) -> pd.DataFrame:
+    # Same masks as DataFetcher.query_dataset
+    for column, value in FILTERS.items():
+        df = df[df[column].isin(value)]
+    return df
+
+
+WORKLOADS: Dict[str, Tuple[Callable, Callable]] = {
+    "filter+limit": (
+        lambda df: pandas_filter(df).head(1000).to_dict(orient="records"),
+        lambda table: to_records(query_table(table, FILTERS, limit=1000)),
+    ),
+    "filter+groupby": (
+        lambda df: aggregate_dataframe(pandas_filter(df), ["State", "Year"]).to_dict(orient="records"),
+        lambda table: to_records(query_table(table, FILTERS, group_by=["State", "Year"])),
+    ),
+    "filter+top100": (
+        lambda df: pandas_filter(df)[["State", "Year", "Production"]]
+        .nlargest(100, "Production").to_dict(orient="records"),
+        lambda table: to_records(query_table(
+            table, FILTERS, columns=["State", "Year", "Production"],
+            order_by=[("Production", "descending")], limit=100
+        )),
+    ),
+    "groupby all": (
+        lambda df: aggregate_dataframe(df, ["State", "Crop", "Year"]).to_dict(orient="records"),
+        lambda table: to_records(aggregate_table(table, ["State", "Crop", "Year"])),
+    ),
+}
+
+
+def cpu_ms(fn: Callable, data, repeats: int) -> float:
+    """Best-of-N process CPU time (all threads)"""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.process_time()
+        fn(data)
+        best = min(best, time.process_time() - start)
+    return best * 1000
+
+
+def peak_alloc_mb(fn: Callable, data) -> float:
+    """Peak bytes allocated by one run: Python/NumPy (tracemalloc) plus the Arrow pool"""
+    default_pool = pa.default_memory_pool()
+    pool = pa.proxy_memory_pool(default_pool)
+    pa.set_memory_pool(pool)
+    tracemalloc.start()
+    try:
+        fn(data)
+        _, python_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        pa.set_memory_pool(default_pool)
+    return (python_peak + pool.max_memory()) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.sizes:
+        df = make_frame(rows)
+        # The service converts (or maps) each dataset version once
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        print(f"\n{rows:,} rows")
+        for name, (pandas_fn, arrow_fn) in WORKLOADS.items():
+            results = []
+            for fn, data in ((pandas_fn, df), (arrow_fn, table)):
+                results.append((cpu_ms(fn, data, args.repeats), peak_alloc_mb(fn, data)))
+            (pandas_cpu, pandas_mb), (arrow_cpu, arrow_mb) = results
+            print(
+                f"  {name:>15}: pandas {pandas_cpu:9.1f} ms cpu {pandas_mb:8.1f} MB | "
+                f"arrow {arrow_cpu:9.1f} ms cpu {arrow_mb:8.1f} MB | "
+                f"{pandas_cpu / max(arrow_cpu, 1e-3):5.1f}x cpu"
+            )
+
+
+if __name__ == "__main__":
+    main()
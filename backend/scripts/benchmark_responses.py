@@ -0,0 +1,113 @@
+"""
+Benchmark response serialization
+Compares the default FastAPI response path (response_model validation,
+jsonable_encoder, json.dumps) against FastJSONResponse on large
+/datasets/query payloads, then the size and cost of gzip/brotli on the result
+
+Usage (from backend/):
+    python -m scripts.benchmark_responses
+    python -m scripts.benchmark_responses --sizes 1000 100000 --repeats 10
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+import httpx
+import pyarrow as pa
+from fastapi import FastAPI
+
+from app.api.responses import FastJSONResponse
+from app.core.compression import Compressor, supported_encodings
+from app.models.schemas import DataQueryResponse, DatasetInfo
+from app.services.arrow_query import to_records
+from scripts.benchmark_query_path import make_frame
+
+METADATA = DatasetInfo(
+    dataset_id="crop_production",
+    name="Crop Production Statistics",
+    description="District-wise crop production data across India",
+    organization="agriculture",
+    category="agriculture",
+    format="parquet",
+    fields=["State", "Crop", "Year", "Area", "Production"],
+    last_updated="2024-01-01T00:00:00",
+    url="https://data.gov.in/resource/crop-production-statistics",
+)
+
+
+def make_app(rows: List[dict]) -> FastAPI:
+    """Two routes returning the same payload, one per serialization path"""
+    app = FastAPI()
+    fields = dict(
+        dataset_id="crop_production",
+        total_count=len(rows),
+        returned_count=len(rows),
+        metadata=METADATA,
+    )
+
+    @app.get("/default", response_model=DataQueryResponse)
+    async def default_path():
+        return DataQueryResponse(data=rows, **fields)
+
+    @app.get("/fast", response_model=DataQueryResponse)
+    async def fast_path():
+        return FastJSONResponse(DataQueryResponse.model_construct(data=rows, **fields))
+
+    return app
+
+
+async def request_ms(client: httpx.AsyncClient, path: str, repeats: int) -> tuple:
+    """Best-of-N in-process request time and the response body"""
+    best, body = float("inf"), b""
+    for _ in range(repeats):
+        start = time.perf_counter()
+        response = await client.get(path)
+        best = min(best, time.perf_counter() - start)
+        body = response.content
+    return best * 1000, body
+
+
+def compress_ms(encoding: str, body: bytes, repeats: int, gzip_level: int, brotli_quality: int) -> tuple:
+    best, size = float("inf"), 0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        size = len(Compressor(encoding, gzip_level, brotli_quality).compress(body, finish=True))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, size
+
+
+async def run(args):
+    for rows in args.sizes:
+        table = pa.Table.from_pandas(make_frame(rows), preserve_index=False)
+        records = to_records(table)
+        transport = httpx.ASGITransport(app=make_app(records))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            default_ms, default_body = await request_ms(client, "/default", args.repeats)
+            fast_ms, fast_body = await request_ms(client, "/fast", args.repeats)
+
+        print(f"\n{rows:,} rows, {len(fast_body) / 2 ** 20:.2f} MB JSON")
+        print(
+            f"  {'serialize':>10}: default {default_ms:8.1f} ms | "
+            f"orjson {fast_ms:8.1f} ms | {default_ms / max(fast_ms, 1e-3):5.1f}x"
+            f"{'' if len(default_body) == len(fast_body) else ' (body sizes differ)'}"
+        )
+        for encoding in supported_encodings():
+            ms, size = compress_ms(encoding, fast_body, args.repeats, args.gzip_level, args.brotli_quality)
+            print(
+                f"  {encoding:>10}: {ms:8.1f} ms -> {size / 2 ** 20:.2f} MB "
+                f"({size / len(fast_body):.1%})"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 50_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--gzip-level", type=int, default=1)
+    parser.add_argument("--brotli-quality", type=int, default=4)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark retriever backends
+Measures index build (startup) and query latency for each backend
+
+Usage (from backend/):
+    python -m scripts.benchmark_retrievers
+"""
+import asyncio
+import statistics
+import time
+
+from app.services.rag_service import RAGService
+from app.services.retrievers import RETRIEVER_BACKENDS
+
+QUERIES = [
+    "rainfall in Punjab during monsoon",
+    "rice production trend in West Bengal",
+    "wheat prices per quintal in Haryana",
+    "average temperature by month",
+    "compare area under cotton across states",
+]
+
+
+async def main(repeats: int = 50):
+    rag = RAGService()
+    documents, metadatas, ids = await rag._build_documents(list(rag.data_fetcher.DATASETS))
+    print(f"{len(documents)} documents")
+
+    for name, retriever_cls in RETRIEVER_BACKENDS.items():
+        start = time.perf_counter()
+        try:
+            retriever = retriever_cls()
+            if retriever.count() == 0:
+                retriever.add(documents=documents, metadatas=metadatas, ids=ids)
+        except Exception as e:
+            print(f"{name:>8}: unavailable ({e})")
+            continue
+        startup_ms = (time.perf_counter() - start) * 1000
+
+        latencies = []
+        for _ in range(repeats):
+            for query in QUERIES:
+                t0 = time.perf_counter()
+                retriever.query(query, n_results=5)
+                latencies.append((time.perf_counter() - t0) * 1000)
+        latencies.sort()
+
+        print(
+            f"{name:>8}: startup {startup_ms:8.1f} ms | "
+            f"query p50 {statistics.median(latencies):.3f} ms, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.3f} ms"
+        )
+
+    await rag.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
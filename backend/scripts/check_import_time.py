@@ -0,0 +1,75 @@
+"""
+Import-time budget check
+Fails (exit status 1) when importing ``app.main`` exceeds the time budget or
+pulls in a module that should only load during background warmup
+
+Usage (from backend/):
+    python -m scripts.check_import_time
+    python -m scripts.check_import_time --budget-ms 400 --runs 5
+"""
+import argparse
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+# Heavy libraries and provider SDKs that must stay lazy
+DEFERRED_MODULES = [
+    "pandas", "numpy", "pyarrow", "aiohttp", "sqlalchemy",
+    "chromadb", "openai", "anthropic", "google.generativeai",
+]
+
+DEFAULT_BUDGET_MS = 600.0
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def profile_import(module: str) -> Tuple[float, Dict[str, float]]:
+    """Import a module in a fresh interpreter; returns (total ms, cumulative ms per module)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True
+    )
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            cumulative[match.group(4)] = int(match.group(2)) / 1000
+    return cumulative.get(module, 0.0), cumulative
+
+
+def check_import(module: str, budget_ms: float = DEFAULT_BUDGET_MS,
+                 runs: int = 3) -> Tuple[float, Dict[str, float], List[str]]:
+    """Best of ``runs`` fresh imports; returns (total ms, cumulative ms per module, failures)"""
+    total, cumulative = min((profile_import(module) for _ in range(runs)), key=lambda run: run[0])
+
+    failures = []
+    if total > budget_ms:
+        failures.append(f"import time {total:.1f} ms exceeds budget {budget_ms:.0f} ms")
+    eager = [name for name in DEFERRED_MODULES if name in cumulative]
+    if eager:
+        failures.append(f"imported eagerly (should load during warmup): {', '.join(eager)}")
+    return total, cumulative, failures
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="best of N fresh interpreters")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    total, cumulative, failures = check_import(args.module, args.budget_ms, args.runs)
+
+    print(f"import {args.module}: {total:.1f} ms (best of {args.runs}, budget {args.budget_ms:.0f} ms)")
+    for name, ms in sorted(cumulative.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {ms:8.1f} ms  {name}")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""
+Batch question runner
+Answers a file of questions in-process and writes one JSON result per line,
+for offline evaluation and throughput tests
+
+Usage (from backend/):
+    python -m scripts.run_batch questions.txt --output results.jsonl
+    python -m scripts.run_batch questions.jsonl --concurrency 8
+
+Input is either plain text (one question per line) or JSONL with a
+"question" (or "message") field per line.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+from app.services.batch_runner import BatchRunner
+from app.services.data_fetcher import DataFetcher
+from app.services.llm_service import LLMService
+from app.services.query_engine import QueryEngine
+from app.services.rag_service import RAGService
+
+
+def read_questions(path: Path) -> List[str]:
+    questions = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            record = json.loads(line)
+            line = record.get("question") or record.get("message") or ""
+        if line:
+            questions.append(line)
+    return questions
+
+
+async def main(args: argparse.Namespace):
+    questions = read_questions(Path(args.input))
+    print(f"{len(questions)} questions", file=sys.stderr)
+
+    data_fetcher = DataFetcher()
+    rag_service = RAGService(data_fetcher=data_fetcher)
+    await rag_service.initialize()
+    await data_fetcher.load_initial_datasets()
+    llm_service = LLMService()
+
+    runner = BatchRunner(
+        engine_factory=lambda: QueryEngine(
+            llm_service=llm_service,
+            rag_service=rag_service,
+            data_fetcher=data_fetcher
+        ),
+        max_concurrency=args.concurrency
+    )
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    latencies = []
+    errors = 0
+    start = time.perf_counter()
+    try:
+        async for result in runner.run(questions):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            latencies.append(result["elapsed"])
+            errors += result["status"] != "ok"
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await llm_service.close()
+        await rag_service.close()
+        await data_fetcher.close()
+
+    wall = time.perf_counter() - start
+    latencies.sort()
+    if latencies:
+        print(
+            f"{len(latencies)} answered in {wall:.1f}s "
+            f"({len(latencies) / wall:.2f} questions/s), {errors} errors | "
+            f"latency p50 {statistics.median(latencies):.2f}s, "
+            f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}s",
+            file=sys.stderr
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("input", help="Questions file (.txt or .jsonl)")
+    parser.add_argument("--output", "-o", help="JSONL output path (default: stdout)")
+    parser.add_argument("--concurrency", "-c", type=int, default=None,
+                        help="Questions in flight (default: BATCH_MAX_CONCURRENCY)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,47 @@
+"""
+Shared test setup
+
+Settings are read when ``app.core.config`` is first imported, so the
+environment is pinned here, before any test module imports the app: no
+Redis, no vector store, no background refreshes, and a throwaway data
+directory instead of backend/data.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("DATA_DIRECTORY", tempfile.mkdtemp(prefix="samarth-tests-"))
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("RETRIEVER_BACKEND", "numpy")
+os.environ.setdefault("AUTO_UPDATE_INTERVAL", "0")
+os.environ.setdefault("DATASET_REGISTRY_POLL_INTERVAL", "0")
+
+import pytest  # noqa: E402
+import yaml  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A fresh DATA_DIRECTORY per test"""
+    directory = tmp_path / "data"
+    directory.mkdir()
+    monkeypatch.setattr(settings, "DATA_DIRECTORY", str(directory))
+    return directory
+
+
+@pytest.fixture
+def make_registry(tmp_path, data_dir):
+    """Build a DatasetRegistry from ``{key: definition}`` catalog entries"""
+    from app.services.dataset_registry import DatasetRegistry
+
+    def make(catalog):
+        path = tmp_path / "datasets.yaml"
+        path.write_text(yaml.safe_dump(catalog))
+        return DatasetRegistry(
+            catalog_path=path,
+            db_url=f"sqlite:///{tmp_path / 'datasets.db'}",
+            poll_interval=0
+        )
+
+    return make
@@ -0,0 +1,47 @@
+"""
+Columnar query path: matching-row counts alongside paged and grouped results
+"""
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.services.arrow_query import query_table_counted
+
+
+@pytest.fixture
+def table():
+    crops = pd.DataFrame({
+        "State": pd.Series(["Punjab"] * 6 + ["Haryana"] * 4, dtype="category"),
+        "Crop": pd.Series(["Rice", "Wheat"] * 5, dtype="category"),
+        "Year": pd.Series([2018, 2018, 2019, 2019, 2020, 2020, 2019, 2019, 2020, 2020], dtype="int16"),
+        "Production": pd.Series(range(10), dtype="float32"),
+    })
+    return pa.Table.from_pandas(crops, preserve_index=False)
+
+
+def test_paged_rows_count_every_match(table):
+    result, matching = query_table_counted(table, {"State": ["Punjab"]}, limit=2)
+
+    assert result.num_rows == 2
+    assert matching == 6
+
+
+def test_unfiltered_count_is_the_table_size(table):
+    result, matching = query_table_counted(table, limit=3)
+
+    assert (result.num_rows, matching) == (3, 10)
+
+
+def test_no_match(table):
+    result, matching = query_table_counted(table, {"State": ["Kerala"]}, limit=5)
+
+    assert (result.num_rows, matching) == (0, 0)
+
+
+def test_grouped_count_is_rows_not_groups(table):
+    result, matching = query_table_counted(
+        table, {"Crop": ["Rice"], "Year": [2019, 2020]}, group_by=["State"], limit=1
+    )
+
+    assert result.num_rows == 1
+    assert matching == 4
@@ -0,0 +1,18 @@
+"""
+Import-time budget for ``app.main``, measured like
+``python -m scripts.check_import_time``
+"""
+from pathlib import Path
+
+from scripts.check_import_time import DEFAULT_BUDGET_MS, check_import
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_app_main_imports_within_budget_and_defers_heavy_modules(monkeypatch):
+    # Fresh interpreters resolve ``app`` from the working directory
+    monkeypatch.chdir(BACKEND_DIR)
+
+    total, _, failures = check_import("app.main", DEFAULT_BUDGET_MS)
+
+    assert failures == [], f"import app.main: {total:.1f} ms; " + "; ".join(failures)
@@ -0,0 +1,224 @@
+"""
+Conditional and incremental refreshes against a local stand-in for the
+data.gov.in resource API
+"""
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.core.config import settings
+from app.services.data_fetcher import DataFetcher
+
+RESOURCE_ID = "crops-resource"
+
+CATALOG = {
+    "crops": {
+        "id": RESOURCE_ID,
+        "name": "Crop Production",
+        "category": "agriculture",
+        "description": "Test crop production records",
+        "updated_field": "updated",
+        "key_fields": ["State", "Crop", "Year"],
+    }
+}
+
+
+def record(state: str, year: int, production: float, updated: str) -> Dict[str, Any]:
+    return {
+        "state_name": state,
+        "crop": "Rice",
+        "crop_year": year,
+        "area": 100.0,
+        "production": production,
+        "updated": updated,
+    }
+
+
+class Upstream:
+    """
+    Serves records like the resource API: ETag and Last-Modified
+    validators (304 when they match), ``sort[updated]`` and
+    ``filters[updated][gt]`` watermark paging
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], use_etag: bool = True):
+        self.records = records
+        self.use_etag = use_etag
+        self.honor_filter = True
+        self.available = True
+        self.version = 1
+        self.requests: List[Dict[str, Any]] = []
+
+    def publish(self, *changes: Dict[str, Any]):
+        """Insert or update records (by state/crop/year) as a new version"""
+        for change in changes:
+            key = (change["state_name"], change["crop"], change["crop_year"])
+            self.records = [
+                r for r in self.records if (r["state_name"], r["crop"], r["crop_year"]) != key
+            ] + [change]
+        self.version += 1
+
+    @property
+    def etag(self) -> str:
+        return f'"v{self.version}"'
+
+    @property
+    def last_modified(self) -> str:
+        return f"Mon, 0{self.version} Jan 2024 00:00:00 GMT"
+
+    async def handle(self, request: web.Request) -> web.Response:
+        entry = {"params": dict(request.query), "headers": dict(request.headers), "status": 200}
+        self.requests.append(entry)
+        if not self.available:
+            entry["status"] = 503
+            return web.Response(status=503)
+
+        validators = {"Last-Modified": self.last_modified}
+        if self.use_etag:
+            validators["ETag"] = self.etag
+        if (self.use_etag and request.headers.get("If-None-Match") == self.etag) or (
+            not self.use_etag and request.headers.get("If-Modified-Since") == self.last_modified
+        ):
+            entry["status"] = 304
+            return web.Response(status=304, headers=validators)
+
+        records = sorted(self.records, key=lambda r: r["updated"])
+        watermark = request.query.get("filters[updated][gt]")
+        if watermark is not None and self.honor_filter:
+            records = [r for r in records if r["updated"] > watermark]
+        entry["returned"] = len(records)
+        return web.json_response({"records": records}, headers=validators)
+
+
+@pytest_asyncio.fixture
+async def upstream(monkeypatch):
+    async def serve(records: List[Dict[str, Any]], use_etag: bool = True) -> Upstream:
+        stand_in = Upstream(records, use_etag)
+        app = web.Application()
+        app.router.add_get(f"/resource/{RESOURCE_ID}", stand_in.handle)
+        server = TestServer(app)
+        await server.start_server()
+        servers.append(server)
+        monkeypatch.setattr(settings, "DATA_GOV_BASE_URL", str(server.make_url("/resource")))
+        return stand_in
+
+    servers: List[TestServer] = []
+    yield serve
+    for server in servers:
+        await server.close()
+
+
+@pytest_asyncio.fixture
+async def fetcher(make_registry):
+    fetcher = DataFetcher(registry=make_registry(CATALOG))
+    yield fetcher
+    await fetcher.close()
+
+
+def production_by_year(df) -> Dict[int, Optional[float]]:
+    return {int(year): float(value) for year, value in zip(df["Year"], df["Production"])}
+
+
+@pytest.mark.asyncio
+async def test_first_refresh_is_full_and_records_validators(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01"),
+                             record("Punjab", 2021, 11.0, "2024-01-02")])
+
+    df = await fetcher.refresh_dataset("crops")
+
+    assert production_by_year(df) == {2020: 10.0, 2021: 11.0}
+    assert "filters[updated][gt]" not in server.requests[0]["params"]
+    manifest = fetcher._load_manifest("crops")
+    assert manifest["etag"] == server.etag
+    assert manifest["watermark"] == "2024-01-02"
+    assert manifest["fragments"] == []
+
+
+@pytest.mark.asyncio
+async def test_unchanged_upstream_answers_304_and_keeps_cache(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01")])
+    await fetcher.refresh_dataset("crops")
+
+    df = await fetcher.refresh_dataset("crops")
+
+    assert server.requests[-1]["headers"]["If-None-Match"] == server.etag
+    assert server.requests[-1]["status"] == 304
+    assert production_by_year(df) == {2020: 10.0}
+    assert fetcher._load_manifest("crops")["fragments"] == []
+
+
+@pytest.mark.asyncio
+async def test_last_modified_revalidation(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01")], use_etag=False)
+    await fetcher.refresh_dataset("crops")
+
+    await fetcher.refresh_dataset("crops")
+
+    assert server.requests[-1]["headers"]["If-Modified-Since"] == server.last_modified
+    assert server.requests[-1]["status"] == 304
+
+
+@pytest.mark.asyncio
+async def test_second_refresh_fetches_only_the_delta_and_upserts(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01"),
+                             record("Punjab", 2021, 11.0, "2024-01-02"),
+                             record("Haryana", 2020, 12.0, "2024-01-03")])
+    await fetcher.refresh_dataset("crops")
+
+    # One record revised upstream, one added
+    server.publish(record("Punjab", 2020, 99.0, "2024-02-01"),
+                   record("Haryana", 2021, 13.0, "2024-02-02"))
+    df = await fetcher.refresh_dataset("crops")
+
+    request = server.requests[-1]
+    assert request["params"]["filters[updated][gt]"] == "2024-01-03"
+    assert request["returned"] == 2
+    manifest = fetcher._load_manifest("crops")
+    assert len(manifest["fragments"]) == 1
+    assert manifest["watermark"] == "2024-02-02"
+
+    # The revised record replaced its cached version instead of duplicating it
+    assert len(df) == 4
+    assert not df.duplicated(subset=["State", "Crop", "Year"]).any()
+    punjab = df[df["State"] == "Punjab"]
+    assert production_by_year(punjab) == {2020: 99.0, 2021: 11.0}
+
+
+@pytest.mark.asyncio
+async def test_watermark_is_applied_when_upstream_ignores_the_filter(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01")])
+    await fetcher.refresh_dataset("crops")
+
+    # An upstream without range filters returns everything again
+    server.honor_filter = False
+    server.publish(record("Punjab", 2021, 11.0, "2024-02-01"))
+    df = await fetcher.refresh_dataset("crops")
+
+    assert server.requests[-1]["returned"] == 2
+    fragment = fetcher.cache_dir / fetcher._load_manifest("crops")["fragments"][0]
+    assert len(pd.read_parquet(fragment)) == 1
+    assert production_by_year(df) == {2020: 10.0, 2021: 11.0}
+
+
+@pytest.mark.asyncio
+async def test_revalidation_restarts_the_ttl_without_evicting_decoded_data(upstream, fetcher):
+    server = await upstream([record("Punjab", 2020, 10.0, "2024-01-01")])
+    df = await fetcher.refresh_dataset("crops")
+    version = fetcher._cache_version("crops")
+    checked_at = fetcher._load_manifest("crops")["checked_at"]
+
+    assert await fetcher.refresh_dataset("crops") is df
+    assert server.requests[-1]["status"] == 304
+    assert fetcher._cache_version("crops") == version
+    assert fetcher._load_manifest("crops")["checked_at"] > checked_at
+
+    # A failing upstream keeps the cached copy for another TTL as well
+    server.available = False
+    assert await fetcher.refresh_dataset("crops") is df
+    assert fetcher._cache_version("crops") == version
+    assert server.requests[-1]["status"] == 503
+    assert fetcher._is_cache_valid("crops")
@@ -0,0 +1,184 @@
+"""
+Retries, circuit breakers, failover and hedging of LLM calls against fake
+providers
+"""
+import asyncio
+from typing import List, Optional
+
+import pytest
+
+from app.core.config import settings
+from app.services import llm_resilience
+from app.services.llm_resilience import (
+    ProviderUnavailable,
+    call_with_failover,
+    call_with_retries,
+    get_provider_health,
+)
+
+
+class ServiceUnavailable(Exception):
+    """Named like the provider SDKs' 503 errors, so it counts as transient"""
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class FakeProvider:
+    """
+    Answers with ``reply`` after ``latency`` seconds, raising the queued
+    ``errors`` first (one per call)
+    """
+
+    def __init__(self, name: str, reply: str = "ok", errors: Optional[List[Exception]] = None,
+                 latency: float = 0.0):
+        self.name = name
+        self.reply = reply
+        self.errors = list(errors or [])
+        self.latency = latency
+        self.calls = 0
+        self.cancelled = False
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.latency)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.reply
+
+    def candidate(self):
+        return (self.name, f"{self.name}-model", self)
+
+
+@pytest.fixture(autouse=True)
+def resilience_settings(monkeypatch):
+    """Fresh provider health and millisecond-scale backoff for every test"""
+    monkeypatch.setattr(llm_resilience, "_health", {})
+    monkeypatch.setattr(llm_resilience, "hedge_stats", {"hedged": 0, "hedge_wins": 0})
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_DELAY", 0.005)
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "CIRCUIT_RESET_TIMEOUT", 0.05)
+    monkeypatch.setattr(settings, "LLM_HEDGE_REQUESTS", False)
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY", 0.02)
+
+
+@pytest.mark.asyncio
+async def test_transient_error_is_retried_until_success():
+    provider = FakeProvider("openai", errors=[ServiceUnavailable(), asyncio.TimeoutError()])
+
+    assert await call_with_retries(*provider.candidate()) == "ok"
+
+    assert provider.calls == 3
+    health = get_provider_health("openai")
+    assert health.state == "closed"
+    assert health.stats()["errors"] == 2
+
+
+@pytest.mark.asyncio
+async def test_non_transient_error_is_not_retried():
+    provider = FakeProvider("openai", errors=[BadRequest()])
+
+    with pytest.raises(BadRequest):
+        await call_with_retries(*provider.candidate())
+
+    assert provider.calls == 1
+    assert get_provider_health("openai").consecutive_failures == 0
+
+
+@pytest.mark.asyncio
+async def test_failures_open_the_circuit_and_a_half_open_trial_closes_it():
+    provider = FakeProvider("openai", errors=[ServiceUnavailable()] * 3)
+    health = get_provider_health("openai")
+
+    with pytest.raises(ServiceUnavailable):
+        await call_with_retries(*provider.candidate())
+    assert provider.calls == 3
+    assert health.state == "open"
+
+    # Open: calls are refused without reaching the provider
+    with pytest.raises(ProviderUnavailable):
+        await call_with_retries(*provider.candidate())
+    assert provider.calls == 3
+
+    # Half-open after the reset timeout: one trial call, which succeeds
+    await asyncio.sleep(settings.CIRCUIT_RESET_TIMEOUT)
+    assert health.state == "half_open"
+    assert await call_with_retries(*provider.candidate()) == "ok"
+    assert provider.calls == 4
+    assert health.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_failed_half_open_trial_reopens_the_circuit():
+    provider = FakeProvider("openai", errors=[ServiceUnavailable()] * 4)
+    health = get_provider_health("openai")
+    with pytest.raises(ServiceUnavailable):
+        await call_with_retries(*provider.candidate())
+
+    await asyncio.sleep(settings.CIRCUIT_RESET_TIMEOUT)
+    with pytest.raises(ServiceUnavailable):
+        await call_with_retries(*provider.candidate())
+
+    # The trial is not retried and the circuit opens again straight away
+    assert provider.calls == 4
+    assert health.state == "open"
+
+
+@pytest.mark.asyncio
+async def test_primary_down_fails_over_to_the_backup():
+    primary = FakeProvider("openai", errors=[ServiceUnavailable()] * 3)
+    backup = FakeProvider("anthropic", reply="from backup")
+
+    assert await call_with_failover([primary.candidate(), backup.candidate()]) == "from backup"
+    assert (primary.calls, backup.calls) == (3, 1)
+
+    # With the primary's circuit open, the next call goes straight to the backup
+    assert await call_with_failover([primary.candidate(), backup.candidate()]) == "from backup"
+    assert (primary.calls, backup.calls) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_all_providers_circuit_open():
+    primary = FakeProvider("openai", errors=[ServiceUnavailable()] * 3)
+    with pytest.raises(ServiceUnavailable):
+        await call_with_failover([primary.candidate()])
+
+    with pytest.raises(ProviderUnavailable):
+        await call_with_failover([primary.candidate()])
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_over_a_slow_primary_and_cancels_it(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_REQUESTS", True)
+    primary = FakeProvider("openai", reply="from primary", latency=5.0)
+    backup = FakeProvider("anthropic", reply="from backup", latency=0.01)
+
+    answer = await asyncio.wait_for(
+        call_with_failover([primary.candidate(), backup.candidate()]), timeout=1.0
+    )
+    await asyncio.sleep(0)
+
+    assert answer == "from backup"
+    assert primary.cancelled
+    assert llm_resilience.hedge_stats == {"hedged": 1, "hedge_wins": 1}
+    # The cancelled call is neither a failure nor a latency sample
+    health = get_provider_health("openai")
+    assert health.errors == 0 and health.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_fast_primary_is_not_hedged(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_REQUESTS", True)
+    primary = FakeProvider("openai", reply="from primary")
+    backup = FakeProvider("anthropic", reply="from backup")
+
+    assert await call_with_failover([primary.candidate(), backup.candidate()]) == "from primary"
+    assert backup.calls == 0
+    assert llm_resilience.hedge_stats["hedged"] == 0
@@ -0,0 +1,58 @@
+"""
+SQL endpoint engine: comparisons on categorical (dictionary) columns
+"""
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from app.services.data_normalizer import MONTH_DTYPE, MONTH_NAMES
+from app.services.sql_engine import SQLEngine, SQLQueryError
+
+
+class TableFetcher:
+    """The slice of DataFetcher the engine uses, over fixed tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.DATASETS = {key: {} for key in tables}
+
+    async def fetch_table(self, dataset_key):
+        return self.tables[dataset_key]
+
+
+@pytest.fixture
+def engine():
+    rainfall = pd.DataFrame({
+        "State": pd.Series(["Punjab"] * 12, dtype="category"),
+        "Year": pd.Series([2020] * 12, dtype="int16"),
+        "Month": pd.Series(MONTH_NAMES, dtype=MONTH_DTYPE),
+        "Rainfall_mm": pd.Series(range(12), dtype="float32"),
+    })
+    table = pa.Table.from_pandas(rainfall, preserve_index=False)
+    return SQLEngine(TableFetcher({"rainfall_data": table}))
+
+
+async def months(engine, where):
+    result = await engine.execute(f"SELECT Month FROM rainfall_data WHERE {where}")
+    return [row[0] for row in result["rows"]]
+
+
+@pytest.mark.asyncio
+async def test_ordered_categorical_ranges_follow_category_order(engine):
+    assert await months(engine, "Month > 'Jun'") == ["Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+    assert await months(engine, "Month <= 'Mar'") == ["Jan", "Feb", "Mar"]
+    assert await months(engine, "Month BETWEEN 'Apr' AND 'Jun'") == ["Apr", "May", "Jun"]
+    assert await months(engine, "Month = 'Sep'") == ["Sep"]
+
+
+@pytest.mark.asyncio
+async def test_range_on_unknown_category_is_rejected(engine):
+    with pytest.raises(SQLQueryError):
+        await months(engine, "Month > 'Monsoon'")
+
+
+@pytest.mark.asyncio
+async def test_range_on_unordered_categorical_is_rejected(engine):
+    with pytest.raises(SQLQueryError):
+        await months(engine, "State > 'P'")
+    assert await months(engine, "State = 'Punjab'") == MONTH_NAMES